@@ -24,8 +24,15 @@ from pathlib import Path
 script_dir = Path(__file__).parent
 sys.path.insert(0, str(script_dir))
 
-from builder import BuildConfig, Logger, run_build
+from builder import BuildConfig, Logger, run_build, run_check, run_tests
+from builder.artifacts import ArtifactCache
+from builder.bolt import PROFILE_MODES as BOLT_PROFILE_MODES
+from builder.journal import BuildJournal
+from builder.report import BuildReport
+from builder.rustc_cache import RustcCache
 from builder.tools import ToolInstaller
+from builder.vendor import CrateVendor
+from builder.watch import WatchDaemon
 from builder.config import RUST_TARGETS
 
 
@@ -52,7 +59,23 @@ Examples:
   %(prog)s --all              Build for all supported platforms
   %(prog)s --setup            Install all build tools (Rust, zig, etc.)
   %(prog)s --status           Show status of installed tools
+  %(prog)s --cache-stats      Show compiler and binary cache statistics
+  %(prog)s --cache-gc         Evict old entries of the shared tool cache
+  %(prog)s --vendor           Vendor all crates for offline builds
+  %(prog)s --all --offline    Build all platforms without network access
   %(prog)s --clean --all      Clean and build all platforms
+  %(prog)s --all -j 2         Build all platforms, two at a time
+  %(prog)s --all --pgo        Profile-guided release build for all platforms
+  %(prog)s --pgo --bolt       PGO build, then BOLT-optimize the Linux binary
+  %(prog)s --fast             Quick dev build for the edit-compile-run loop
+  %(prog)s --watch --fast     Rebuild the native target on every change
+  %(prog)s --all --size-report  Check binary sizes against the size budget
+  %(prog)s --resume           Rerun the last build, rebuilding only what failed
+  %(prog)s --all --fail-fast  Stop all targets on the first shared compile error
+  %(prog)s --all --check      Type-check every platform without building binaries
+  %(prog)s --test             Run all tests in parallel shards
+  %(prog)s --all --bundle     Build all platforms and compress them for download
+  %(prog)s --all --deltas ../v1.2/dist  Patches from the previous release
 
 Targets:
   native          Current platform (default)
@@ -61,7 +84,9 @@ Targets:
   linux-arm64     Linux ARM64
   linux-x86_64    Linux x86_64
 
-Note: All tools are installed locally in builder/tools/ directory.
+Note: All tools are installed locally in builder/tools/ directory; zig and the
+macOS SDK are linked there from a tool cache shared by all checkouts
+(default: $XDG_CACHE_HOME/opendir-builder).
 """,
     )
 
@@ -77,11 +102,138 @@ Note: All tools are installed locally in builder/tools/ directory.
         action="store_true",
         help="Build in release mode (optimized)",
     )
+    mode_group.add_argument(
+        "--fast",
+        action="store_true",
+        help="Debug build tuned for rebuild speed: mold/lld or zig cc linker, "
+        "split debuginfo, incremental compilation",
+    )
+    mode_group.add_argument(
+        "--watch",
+        action="store_true",
+        help="Watch src/, tests/ and Cargo.toml and rebuild the native target on changes "
+        "(debug unless --release)",
+    )
+    mode_group.add_argument(
+        "--check",
+        action="store_true",
+        help="Only type-check the targets with one concurrent cargo check, without "
+        "linking or cross-compilation tools (debug unless --release)",
+    )
+    mode_group.add_argument(
+        "--test",
+        action="store_true",
+        help="Run all tests in parallel shards planned from past test durations "
+        "(debug unless --release)",
+    )
+    mode_group.add_argument(
+        "--test-shards",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Number of concurrent test shards (default: CPU count)",
+    )
     mode_group.add_argument(
         "--clean",
         action="store_true",
         help="Clean before building",
     )
+    mode_group.add_argument(
+        "-j",
+        "--max-parallel-targets",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Build up to N targets concurrently (default: based on CPU count)",
+    )
+    mode_group.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Total job slots shared by all concurrent builds (default: CPU count)",
+    )
+    mode_group.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild targets even if nothing changed since their last build",
+    )
+    mode_group.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip targets that completed in the last run from unchanged inputs "
+        "(without targets, reruns the last run's targets)",
+    )
+    mode_group.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="Cancel the other targets as soon as one fails on an error in shared sources",
+    )
+    mode_group.add_argument(
+        "--bundle",
+        action="store_true",
+        help="Write .tar.zst and .tar.xz bundles of the dist binaries, at levels "
+        "picked by a size vs decompression time benchmark",
+    )
+    mode_group.add_argument(
+        "--deltas",
+        type=Path,
+        metavar="PREVIOUS_DIST",
+        help="Write BSDIFF40 patches from the binaries of a previous release's dist "
+        "directory to dist/deltas/",
+    )
+    mode_group.add_argument(
+        "--offline",
+        action="store_true",
+        help="Build without network from the crates vendored by --vendor",
+    )
+    mode_group.add_argument(
+        "--timings",
+        action="store_true",
+        help="Record cargo timing data and report critical path and parallelism",
+    )
+    mode_group.add_argument(
+        "--pgo",
+        action="store_true",
+        help="Profile the native binary on a scripted workload and rebuild all targets with the profile",
+    )
+    mode_group.add_argument(
+        "--bolt",
+        action="store_true",
+        help="Optimize the native Linux binary's code layout with llvm-bolt after linking",
+    )
+    mode_group.add_argument(
+        "--bolt-profile",
+        choices=BOLT_PROFILE_MODES,
+        default="auto",
+        help="How --bolt profiles the binary: perf sampling, BOLT instrumentation, or auto",
+    )
+    mode_group.add_argument(
+        "--size-report",
+        action="store_true",
+        help="Attribute binary size to crates and modules and enforce the size budget",
+    )
+    mode_group.add_argument(
+        "--size-budget",
+        type=Path,
+        default=Path("builder/size-budget.json"),
+        metavar="FILE",
+        help="Size budget used by --size-report (default: builder/size-budget.json)",
+    )
+    mode_group.add_argument(
+        "--rustc-cache-size",
+        type=int,
+        default=10240,
+        metavar="MB",
+        help="Size limit of the compiled crate cache used via RUSTC_WRAPPER (0 disables it)",
+    )
+    mode_group.add_argument(
+        "--artifact-cache-size",
+        type=int,
+        default=2048,
+        metavar="MB",
+        help="Size limit of the release binary cache in builder/cache (0 disables it)",
+    )
 
     # Target selection
     target_group = parser.add_argument_group("Target Selection")
@@ -148,6 +300,46 @@ Note: All tools are installed locally in builder/tools/ directory.
         action="store_true",
         help="Show status of installed tools",
     )
+    setup_group.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="Show statistics of the compiled crate, binary and tool caches",
+    )
+    setup_group.add_argument(
+        "--cache-gc",
+        action="store_true",
+        help="Evict unused and least recently used entries of the shared tool cache",
+    )
+    setup_group.add_argument(
+        "--tool-cache",
+        type=Path,
+        metavar="DIR",
+        help="Tool archive cache shared by checkouts (default: $XDG_CACHE_HOME/opendir-builder)",
+    )
+    setup_group.add_argument(
+        "--keep-tool-archives",
+        action="store_true",
+        help="Download tool archives to the tool cache before extracting them, instead of streaming",
+    )
+    setup_group.add_argument(
+        "--tool-cache-size",
+        type=int,
+        default=4096,
+        metavar="MB",
+        help="Size --cache-gc shrinks the tool cache to (default: 4096)",
+    )
+    setup_group.add_argument(
+        "--tool-cache-max-age",
+        type=int,
+        default=90,
+        metavar="DAYS",
+        help="Age of last use past which --cache-gc evicts a tool cache entry (default: 90)",
+    )
+    setup_group.add_argument(
+        "--vendor",
+        action="store_true",
+        help="Download all crates of Cargo.lock into builder/vendor for --offline builds",
+    )
 
     # Other options
     other_group = parser.add_argument_group("Other Options")
@@ -230,6 +422,56 @@ def ensure_rust_installed(tool_installer: ToolInstaller, logger: Logger, auto_se
     return tool_installer.setup_rust()
 
 
+def format_size(size: float) -> str:
+    """Format a byte count in human-readable form."""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+def print_cache_stats(config: BuildConfig, tool_installer: ToolInstaller, logger: Logger) -> None:
+    """Print statistics of the builder's caches."""
+    logger.header("Cache Statistics")
+
+    rustc_cache = RustcCache(
+        tool_installer.rustc_cache_dir, config.rustc_cache_size_mb * 1024 * 1024
+    )
+    stats = rustc_cache.summary()
+    hits = int(stats.get("hits", 0))
+    misses = int(stats.get("misses", 0))
+    lookups = hits + misses
+    hit_rate = (hits / lookups * 100) if lookups else 0.0
+
+    logger.info(f"Compiled crates: {tool_installer.rustc_cache_dir}")
+    logger.info(f"  Entries: {int(stats['entries'])} ({format_size(stats.get('size', 0))} of {config.rustc_cache_size_mb}MB)")
+    logger.info(f"  Hits: {hits}, misses: {misses} ({hit_rate:.1f}% hit rate)")
+    logger.info(f"  Not cacheable: {int(stats.get('uncacheable', 0))}")
+    logger.info(f"  Compile time saved: {stats.get('seconds_saved', 0):.1f}s")
+
+    artifact_dir = tool_installer.project_root / config.cache_dir / "artifacts"
+    artifact_cache = ArtifactCache(artifact_dir, config.artifact_cache_size_mb * 1024 * 1024)
+    logger.info(f"Release binaries: {artifact_dir}")
+    logger.info(f"  Entries: {len(artifact_cache.index)} ({format_size(artifact_cache.total_size())} of {config.artifact_cache_size_mb}MB)")
+
+    entries, size = tool_installer.tool_cache.stats()
+    logger.info(f"Tool archives: {tool_installer.tool_cache.root}")
+    logger.info(f"  Entries: {entries} ({format_size(size)}, --cache-gc keeps {config.tool_cache_size_mb}MB)")
+
+
+def collect_tool_cache(config: BuildConfig, tool_installer: ToolInstaller, logger: Logger) -> None:
+    """Evict old and least recently used entries of the shared tool cache."""
+    logger.header("Tool Cache Cleanup")
+    tool_cache = tool_installer.tool_cache
+    evicted, freed = tool_cache.gc(
+        config.tool_cache_size_mb * 1024 * 1024, config.tool_cache_max_age_days * 24 * 3600
+    )
+    entries, size = tool_cache.stats()
+    logger.success(f"Evicted {evicted} entries ({format_size(freed)}) from {tool_cache.root}")
+    logger.info(f"  Left: {entries} entries ({format_size(size)} of {config.tool_cache_size_mb}MB)")
+
+
 def needs_cross_compilation(targets: list) -> bool:
     """Check if any target requires cross-compilation tools."""
     for target in targets:
@@ -259,10 +501,57 @@ def main() -> int:
 
     # Create config
     config = BuildConfig(
-        release=not args.debug,
+        release=not (args.debug or args.fast or ((args.watch or args.check or args.test) and not args.release)),
         clean=args.clean,
+        max_parallel_targets=args.max_parallel_targets,
+        jobs=args.jobs,
+        test_shards=args.test_shards,
+        force=args.force,
+        resume=args.resume,
+        fail_fast=args.fail_fast,
+        offline=args.offline,
+        artifact_cache_size_mb=args.artifact_cache_size,
+        rustc_cache_size_mb=args.rustc_cache_size,
+        tool_cache_dir=args.tool_cache.resolve() if args.tool_cache else None,
+        tool_cache_size_mb=args.tool_cache_size,
+        tool_cache_max_age_days=args.tool_cache_max_age,
+        stream_tools=not args.keep_tool_archives,
+        timings=args.timings,
+        pgo=args.pgo,
+        bolt=args.bolt,
+        bolt_profile=args.bolt_profile,
+        fast=args.fast,
+        size_report=args.size_report,
+        size_budget=args.size_budget,
+        bundle=args.bundle,
+        deltas_from=args.deltas.resolve() if args.deltas else None,
     )
 
+    if config.fast and (args.release or config.pgo or config.bolt):
+        logger.error("--fast is a debug build and cannot be combined with --release, --pgo or --bolt")
+        return 1
+    if args.watch and (config.pgo or config.bolt or config.size_report):
+        logger.error("--watch cannot be combined with --pgo, --bolt or --size-report")
+        return 1
+    if args.test and (args.check or args.watch or config.pgo or config.bolt or config.fast or config.size_report):
+        logger.error("--test cannot be combined with --check, --watch, --pgo, --bolt, --fast or --size-report")
+        return 1
+    if args.check and (args.watch or config.pgo or config.bolt or config.fast or config.size_report):
+        logger.error("--check cannot be combined with --watch, --pgo, --bolt, --fast or --size-report")
+        return 1
+    if config.resume and (config.clean or config.force or args.watch):
+        logger.error("--resume cannot be combined with --clean, --force or --watch")
+        return 1
+    if config.deltas_from is not None and not config.deltas_from.is_dir():
+        logger.error(f"--deltas: {config.deltas_from} is not a directory")
+        return 1
+    if config.pgo and not config.release:
+        logger.error("--pgo requires a release build")
+        return 1
+    if config.bolt and not config.release:
+        logger.error("--bolt requires a release build")
+        return 1
+
     # Create tool installer
     tool_installer = ToolInstaller(config, project_root, logger)
 
@@ -277,6 +566,14 @@ def main() -> int:
         tool_installer.print_status()
         return 0
 
+    if args.cache_stats:
+        print_cache_stats(config, tool_installer, logger)
+        return 0
+
+    if args.cache_gc:
+        collect_tool_cache(config, tool_installer, logger)
+        return 0
+
     # Setup modes
     if args.setup:
         success = tool_installer.setup_all()
@@ -293,26 +590,65 @@ def main() -> int:
         success = tool_installer.setup_cross_compile()
         return 0 if success else 1
 
+    if args.vendor:
+        if not ensure_rust_installed(tool_installer, logger, not args.no_auto_setup):
+            return 1
+        success = CrateVendor(config, project_root, logger).vendor(tool_installer.get_env())
+        return 0 if success else 1
+
+    if config.offline:
+        vendor = CrateVendor(config, project_root, logger)
+        if not vendor.is_vendored():
+            logger.error(f"No vendored crates in {vendor.vendor_dir}. Run with --vendor first.")
+            return 1
+        if not vendor.is_current():
+            logger.warning("Cargo.lock changed since the last --vendor; missing crates will fail the build")
+
     # Building mode - ensure Rust is installed
+    report = BuildReport()
     auto_setup = not args.no_auto_setup
-    if not ensure_rust_installed(tool_installer, logger, auto_setup):
+    with report.phase("tool_probing"):
+        rust_ready = ensure_rust_installed(tool_installer, logger, auto_setup)
+    if not rust_ready:
         return 1
 
+    if args.test:
+        success = run_tests(config, project_root, logger, report)
+        return 0 if success else 1
+
+    if args.watch:
+        # Reuse this process's tool probing for every rebuild
+        return WatchDaemon(config, project_root, logger, tool_installer).run()
+
     # Collect targets
     targets = collect_targets(args)
+    if config.resume and targets == ["native"] and not args.native:
+        last_targets = BuildJournal(project_root / config.cache_dir / "build-journal.json").last_targets()
+        if last_targets:
+            logger.info(f"Resuming last run: {' '.join(last_targets)}")
+            targets = last_targets
 
     if not targets:
         logger.error("No targets specified")
         return 1
 
+    if args.check:
+        # Checking neither links nor needs the cross-compilation tools
+        success = run_check(config, project_root, targets, logger, report)
+        return 0 if success else 1
+
     # Check if cross-compilation is needed
     if needs_cross_compilation(targets):
         # Check if cross-compilation tools are installed
-        if not tool_installer.is_zig_installed() or not tool_installer.is_macos_sdk_installed():
+        with report.phase("tool_probing"):
+            cross_ready = tool_installer.is_zig_installed() and tool_installer.is_macos_sdk_installed()
+        if not cross_ready:
             if auto_setup:
                 logger.warning("Cross-compilation tools not installed. Installing...")
                 logger.newline()
-                if not tool_installer.setup_cross_compile():
+                with report.phase("cross_setup"):
+                    setup_ok = tool_installer.setup_cross_compile()
+                if not setup_ok:
                     logger.error("Failed to install cross-compilation tools")
                     return 1
             else:
@@ -321,7 +657,7 @@ def main() -> int:
                 return 1
 
     # Run build
-    success = run_build(config, project_root, targets, logger)
+    success = run_build(config, project_root, targets, logger, report)
 
     return 0 if success else 1
 
@@ -10,6 +10,8 @@ from .logger import Logger
 from .tools import ToolInstaller
 from .targets import Target, TargetManager
 from .executor import BuildExecutor, BuildResult, run_build
+from .check import run_check
+from .sharding import run_tests
 
 __all__ = [
     "BuildConfig",
@@ -22,6 +24,8 @@ __all__ = [
     "BuildExecutor",
     "BuildResult",
     "run_build",
+    "run_check",
+    "run_tests",
 ]
 
 __version__ = "1.0.0"
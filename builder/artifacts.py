@@ -0,0 +1,129 @@
+"""
+Local content-addressed cache of built release binaries.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def file_digest(path: Path) -> str:
+    """Get the SHA-256 digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Binaries stored by content digest, looked up by build fingerprint.
+
+    The fingerprint of a target (source tree, rust target, profile,
+    toolchain, zig and SDK) maps to the digest of the binary it produced,
+    so switching branches or cleaning can restore a binary instead of
+    rebuilding it. Least recently used entries are evicted past max_bytes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.objects_dir = root / "objects"
+        self.index_path = root / "index.json"
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self._index: Optional[Dict[str, dict]] = None
+
+    @property
+    def index(self) -> Dict[str, dict]:
+        if self._index is None:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def restore(self, key: str, dest: Path) -> bool:
+        """Copy the binary built for key to dest, if the cache has it."""
+        entry = self.index.get(key)
+        if entry is not None:
+            object_path = self._object_path(entry["digest"])
+            if object_path.exists():
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = dest.with_name(dest.name + ".tmp")
+                shutil.copyfile(object_path, tmp_path)
+                tmp_path.chmod(0o755)
+                os.replace(tmp_path, dest)
+
+                entry["last_used"] = time.time()
+                self.hits += 1
+                return True
+
+            # Object went missing, forget the entry
+            del self.index[key]
+
+        self.misses += 1
+        return False
+
+    def store(self, key: str, source: Path, target: str, digest: Optional[str] = None) -> None:
+        """Add a freshly built binary to the cache under key, given its SHA-256 if known."""
+        digest = digest or file_digest(source)
+        object_path = self._object_path(digest)
+
+        if not object_path.exists():
+            object_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = object_path.with_name(digest + ".tmp")
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, object_path)
+
+        self.index[key] = {
+            "digest": digest,
+            "size": object_path.stat().st_size,
+            "target": target,
+            "last_used": time.time(),
+        }
+        self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits max_bytes."""
+        # Objects can be shared by several keys; an object is in use until
+        # its most recent key goes
+        objects: Dict[str, dict] = {}
+        for key, entry in self.index.items():
+            obj = objects.setdefault(entry["digest"], {"size": entry["size"], "last_used": 0.0, "keys": []})
+            obj["last_used"] = max(obj["last_used"], entry["last_used"])
+            obj["keys"].append(key)
+
+        total = sum(obj["size"] for obj in objects.values())
+        for digest, obj in sorted(objects.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            for key in obj["keys"]:
+                del self.index[key]
+            try:
+                self._object_path(digest).unlink()
+            except FileNotFoundError:
+                pass
+            total -= obj["size"]
+
+    def save(self) -> None:
+        """Write the index, replacing the previous file atomically."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def total_size(self) -> int:
+        """Get the size of all cached objects."""
+        digests = {entry["digest"]: entry["size"] for entry in self.index.values()}
+        return sum(digests.values())
@@ -0,0 +1,410 @@
+"""
+Binary size attribution and budgets.
+
+A small ELF and Mach-O reader gets the allocated sections and the symbol
+table of an unstripped binary; symbol sizes are then summed per crate
+(and per module of opendir itself) from the demangled Rust paths.
+"""
+import json
+import re
+import struct
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# ELF section header types and flags
+SHT_SYMTAB = 2
+SHT_NOBITS = 8
+SHF_ALLOC = 0x2
+STT_OBJECT = 1
+STT_FUNC = 2
+STT_TLS = 6
+SHN_LORESERVE = 0xFF00
+
+# Mach-O
+MH_MAGIC_64 = 0xFEEDFACF
+LC_SEGMENT_64 = 0x19
+LC_SYMTAB = 0x2
+N_STAB = 0xE0
+N_TYPE = 0x0E
+N_SECT = 0x0E
+S_ZEROFILL_TYPES = (0x1, 0xC, 0x12)  # zerofill, gb_zerofill, thread_local_zerofill
+
+# Crate for symbols that are not Rust (libc glue, C dependencies, linker stubs)
+NON_RUST = "[C/other]"
+# Bytes of allocated sections not covered by any symbol
+UNATTRIBUTED = "[unattributed]"
+
+# Legacy mangling escapes, see rustc_symbol_mangling::legacy
+ESCAPES = {
+    "$SP$": "@", "$BP$": "*", "$RF$": "&", "$LT$": "<", "$GT$": ">",
+    "$LP$": "(", "$RP$": ")", "$C$": ",",
+}
+UNICODE_ESCAPE = re.compile(r"\$u([0-9a-f]{2,6})\$")
+LEGACY_HASH = re.compile(r"^h[0-9a-f]{16}$")
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+PATH = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:::[A-Za-z_][A-Za-z0-9_]*)+")
+V0_CRATE = re.compile(r"C(?:s[0-9A-Za-z]*_)?(\d+)")
+
+
+@dataclass
+class BinaryLayout:
+    """Allocated sections and sized symbols of a binary."""
+
+    format: str
+    sections: Dict[str, int] = field(default_factory=dict)
+    symbols: List[Tuple[str, int]] = field(default_factory=list)
+
+
+def _elf_layout(data: bytes) -> BinaryLayout:
+    is_64 = data[4] == 2
+    endian = "<" if data[5] == 1 else ">"
+
+    if is_64:
+        shoff, = struct.unpack_from(endian + "Q", data, 0x28)
+        shentsize, shnum, shstrndx = struct.unpack_from(endian + "HHH", data, 0x3A)
+        section_format = endian + "IIQQQQIIQQ"
+        symbol_format, symbol_size = endian + "IBBHQQ", 24
+    else:
+        shoff, = struct.unpack_from(endian + "I", data, 0x20)
+        shentsize, shnum, shstrndx = struct.unpack_from(endian + "HHH", data, 0x2E)
+        section_format = endian + "IIIIIIIIII"
+        symbol_format, symbol_size = endian + "IIIBBH", 16
+
+    headers = []
+    for i in range(shnum):
+        fields = struct.unpack_from(section_format, data, shoff + i * shentsize)
+        # name, type, flags, addr, offset, size, link, info, addralign, entsize
+        headers.append(fields)
+
+    names_offset = headers[shstrndx][4]
+
+    def name_at(table_offset: int, index: int) -> str:
+        end = data.index(b"\0", table_offset + index)
+        return data[table_offset + index:end].decode("utf-8", "replace")
+
+    layout = BinaryLayout(format="elf")
+    for header in headers:
+        if header[2] & SHF_ALLOC:
+            name = name_at(names_offset, header[0])
+            layout.sections[name] = layout.sections.get(name, 0) + header[5]
+
+    seen = set()
+    for header in headers:
+        if header[1] != SHT_SYMTAB:
+            continue
+        strtab_offset = headers[header[6]][4]
+        for offset in range(header[4], header[4] + header[5], symbol_size):
+            if is_64:
+                st_name, st_info, _, st_shndx, st_value, st_size = struct.unpack_from(symbol_format, data, offset)
+            else:
+                st_name, st_value, st_size, st_info, _, st_shndx = struct.unpack_from(symbol_format, data, offset)
+            if st_size == 0 or st_shndx == 0 or st_shndx >= SHN_LORESERVE:
+                continue
+            if st_info & 0xF not in (STT_OBJECT, STT_FUNC, STT_TLS):
+                continue
+            # Aliases share an address; count them once
+            if (st_shndx, st_value) in seen:
+                continue
+            seen.add((st_shndx, st_value))
+            layout.symbols.append((name_at(strtab_offset, st_name), st_size))
+    return layout
+
+
+def _macho_layout(data: bytes) -> BinaryLayout:
+    ncmds, = struct.unpack_from("<I", data, 16)
+    layout = BinaryLayout(format="macho")
+
+    # (name, start, end) in section number order, 1-based in nlist
+    sections: List[Tuple[str, int, int]] = []
+    symtab: Optional[Tuple[int, int, int, int]] = None
+    offset = 32
+    for _ in range(ncmds):
+        cmd, cmdsize = struct.unpack_from("<II", data, offset)
+        if cmd == LC_SEGMENT_64:
+            nsects, = struct.unpack_from("<I", data, offset + 64)
+            for i in range(nsects):
+                base = offset + 72 + i * 80
+                sectname = data[base:base + 16].rstrip(b"\0").decode()
+                segname = data[base + 16:base + 32].rstrip(b"\0").decode()
+                addr, size = struct.unpack_from("<QQ", data, base + 32)
+                name = f"{segname},{sectname}"
+                sections.append((name, addr, addr + size))
+                layout.sections[name] = layout.sections.get(name, 0) + size
+        elif cmd == LC_SYMTAB:
+            symtab = struct.unpack_from("<IIII", data, offset + 8)
+        offset += cmdsize
+
+    if symtab is None:
+        return layout
+
+    # nlist has no size: a symbol extends to the next one in its section
+    symoff, nsyms, stroff, _ = symtab
+    by_section: Dict[int, Dict[int, str]] = {}
+    for i in range(nsyms):
+        n_strx, n_type, n_sect, _, n_value = struct.unpack_from("<IBBHQ", data, symoff + i * 16)
+        if n_type & N_STAB or n_type & N_TYPE != N_SECT or not 0 < n_sect <= len(sections):
+            continue
+        end = data.index(b"\0", stroff + n_strx)
+        name = data[stroff + n_strx:end].decode("utf-8", "replace")
+        by_section.setdefault(n_sect, {}).setdefault(n_value, name)
+
+    for n_sect, symbols in by_section.items():
+        _, _, section_end = sections[n_sect - 1]
+        addresses = sorted(symbols)
+        for address, following in zip(addresses, addresses[1:] + [section_end]):
+            if following > address:
+                layout.symbols.append((symbols[address], following - address))
+    return layout
+
+
+def read_layout(path: Path) -> Optional[BinaryLayout]:
+    """Parse an ELF or thin 64-bit Mach-O binary, or None for other files."""
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    try:
+        if data[:4] == b"\x7fELF":
+            return _elf_layout(data)
+        if len(data) >= 4 and struct.unpack_from("<I", data)[0] == MH_MAGIC_64:
+            return _macho_layout(data)
+    except (struct.error, IndexError, ValueError):
+        return None
+    return None
+
+
+def _unescape(part: str) -> str:
+    if part.startswith("_$"):
+        part = part[1:]
+    for escape, char in ESCAPES.items():
+        part = part.replace(escape, char)
+    part = UNICODE_ESCAPE.sub(lambda m: chr(int(m.group(1), 16)), part)
+    return part.replace("..", "::")
+
+
+def rust_path(symbol: str) -> Optional[str]:
+    """
+    Demangle a Rust symbol into its path, without the hash.
+
+    Handles legacy (_ZN...E) symbols fully; for v0 (_R...) symbols only the
+    crate is recovered. Returns None for symbols that are not Rust.
+    """
+    # Mach-O prefixes C symbol names with an underscore
+    if symbol.startswith("__"):
+        symbol = symbol[1:]
+
+    if symbol.startswith("_ZN"):
+        parts = []
+        i = 3
+        while i < len(symbol) and symbol[i].isdigit():
+            j = i
+            while j < len(symbol) and symbol[j].isdigit():
+                j += 1
+            length = int(symbol[i:j])
+            parts.append(symbol[j:j + length])
+            i = j + length
+        if parts and LEGACY_HASH.match(parts[-1]):
+            parts.pop()
+        return "::".join(_unescape(p) for p in parts) or None
+
+    if symbol.startswith("_R"):
+        match = V0_CRATE.search(symbol, 2)
+        if match:
+            start = match.end()
+            return symbol[start:start + int(match.group(1))]
+
+    return None
+
+
+def crate_and_module(path: str, depth: int = 2) -> Tuple[str, str]:
+    """
+    Get the crate a demangled path belongs to, and its module path.
+
+    Trait impls (`<T as Trait>::f`) count toward the crate of the first path
+    inside the brackets, usually the implementing type. The module keeps up
+    to depth lowercase components below the crate.
+    """
+    if path.startswith("<"):
+        match = PATH.search(path)
+        components = match.group(0).split("::") if match else IDENTIFIER.findall(path)[:1]
+    else:
+        components = [c for c in path.split("::") if IDENTIFIER.fullmatch(c)]
+        # The last component is the function or static itself
+        components = components[:-1] or components
+
+    if not components:
+        return NON_RUST, NON_RUST
+    crate = components[0]
+    modules = [c for c in components[1:] if c.islower()][:depth]
+    return crate, "::".join([crate] + modules)
+
+
+@dataclass
+class SizeBreakdown:
+    """Size of a binary by crate and by module of the main crate."""
+
+    file_bytes: int
+    format: str
+    sections: Dict[str, int]
+    crates: Dict[str, int]
+    modules: Dict[str, int]
+
+    @property
+    def attributed_bytes(self) -> int:
+        return sum(self.crates.values())
+
+    def shares(self) -> Dict[str, float]:
+        """Fraction of the binary's allocated bytes per crate."""
+        total = self.attributed_bytes
+        return {crate: size / total for crate, size in self.crates.items()} if total else {}
+
+    def top(self, mapping: Dict[str, int], count: int) -> List[Tuple[str, int]]:
+        return sorted(mapping.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["crates"] = dict(self.top(self.crates, len(self.crates)))
+        data["modules"] = dict(self.top(self.modules, len(self.modules)))
+        return data
+
+
+def attribute(layout: BinaryLayout, file_bytes: int, main_crate: str = "opendir") -> SizeBreakdown:
+    """Sum symbol sizes per crate and per module of main_crate."""
+    crates: Dict[str, int] = {}
+    modules: Dict[str, int] = {}
+    for symbol, size in layout.symbols:
+        path = rust_path(symbol)
+        crate, module = crate_and_module(path) if path else (NON_RUST, NON_RUST)
+        crates[crate] = crates.get(crate, 0) + size
+        if crate == main_crate:
+            modules[module] = modules.get(module, 0) + size
+
+    allocated = sum(layout.sections.values())
+    symbols_total = sum(crates.values())
+    if allocated > symbols_total:
+        crates[UNATTRIBUTED] = allocated - symbols_total
+
+    return SizeBreakdown(
+        file_bytes=file_bytes,
+        format=layout.format,
+        sections=layout.sections,
+        crates=crates,
+        modules=modules,
+    )
+
+
+@dataclass
+class SizeBudget:
+    """Size limits a release binary must stay within."""
+
+    max_bytes: int = 0  # 0 = no limit
+    targets: Dict[str, int] = field(default_factory=dict)  # friendly_name -> max_bytes
+    # A crate's share may grow by this many percentage points between builds
+    max_share_increase: float = 2.0
+    # Growth below this is noise, whatever the share
+    min_crate_growth_bytes: int = 64 * 1024
+
+    @classmethod
+    def load(cls, path: Path) -> "SizeBudget":
+        """Read a budget file; a missing file means no limits."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(max_share_increase=0.0)
+        return cls(
+            max_bytes=int(data.get("max_bytes", 0)),
+            targets={k: int(v) for k, v in data.get("targets", {}).items()},
+            max_share_increase=float(data.get("max_share_increase", cls.max_share_increase)),
+            min_crate_growth_bytes=int(data.get("min_crate_growth_bytes", cls.min_crate_growth_bytes)),
+        )
+
+    def limit_for(self, target: str) -> int:
+        return self.targets.get(target, self.max_bytes)
+
+    def check(
+        self,
+        target: str,
+        breakdown: SizeBreakdown,
+        previous: Optional[Dict[str, Any]],
+    ) -> List[str]:
+        """Describe each way a binary exceeds the budget."""
+        violations = []
+        limit = self.limit_for(target)
+        if limit and breakdown.file_bytes > limit:
+            violations.append(
+                f"{breakdown.file_bytes / 1024 / 1024:.2f}MB exceeds the "
+                f"{limit / 1024 / 1024:.2f}MB budget"
+            )
+
+        if previous is None or self.max_share_increase <= 0:
+            return violations
+
+        before_crates: Dict[str, int] = previous.get("crates", {})
+        before_total = sum(before_crates.values())
+        if not before_total:
+            return violations
+        for crate, share in breakdown.shares().items():
+            if crate == UNATTRIBUTED:
+                continue
+            before = before_crates.get(crate, 0)
+            increase = (share - before / before_total) * 100
+            growth = breakdown.crates[crate] - before
+            if increase > self.max_share_increase and growth >= self.min_crate_growth_bytes:
+                violations.append(
+                    f"{crate} grew by {growth / 1024:.0f}KB to {share * 100:.1f}% of the binary "
+                    f"(+{increase:.1f} points, limit {self.max_share_increase:g})"
+                )
+        return violations
+
+
+class SizeHistory:
+    """Append-only size history, one JSON lines file per friendly target name."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, target: str) -> Path:
+        return self.directory / f"{target}.jsonl"
+
+    def last(self, target: str, profile: str) -> Optional[Dict[str, Any]]:
+        """Get the most recent entry of a target built with profile that was within budget."""
+        last = None
+        try:
+            with open(self._path(target), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("profile") == profile and entry.get("within_budget", True):
+                        last = entry
+        except OSError:
+            pass
+        return last
+
+    def record(
+        self,
+        target: str,
+        profile: str,
+        breakdown: SizeBreakdown,
+        inputs: Dict[str, Any],
+        within_budget: bool = True,
+    ) -> None:
+        entry = {
+            "timestamp": time.time(),
+            "profile": profile,
+            "within_budget": within_budget,
+            **inputs,
+            "file_bytes": breakdown.file_bytes,
+            "crates": breakdown.crates,
+            "modules": breakdown.modules,
+        }
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self._path(target), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
@@ -0,0 +1,282 @@
+"""
+Post-link BOLT optimization of Linux release binaries.
+"""
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .targets import Target
+from .workload import TuiWorkload
+
+if TYPE_CHECKING:
+    from .executor import BuildExecutor
+
+# Targets llvm-bolt can rewrite
+BOLT_TARGETS = ("x86_64-unknown-linux-gnu", "aarch64-unknown-linux-gnu")
+
+# BOLT needs the static relocations to move code around freely
+RELOCS_RUSTFLAGS = ["-Clink-arg=-Wl,--emit-relocs"]
+
+# The linker can't strip and keep relocations at once, so the release
+# profile's strip is turned off for the relink and done after llvm-bolt
+RELOCS_ENV = {"CARGO_PROFILE_RELEASE_STRIP": "false"}
+
+# Layout passes: hot/cold block order, call-graph function order and
+# splitting cold code out of the hot text
+BOLT_OPTIONS = [
+    "-reorder-blocks=ext-tsp",
+    "-reorder-functions=hfsort",
+    "-split-functions",
+    "-split-all-cold",
+    "-split-eh",
+    "-dyno-stats",
+]
+
+PROFILE_MODES = ("auto", "perf", "instrument")
+
+
+def find_versioned_tool(name: str, path: Optional[str]) -> Optional[Path]:
+    """
+    Find a tool on PATH, also as the name-<major> of distribution packages.
+
+    The unsuffixed name wins; otherwise the highest version is used.
+    """
+    found = shutil.which(name, path=path)
+    if found:
+        return Path(found)
+
+    pattern = re.compile(re.escape(name) + r"-(\d+)$")
+    best: Optional[Path] = None
+    best_version = -1
+    for entry in (path or "").split(os.pathsep):
+        if not entry or not os.path.isdir(entry):
+            continue
+        for candidate in os.listdir(entry):
+            match = pattern.match(candidate)
+            full = Path(entry) / candidate
+            if match and int(match.group(1)) > best_version and os.access(full, os.X_OK):
+                best, best_version = full, int(match.group(1))
+    return best
+
+
+class BoltStage:
+    """
+    Rewrites the native Linux binary with llvm-bolt before it goes to dist.
+
+    The binary is linked unstripped with --emit-relocs, profiled on the
+    scripted TUI session (sampled with perf where the CPU records branches,
+    through BOLT instrumentation otherwise) and laid out again so the hot
+    paths of the render loop share as few cache lines and pages as
+    possible, then stripped like other release binaries. Cross targets
+    cannot run the session on this host and are left as built.
+    """
+
+    def __init__(self, executor: "BuildExecutor", profile_mode: str = "auto", runs: int = 3):
+        self.executor = executor
+        self.logger = executor.logger
+        self.report = executor.report
+        self.profile_mode = profile_mode
+        self.runs = runs
+
+        self.work_dir = executor.target_dir / "bolt"
+        self.workload = TuiWorkload(executor.project_root, self.work_dir / "workload")
+
+        self.llvm_bolt: Optional[Path] = None
+        self.perf2bolt: Optional[Path] = None
+        self.perf: Optional[Path] = None
+        self.strip: Optional[Path] = None
+        self._version = ""
+
+    def _env(self) -> Dict[str, str]:
+        return self.executor.tool_installer.get_env()
+
+    def supports(self, target: Target) -> bool:
+        """Check whether a target's binary is rewritten."""
+        return target.is_native and target.rust_target in BOLT_TARGETS
+
+    def find_tools(self) -> bool:
+        """Locate llvm-bolt, a strip tool and, for sampling, perf and perf2bolt."""
+        path = self._env().get("PATH")
+        self.llvm_bolt = find_versioned_tool("llvm-bolt", path)
+        if self.llvm_bolt is None:
+            self.logger.warning("llvm-bolt not found; install LLVM's bolt package to use --bolt")
+            return False
+        self.strip = find_versioned_tool("llvm-strip", path) or find_versioned_tool("strip", path)
+        if self.strip is None:
+            self.logger.warning("Neither llvm-strip nor strip found; --bolt needs one to strip its output")
+            return False
+
+        result = subprocess.run(
+            [str(self.llvm_bolt), "--version"], capture_output=True, text=True
+        )
+        match = re.search(r"LLVM version (\S+)", result.stdout)
+        self._version = match.group(1) if match else result.stdout.strip()
+
+        if self.profile_mode != "instrument":
+            self.perf = find_versioned_tool("perf", path)
+            self.perf2bolt = find_versioned_tool("perf2bolt", path)
+            if self.perf2bolt is None and self.perf is not None:
+                # Packages without the wrapper still ship the same tool
+                self.perf2bolt = self.llvm_bolt
+        if self.profile_mode == "perf" and self.perf is None:
+            self.logger.warning("perf not found; BOLT needs it with --bolt-profile perf")
+            return False
+        return True
+
+    def fingerprint_inputs(self, targets: List[Target]) -> Dict[str, Dict[str, str]]:
+        """Inputs that set rewritten binaries apart, per rust target."""
+        value = f"{self._version}:{self.profile_mode}:{' '.join(BOLT_OPTIONS)}:stripped"
+        return {t.rust_target: {"bolt": value} for t in targets if self.supports(t)}
+
+    def relinking_executor(self, executor: "BuildExecutor", targets: List[Target]) -> "BuildExecutor":
+        """Get an executor that links the rewritten targets unstripped, with relocations kept."""
+        bolted = [t.rust_target for t in targets if self.supports(t)]
+        target_rustflags = {k: list(v) for k, v in executor.target_rustflags.items()}
+        for rust_target in bolted:
+            target_rustflags[rust_target] = target_rustflags.get(rust_target, []) + RELOCS_RUSTFLAGS
+        relinking = executor.with_rustflags(executor.target_dir / "bolt", executor.rustflags, target_rustflags)
+        for rust_target in bolted:
+            relinking.target_env.setdefault(rust_target, {}).update(RELOCS_ENV)
+        return relinking
+
+    def _branch_sampling(self) -> bool:
+        """Check that perf can record branch stacks (LBR/BRBE) here."""
+        if self.perf is None:
+            return False
+        probe = self.work_dir / "probe.data"
+        try:
+            result = subprocess.run(
+                [str(self.perf), "record", "-e", "cycles:u", "-j", "any,u", "-o", str(probe), "--", "true"],
+                capture_output=True,
+                text=True,
+            )
+        except OSError:
+            return False
+        finally:
+            probe.unlink(missing_ok=True)
+        return result.returncode == 0
+
+    def _run(self, cmd: List[str], what: str) -> bool:
+        self.logger.debug(f"Running: {' '.join(cmd)}")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            self.logger.error(f"{what} failed: {result.stderr.strip()[-2000:]}")
+            return False
+        return True
+
+    def _collect_profile(self, binary: Path, stage_dir: Path) -> Optional[Path]:
+        """Run the session against binary and convert what it recorded to .fdata."""
+        fdata = stage_dir / "profile.fdata"
+        fdata.unlink(missing_ok=True)
+
+        mode = self.profile_mode
+        lbr = mode != "instrument" and self._branch_sampling()
+        if mode == "auto":
+            mode = "perf" if lbr else "instrument"
+        self.logger.info(f"Collecting BOLT profile ({mode}{', branch stacks' if lbr else ''})...")
+
+        if mode == "perf":
+            perf_data = stage_dir / "perf.data"
+            record = [str(self.perf), "record", "-e", "cycles:u", "-o", str(perf_data)]
+            if lbr:
+                record.extend(["-j", "any,u"])
+            run = self.workload.run(binary, self._env(), prefix=[*record, "--"])
+            if run.returncode != 0:
+                self.logger.error(f"Profiling workload exited with status {run.returncode}")
+                return None
+
+            convert = [str(self.perf2bolt), str(binary), "-p", str(perf_data), "-o", str(fdata)]
+            if self.perf2bolt == self.llvm_bolt:
+                convert.insert(2, "-aggregate-only")
+            if not lbr:
+                convert.append("-nl")
+            if not self._run(convert, "perf2bolt"):
+                return None
+        else:
+            instrumented = stage_dir / "opendir-instrumented"
+            if not self._run(
+                [
+                    str(self.llvm_bolt), str(binary), "-instrument",
+                    f"-instrumentation-file={fdata}", "-o", str(instrumented),
+                ],
+                "llvm-bolt -instrument",
+            ):
+                return None
+            run = self.workload.run(instrumented, self._env())
+            if run.returncode != 0:
+                self.logger.error(f"Profiling workload exited with status {run.returncode}")
+                return None
+
+        if not fdata.exists():
+            self.logger.error("Profiling workload produced no BOLT profile")
+            return None
+        return fdata
+
+    def optimize(self, target: Target, binary: Path) -> Optional[Path]:
+        """Profile and rewrite a built binary, returning the optimized copy."""
+        stage_dir = self.work_dir / target.friendly_name
+        stage_dir.mkdir(parents=True, exist_ok=True)
+
+        # Keep the input: cargo may relink over it on the next build
+        original = stage_dir / "opendir"
+        shutil.copy2(binary, original)
+
+        with self.report.phase("bolt_profile", target.friendly_name):
+            fdata = self._collect_profile(original, stage_dir)
+        if fdata is None:
+            return None
+
+        # llvm-bolt rewrites its output in place, which would reach into a
+        # dist binary hardlinked to it
+        optimized = stage_dir / "opendir-bolt"
+        optimized.unlink(missing_ok=True)
+        self.logger.info(f"Running llvm-bolt on {target.friendly_name}...")
+        with self.report.phase("bolt_rewrite", target.friendly_name):
+            ok = self._run(
+                [str(self.llvm_bolt), str(original), "-o", str(optimized), f"-data={fdata}", *BOLT_OPTIONS],
+                "llvm-bolt",
+            )
+        if not ok:
+            return None
+
+        self.logger.success(f"BOLT-optimized {target.friendly_name}")
+        self.measure(target, original, optimized)
+
+        stripped = stage_dir / "opendir-bolt-stripped"
+        stripped.unlink(missing_ok=True)
+        if not self._run([str(self.strip), "--strip-all", str(optimized), "-o", str(stripped)], "strip"):
+            return None
+        return stripped
+
+    def measure(self, target: Target, original: Path, optimized: Path) -> Optional[Dict[str, float]]:
+        """Compare the binary before and after BOLT on the workload."""
+        self.logger.info(f"Measuring BOLT speedup ({self.runs} runs each)...")
+        with self.report.phase("bolt_benchmark", target.friendly_name):
+            before = self.workload.benchmark(original, self.runs)
+            after = self.workload.benchmark(optimized, self.runs)
+
+        if before.returncode != 0 or after.returncode != 0 or after.cpu_seconds <= 0:
+            self.logger.warning("BOLT benchmark did not complete")
+            return None
+
+        summary = {
+            "before_cpu_seconds": round(before.cpu_seconds, 3),
+            "after_cpu_seconds": round(after.cpu_seconds, 3),
+            "before_seconds": round(before.seconds, 3),
+            "after_seconds": round(after.seconds, 3),
+            "speedup": round(before.cpu_seconds / after.cpu_seconds, 3),
+            "before_max_rss_bytes": before.max_rss_bytes,
+            "after_max_rss_bytes": after.max_rss_bytes,
+            "before_size": original.stat().st_size,
+            "after_size": optimized.stat().st_size,
+            "runs": self.runs,
+        }
+        self.report.add_section("bolt", target.friendly_name, summary)
+        self.logger.info(
+            f"BOLT: workload CPU time {before.cpu_seconds:.2f}s -> {after.cpu_seconds:.2f}s "
+            f"({(summary['speedup'] - 1) * 100:+.1f}% speed)"
+        )
+        return summary
@@ -0,0 +1,198 @@
+"""
+Compressed release bundles (.tar.zst, .tar.xz) of dist binaries.
+"""
+import io
+import lzma
+import os
+import shutil
+import subprocess
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .report import BuildReport
+
+# Name of the binary inside every bundle
+BUNDLED_NAME = "opendir"
+
+# Levels tried by the benchmark, per bundle format
+CANDIDATE_LEVELS = {"zst": [3, 9, 15, 19], "xz": [3, 6, 9]}
+
+# Download speed the level choice optimizes for: a poor link, in bytes/s
+REFERENCE_LINK_SPEED = 1024 * 1024
+
+
+def remove_bundles(binary: Path) -> None:
+    """Delete the bundles of a binary that is being replaced."""
+    for format in CANDIDATE_LEVELS:
+        BundleMaker.bundle_path(binary, format).unlink(missing_ok=True)
+
+
+@dataclass
+class LevelResult:
+    """Size and speed of one format and level on the sample binary."""
+
+    format: str
+    level: int
+    size: int
+    compress_seconds: float
+    decompress_seconds: float
+
+    @property
+    def install_seconds(self) -> float:
+        """Download at the reference link speed plus decompression."""
+        return self.size / REFERENCE_LINK_SPEED + self.decompress_seconds
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "size": self.size,
+            "compress_seconds": round(self.compress_seconds, 3),
+            "decompress_seconds": round(self.decompress_seconds, 4),
+            "install_seconds": round(self.install_seconds, 3),
+        }
+
+
+def tar_bytes(binary: Path) -> bytes:
+    """Get an uncompressed tar holding the binary as an executable `opendir`."""
+    stat = binary.stat()
+    info = tarfile.TarInfo(BUNDLED_NAME)
+    info.size = stat.st_size
+    info.mode = 0o755
+    info.mtime = int(stat.st_mtime)
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        with open(binary, "rb") as f:
+            tar.addfile(info, f)
+    return buffer.getvalue()
+
+
+class Compressor:
+    """
+    Compresses with the zstd and xz command line tools, multithreaded.
+
+    Without the xz tool, xz bundles come from Python's lzma module on one
+    thread; without zstd, no zst bundles are made.
+    """
+
+    def __init__(self):
+        self.tools = {"zst": shutil.which("zstd"), "xz": shutil.which("xz")}
+
+    def formats(self) -> List[str]:
+        return [f for f in CANDIDATE_LEVELS if self.tools[f] or f == "xz"]
+
+    def _command(self, format: str, level: int, threads: int, decompress: bool = False) -> List[str]:
+        tool = self.tools[format]
+        assert tool is not None
+        if decompress:
+            return [tool, "-d", "-c", "-q"]
+        return [tool, "-q", "-c", f"-{level}", f"-T{threads}"]
+
+    def compress(self, data: bytes, format: str, level: int, threads: int) -> bytes:
+        if self.tools[format] is None:
+            return lzma.compress(data, preset=level)
+        result = subprocess.run(
+            self._command(format, level, threads), input=data, capture_output=True, check=True
+        )
+        return result.stdout
+
+    def decompress_seconds(self, data: bytes, format: str) -> float:
+        """Time a single-threaded decompression, as on a user's machine."""
+        started = time.perf_counter()
+        if self.tools[format] is None:
+            lzma.decompress(data)
+        else:
+            subprocess.run(
+                self._command(format, 0, 1, decompress=True),
+                input=data,
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+        return time.perf_counter() - started
+
+
+class BundleMaker:
+    """
+    Writes opendir-<target>.tar.zst and .tar.xz next to each dist binary.
+
+    The level of each format is picked by a benchmark on the largest binary:
+    every candidate level is compressed and decompressed once, and the one
+    with the shortest download (at REFERENCE_LINK_SPEED) plus decompression
+    wins. Bundles are then compressed concurrently, each compressor using a
+    share of the job budget as threads.
+    """
+
+    def __init__(self, threads: int):
+        self.threads = max(1, threads)
+        self.compressor = Compressor()
+
+    def benchmark(self, sample: Path) -> Tuple[Dict[str, int], List[LevelResult]]:
+        """Get the chosen level per format and every measurement."""
+        data = tar_bytes(sample)
+        measurements: List[LevelResult] = []
+        chosen: Dict[str, int] = {}
+        for format in self.compressor.formats():
+            results = []
+            for level in CANDIDATE_LEVELS[format]:
+                started = time.perf_counter()
+                compressed = self.compressor.compress(data, format, level, self.threads)
+                compress_seconds = time.perf_counter() - started
+                results.append(LevelResult(
+                    format=format,
+                    level=level,
+                    size=len(compressed),
+                    compress_seconds=compress_seconds,
+                    decompress_seconds=self.compressor.decompress_seconds(compressed, format),
+                ))
+            chosen[format] = min(results, key=lambda r: r.install_seconds).level
+            measurements.extend(results)
+        return chosen, measurements
+
+    @staticmethod
+    def bundle_path(binary: Path, format: str) -> Path:
+        return binary.with_name(f"{binary.name}.tar.{format}")
+
+    def _write(self, binary: Path, format: str, level: int, threads: int) -> Path:
+        dest = self.bundle_path(binary, format)
+        data = self.compressor.compress(tar_bytes(binary), format, level, threads)
+        tmp_path = dest.with_name(f".{dest.name}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, dest)
+        return dest
+
+    def is_current(self, binary: Path, format: str) -> bool:
+        """Check that a bundle exists and is newer than its binary."""
+        try:
+            return self.bundle_path(binary, format).stat().st_mtime >= binary.stat().st_mtime
+        except OSError:
+            return False
+
+    def refresh(self, binaries: List[Path], report: BuildReport) -> List[Path]:
+        """
+        Bring the bundles of the binaries up to date.
+
+        Benchmarks levels only when a bundle has to be written, and records
+        the measurements in the report's "bundle_levels" section.
+        """
+        stale = [
+            b for b in binaries
+            if not all(self.is_current(b, f) for f in self.compressor.formats())
+        ]
+        if not stale:
+            return []
+        levels, measurements = self.benchmark(max(stale, key=lambda p: p.stat().st_size))
+        for result in measurements:
+            report.add_section("bundle_levels", f"{result.format}-{result.level}", result.to_dict())
+        report.add_section("bundle_levels", "chosen", levels)
+        return self.make(stale, levels)
+
+    def make(self, binaries: List[Path], levels: Dict[str, int]) -> List[Path]:
+        """Compress every binary into a bundle of every format, concurrently."""
+        jobs = [(b, f) for b in binaries for f in levels if not self.is_current(b, f)]
+        if not jobs:
+            return []
+        threads = max(1, self.threads // len(jobs))
+        with ThreadPoolExecutor(max_workers=min(len(jobs), self.threads)) as pool:
+            return list(pool.map(lambda job: self._write(job[0], job[1], levels[job[1]], threads), jobs))
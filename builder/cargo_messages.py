@@ -0,0 +1,254 @@
+"""
+Incremental parsing of cargo's JSON message stream.
+"""
+import json
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Cargo status lines on stderr that carry no diagnostic information
+STATUS_LINE = re.compile(
+    r"^\s+(Compiling|Checking|Fresh|Finished|Running|Blocking|Updating|Locking|"
+    r"Adding|Downloading|Downloaded|Documenting)\b"
+)
+COMPILING_LINE = re.compile(r"^\s+(?:Compiling|Checking) (\S+) v")
+COULD_NOT_COMPILE = re.compile(r"^error: could not compile `([^`]+)`")
+# Header and primary location of a rendered rustc error
+ERROR_HEADER = re.compile(r"^error(?:\[(E\d+)\])?: (?!could not compile|aborting due to)")
+WARNING_HEADER = re.compile(r"^warning(?:\[\w+\])?: ")
+SPAN_LINE = re.compile(r"^\s*--> (.+?):(\d+):\d+$")
+# Errors that depend on the target rather than on the shared source
+TARGET_ERROR_CODES = {"E0463"}  # can't find crate, e.g. std of a missing target
+TARGET_ERROR_LINE = re.compile(
+    r"^error: (linking with|linker `|could not find native static library|"
+    r"failed to run custom build command)"
+)
+# Conditions on the target inside cfg attributes and cfg! checks
+CFG_CONDITION = re.compile(r"\bcfg(?:_attr)?!?\s*\(.*\b(target_\w+|unix|windows)\b")
+
+
+@dataclass
+class ProgressEvent:
+    """Progress of a running cargo build."""
+
+    compiled: int  # Units finished so far
+    total: Optional[int]  # Expected number of units, if known
+    crate: Optional[str]  # Crate currently being compiled
+    elapsed: float  # Seconds since the build started
+
+
+def iter_messages(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Decode cargo JSON messages, one per line, skipping anything else."""
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(message, dict):
+            yield message
+
+
+class CargoMessageStream:
+    """
+    Follows a cargo build run with --message-format=json-render-diagnostics.
+
+    Structured messages arrive on stdout; with json-render-diagnostics cargo
+    renders compiler diagnostics onto stderr, so only a bounded tail of those
+    lines is kept for the failure summary.
+    """
+
+    def __init__(
+        self,
+        binary_name: str = "opendir",
+        total_units: Optional[int] = None,
+        max_diagnostics: int = 200,
+    ):
+        self.binary_name = binary_name
+        self.total_units = total_units
+        self.started = time.monotonic()
+
+        self.compiled = 0
+        self.current_crate: Optional[str] = None
+        self.executable: Optional[Path] = None
+        self.success: Optional[bool] = None
+        self.failed_crates: List[str] = []
+        self.diagnostics: Deque[str] = deque(maxlen=max_diagnostics)
+        # Primary (file, line) of each rustc error, and whether any error
+        # depends on the target (linker, missing std, build scripts)
+        self.error_spans: List[Tuple[str, int]] = []
+        self.target_errors = False
+        self._error_open = False
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def _progress(self) -> ProgressEvent:
+        return ProgressEvent(
+            compiled=self.compiled,
+            total=self.total_units,
+            crate=self.current_crate,
+            elapsed=self.elapsed,
+        )
+
+    def feed_stdout(self, lines: Iterable[str]) -> Iterator[ProgressEvent]:
+        """Consume cargo's JSON stdout, yielding a progress event per unit."""
+        for message in iter_messages(lines):
+            reason = message.get("reason")
+
+            if reason == "compiler-artifact":
+                target = message.get("target", {})
+                kinds = target.get("kind", [])
+                # Build scripts are compiled and run as separate units
+                if "custom-build" in kinds:
+                    continue
+
+                self.compiled += 1
+                executable = message.get("executable")
+                if executable and "bin" in kinds and target.get("name") == self.binary_name:
+                    self.executable = Path(executable)
+                yield self._progress()
+
+            elif reason == "build-finished":
+                self.success = bool(message.get("success"))
+
+    def feed_stderr(self, lines: Iterable[str]) -> Iterator[str]:
+        """Consume cargo's stderr, yielding each diagnostic line."""
+        for line in lines:
+            line = line.rstrip("\n")
+
+            match = COMPILING_LINE.match(line)
+            if match:
+                self.current_crate = match.group(1)
+                continue
+            if STATUS_LINE.match(line):
+                continue
+
+            match = COULD_NOT_COMPILE.match(line)
+            if match:
+                self.failed_crates.append(match.group(1))
+            self._track_error(line)
+
+            self.diagnostics.append(line)
+            yield line
+
+    def _track_error(self, line: str) -> None:
+        match = ERROR_HEADER.match(line)
+        if match:
+            self._error_open = True
+            if match.group(1) in TARGET_ERROR_CODES or TARGET_ERROR_LINE.match(line):
+                self.target_errors = True
+            return
+        if WARNING_HEADER.match(line):
+            self._error_open = False
+            return
+        match = SPAN_LINE.match(line)
+        if match and self._error_open:
+            self.error_spans.append((match.group(1), int(match.group(2))))
+            self._error_open = False
+
+    def shared_error(self, project_root: Path) -> bool:
+        """
+        Check whether the build failed on an error every target would hit.
+
+        That is a rustc error in the project's own sources, outside code
+        gated on the target by cfg. Linker, build script and missing std
+        errors, errors in dependencies and errors without a location count
+        as specific to the target.
+        """
+        if self.target_errors or not self.failed_crates or not self.error_spans:
+            return False
+        for file, line in self.error_spans:
+            path = Path(file)
+            if path.is_absolute():
+                return False
+            try:
+                source = (project_root / path).read_text(encoding="utf-8", errors="replace")
+            except OSError:
+                return False
+            if cfg_gated(source.splitlines(), line):
+                return False
+        return True
+
+    def summary(self, max_lines: Optional[int] = None) -> str:
+        """Get the retained diagnostic lines as one string."""
+        lines = list(self.diagnostics)
+        if max_lines is not None:
+            lines = lines[-max_lines:]
+        return "\n".join(lines)
+
+
+def cfg_gated(lines: List[str], line_no: int) -> bool:
+    """
+    Check whether a source line sits inside code gated on the target.
+
+    Walks up from the line through its enclosing items and blocks, by
+    indentation, looking at their headers and the attributes above them,
+    and at inner cfg attributes of the file.
+    """
+    if any(line.startswith("#![cfg") and CFG_CONDITION.search(line) for line in lines):
+        return True
+    if not 0 < line_no <= len(lines):
+        return False
+
+    def indent(text: str) -> int:
+        return len(text) - len(text.lstrip())
+
+    level = indent(lines[line_no - 1])
+    if CFG_CONDITION.search(lines[line_no - 1]):
+        return True
+    index = line_no - 2
+    while index >= 0 and level > 0:
+        text = lines[index]
+        if text.strip() and indent(text) < level:
+            # Header of the enclosing item or block
+            level = indent(text)
+            if CFG_CONDITION.search(text):
+                return True
+            # Attributes of the enclosing item
+            while index > 0 and lines[index - 1].strip().startswith("#["):
+                index -= 1
+                if CFG_CONDITION.search(lines[index]):
+                    return True
+        index -= 1
+    # Attributes of the top-level item
+    while index >= 0 and lines[index].strip().startswith(("#[", "//")):
+        if CFG_CONDITION.search(lines[index]):
+            return True
+        index -= 1
+    return False
+
+
+def count_build_units(metadata: Dict[str, Any]) -> Optional[int]:
+    """
+    Count the packages a build compiles from `cargo metadata` output.
+
+    Walks normal and build dependencies from the workspace root; each
+    package produces one compiler-artifact message.
+    """
+    resolve = metadata.get("resolve") or {}
+    root = resolve.get("root")
+    nodes = {node["id"]: node for node in resolve.get("nodes", [])}
+    if root is None or root not in nodes:
+        return None
+
+    seen = set()
+    stack = [root]
+    while stack:
+        package_id = stack.pop()
+        if package_id in seen:
+            continue
+        seen.add(package_id)
+
+        for dep in nodes.get(package_id, {}).get("deps", []):
+            kinds = [k.get("kind") for k in dep.get("dep_kinds", [])]
+            if not kinds or any(kind in (None, "build") for kind in kinds):
+                stack.append(dep["pkg"])
+
+    return len(seen)
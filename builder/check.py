@@ -0,0 +1,212 @@
+"""
+Type-checking of every target with one `cargo check` run.
+"""
+import subprocess
+import threading
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .cargo_messages import CargoMessageStream, iter_messages
+from .config import BuildConfig
+from .logger import Logger
+from .report import BuildReport, ProcessUsage, max_rss_bytes, read_package_version, wait_with_usage
+from .targets import Target, TargetManager
+from .tools import ToolInstaller
+from .vendor import CrateVendor
+
+
+@dataclass
+class CheckResult:
+    """Result of type-checking one target."""
+
+    target: Target
+    success: bool
+    seconds: Optional[float] = None  # Until the target's own crate was checked
+
+
+class TargetChecker:
+    """
+    Type-checks several targets at once, without codegen or linking.
+
+    All targets go to a single `cargo check` with one --target per triple:
+    cargo then checks them concurrently under one job limit, in one shared
+    target directory, and builds host build scripts and proc macros once.
+    With --keep-going every target is checked as far as it gets; a target
+    passed when the binary crate's metadata for its triple was produced.
+    """
+
+    def __init__(
+        self,
+        config: BuildConfig,
+        project_root: Path,
+        tool_installer: ToolInstaller,
+        logger: Logger,
+        report: BuildReport,
+        binary_name: str = "opendir",
+    ):
+        self.config = config
+        self.project_root = project_root
+        self.tool_installer = tool_installer
+        self.logger = logger
+        self.report = report
+        self.binary_name = binary_name
+        self.target_dir = project_root / "target" / "check"
+
+    def _command(self, targets: List[Target]) -> List[str]:
+        cmd = ["cargo", "check", "--bins", "--keep-going"]
+        if self.config.release:
+            cmd.append("--release")
+        for target in targets:
+            cmd.extend(["--target", target.rust_target])
+        if self.config.jobs > 0:
+            cmd.extend(["--jobs", str(self.config.jobs)])
+        cmd.append("--message-format=json-render-diagnostics")
+        if self.config.offline:
+            cmd.extend(CrateVendor(self.config, self.project_root).cargo_args())
+        return cmd
+
+    def _triple_of(self, filename: str, triples: List[str]) -> Optional[str]:
+        """Get the rust target an artifact was checked for, from its path."""
+        try:
+            parts = Path(filename).relative_to(self.target_dir).parts
+        except ValueError:
+            return None
+        return parts[0] if parts and parts[0] in triples else None
+
+    def check(self, targets: List[Target]) -> List[CheckResult]:
+        """Check all targets, reporting each one's time as it passes."""
+        triples = [t.rust_target for t in targets]
+        by_triple = {t.rust_target: t for t in targets}
+        passed: Dict[str, float] = {}
+
+        env = self.tool_installer.get_env()
+        env["CARGO_TARGET_DIR"] = str(self.target_dir)
+        if self.config.offline:
+            env.update(CrateVendor(self.config, self.project_root).env())
+
+        cmd = self._command(targets)
+        stream = CargoMessageStream(binary_name=self.binary_name)
+        self.logger.debug(f"Running: {' '.join(cmd)}")
+
+        try:
+            process = subprocess.Popen(
+                cmd,
+                cwd=self.project_root,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors="replace",
+            )
+        except OSError as e:
+            self.logger.error(f"cargo check failed: {e}")
+            return [CheckResult(target=t, success=False) for t in targets]
+
+        # Drain stderr concurrently so neither pipe can fill up
+        stderr_reader = threading.Thread(
+            target=lambda: deque(stream.feed_stderr(process.stderr), maxlen=0),
+            daemon=True,
+        )
+        stderr_reader.start()
+
+        for message in iter_messages(process.stdout):
+            if message.get("reason") != "compiler-artifact":
+                continue
+            crate = message.get("target", {})
+            if crate.get("name") != self.binary_name or "bin" not in crate.get("kind", []):
+                continue
+            for filename in message.get("filenames", []):
+                triple = self._triple_of(filename, triples)
+                if triple is not None and triple not in passed:
+                    passed[triple] = stream.elapsed
+                    self.logger.success(
+                        f"Checked: {by_triple[triple].friendly_name} ({passed[triple]:.1f}s)"
+                    )
+
+        stderr_reader.join()
+        returncode, rusage = wait_with_usage(process)
+        if rusage is not None:
+            self.report.record_process(ProcessUsage(
+                target=",".join(t.friendly_name for t in targets),
+                command="cargo check",
+                seconds=stream.elapsed,
+                user_seconds=rusage.ru_utime,
+                system_seconds=rusage.ru_stime,
+                max_rss_bytes=max_rss_bytes(rusage),
+                returncode=returncode,
+            ))
+
+        results = [
+            CheckResult(target=t, success=t.rust_target in passed, seconds=passed.get(t.rust_target))
+            for t in targets
+        ]
+        for result in results:
+            if not result.success:
+                self.logger.error(f"Check failed for {result.target.friendly_name}")
+            self.report.add_section("check", result.target.friendly_name, {
+                "success": result.success,
+                "seconds": round(result.seconds, 3) if result.seconds is not None else None,
+            })
+        if returncode != 0 and any(not r.success for r in results):
+            for line in stream.summary(max_lines=40).split("\n"):
+                if line.strip():
+                    self.logger.info(f"  {line}")
+        return results
+
+
+def run_check(
+    config: BuildConfig,
+    project_root: Path,
+    targets: List[str],
+    logger: Logger,
+    report: Optional[BuildReport] = None,
+) -> bool:
+    """
+    Type-check the given targets without building binaries.
+
+    Only the rust targets are installed: checking needs neither a linker
+    nor the zig and macOS SDK cross-compilation tools.
+
+    Returns:
+        True if every target passed
+    """
+    if report is None:
+        report = BuildReport()
+    report.version = read_package_version(project_root)
+
+    tool_installer = ToolInstaller(config, project_root, logger)
+    target_manager = TargetManager(config, logger, env=tool_installer.get_env())
+
+    resolved_targets = target_manager.resolve_targets(targets)
+    if not resolved_targets:
+        logger.error("No valid targets specified")
+        return False
+
+    logger.info(f"Checking {len(resolved_targets)} target(s):")
+    for target in resolved_targets:
+        logger.target(target.friendly_name, target.rust_target)
+    logger.newline()
+
+    with report.phase("ensure_targets"):
+        if not target_manager.ensure_targets(resolved_targets):
+            logger.warning("Some targets could not be installed")
+
+    checker = TargetChecker(config, project_root, tool_installer, logger, report)
+    with report.phase("check"):
+        results = checker.check(resolved_targets)
+
+    report.write(project_root / config.dist_dir / "check-report.json")
+    headers = ["Target", "Result", "Time"]
+    rows = [
+        [
+            r.target.friendly_name,
+            "ok" if r.success else "failed",
+            f"{r.seconds:.1f}s" if r.seconds is not None else "-",
+        ]
+        for r in results
+    ]
+    logger.table(headers, rows)
+
+    return all(r.success for r in results)
@@ -4,6 +4,7 @@ Build configuration for OPENDIR Rust project.
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import List, Optional
+import os
 import platform
 
 
@@ -19,10 +20,36 @@ class BuildConfig:
     builder_dir: Path = field(default_factory=lambda: Path("builder"))
     tools_dir: Path = field(default_factory=lambda: Path("builder/tools"))
     dist_dir: Path = field(default_factory=lambda: Path("dist"))
+    cache_dir: Path = field(default_factory=lambda: Path("builder/cache"))
 
     # Build settings
     release: bool = True
     clean: bool = False
+    force: bool = False  # Rebuild targets even if their inputs are unchanged
+    resume: bool = False  # Only build targets that failed or changed since the last run
+    fail_fast: bool = False  # Cancel the other targets on an error in shared sources
+    offline: bool = False  # Resolve crates from vendor_dir only, without network
+    vendor_dir: Path = field(default_factory=lambda: Path("builder/vendor"))
+    artifact_cache_size_mb: int = 2048  # Release binary cache size, 0 = disabled
+    rustc_cache_size_mb: int = 10240  # Compiled crate cache size, 0 = disabled
+    tool_cache_dir: Optional[Path] = None  # Host-wide tool archive cache, None = $XDG_CACHE_HOME/opendir-builder
+    tool_cache_size_mb: int = 4096  # Tool cache size kept by --cache-gc
+    tool_cache_max_age_days: int = 90  # Tool cache entries unused this long go on --cache-gc
+    stream_tools: bool = True  # Extract tool archives while downloading them, without storing them
+    timings: bool = False  # Collect cargo --timings data and analyze it
+    pgo: bool = False  # Profile the native binary and rebuild with the profile
+    bolt: bool = False  # Rewrite native Linux binaries with llvm-bolt
+    bolt_profile: str = "auto"  # BOLT profile source: auto, perf or instrument
+    fast: bool = False  # Dev build with a fast linker, split debuginfo and incremental
+    size_report: bool = False  # Attribute binary size to crates and check the budget
+    size_budget: Path = field(default_factory=lambda: Path("builder/size-budget.json"))
+    bundle: bool = False  # Write .tar.zst/.tar.xz bundles next to the dist binaries
+    deltas_from: Optional[Path] = None  # Previous release's dist dir to write patches from
+
+    # Parallelism
+    max_parallel_targets: int = 0  # 0 = pick automatically from the job budget
+    jobs: int = 0  # Global job budget shared by all cargo processes, 0 = CPU count
+    test_shards: int = 0  # Concurrent test processes of --test, 0 = job budget
 
     # Target platforms
     targets: List[str] = field(default_factory=list)
@@ -56,6 +83,26 @@ class BuildConfig:
             return "macos"
         return system
 
+    @property
+    def job_budget(self) -> int:
+        if self.jobs > 0:
+            return self.jobs
+        return os.cpu_count() or 1
+
+    @property
+    def times_links(self) -> bool:
+        """Whether builds record link times: to compare --fast with regular builds."""
+        return self.fast or self.timings
+
+    def parallel_targets(self, target_count: int) -> int:
+        """Number of targets to build concurrently."""
+        if self.max_parallel_targets > 0:
+            limit = self.max_parallel_targets
+        else:
+            # Leave each concurrent build a few job slots to work with
+            limit = max(1, self.job_budget // 4)
+        return max(1, min(target_count, limit))
+
     def __post_init__(self):
         # Convert string paths to Path objects if needed
         if isinstance(self.builder_dir, str):
@@ -64,6 +111,12 @@ class BuildConfig:
             self.tools_dir = Path(self.tools_dir)
         if isinstance(self.dist_dir, str):
             self.dist_dir = Path(self.dist_dir)
+        if isinstance(self.cache_dir, str):
+            self.cache_dir = Path(self.cache_dir)
+        if isinstance(self.size_budget, str):
+            self.size_budget = Path(self.size_budget)
+        if isinstance(self.tool_cache_dir, str):
+            self.tool_cache_dir = Path(self.tool_cache_dir)
 
 
 # Available Rust targets
@@ -0,0 +1,298 @@
+"""
+Binary delta patches (BSDIFF40) between two releases' dist binaries.
+"""
+import bz2
+import hashlib
+import json
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .bundle import REFERENCE_LINK_SPEED
+from .report import read_package_version
+
+PATCH_MAGIC = b"BSDIFF40"
+HEADER = struct.Struct("<8sQQQ")
+
+# Every SAMPLE_STEP-th suffix of the old file is indexed, sorted by its first
+# KEY_BYTES bytes. A match the index misses at one new position is found
+# within SAMPLE_STEP positions, where it starts on a sampled suffix.
+SAMPLE_STEP = 8
+KEY_BYTES = 32
+# Bytes compared at once when measuring match lengths
+COMPARE_CHUNK = 256
+
+
+def _offout(value: int) -> bytes:
+    """Encode an int64 the way bsdiff does: sign and magnitude, little-endian."""
+    encoded = abs(value)
+    if value < 0:
+        encoded |= 1 << 63
+    return encoded.to_bytes(8, "little")
+
+
+def _offin(data: bytes, offset: int) -> int:
+    value = int.from_bytes(data[offset:offset + 8], "little")
+    if value & (1 << 63):
+        return -(value & ~(1 << 63))
+    return value
+
+
+def _equal_bytes(a: bytes, b: bytes) -> int:
+    """Count the positions where two equally long byte strings agree."""
+    if not a:
+        return 0
+    xor = int.from_bytes(a, "little") ^ int.from_bytes(b, "little")
+    return xor.to_bytes(len(a), "little").count(0)
+
+
+def _match_length(old: bytes, old_pos: int, new: bytes, new_pos: int) -> int:
+    """Length of the common prefix of old[old_pos:] and new[new_pos:]."""
+    length = 0
+    limit = min(len(old) - old_pos, len(new) - new_pos)
+    while length < limit:
+        size = min(COMPARE_CHUNK, limit - length)
+        a = old[old_pos + length:old_pos + length + size]
+        b = new[new_pos + length:new_pos + length + size]
+        if a == b:
+            length += size
+            continue
+        for x, y in zip(a, b):
+            if x != y:
+                break
+            length += 1
+        break
+    return length
+
+
+class SuffixIndex:
+    """Sparse suffix array of the old file, for longest-match searches."""
+
+    def __init__(self, old: bytes, step: int = SAMPLE_STEP):
+        self.old = old
+        self.suffixes = sorted(range(0, len(old), step), key=lambda i: old[i:i + KEY_BYTES])
+
+    def search(self, new: bytes, new_pos: int) -> Tuple[int, int]:
+        """Get (old position, length) of the longest indexed match of new[new_pos:]."""
+        old = self.old
+        key = new[new_pos:new_pos + KEY_BYTES]
+        lo, hi = 0, len(self.suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if old[self.suffixes[mid]:self.suffixes[mid] + KEY_BYTES] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        best_pos, best_len = 0, 0
+        for index in (lo - 1, lo):
+            if 0 <= index < len(self.suffixes):
+                pos = self.suffixes[index]
+                length = _match_length(old, pos, new, new_pos)
+                if length > best_len:
+                    best_pos, best_len = pos, length
+        return best_pos, best_len
+
+
+def diff(old: bytes, new: bytes) -> bytes:
+    """
+    Make a BSDIFF40 patch from old to new, as bsdiff 4 does.
+
+    The patch applies with the stock bspatch tool and with apply_patch().
+    Matches come from a sparse suffix array instead of a full one, which
+    keeps the index fast to build in Python at a small cost in patch size.
+    """
+    index = SuffixIndex(old)
+    old_size, new_size = len(old), len(new)
+    ctrl, diff_block, extra_block = bytearray(), bytearray(), bytearray()
+
+    scan = length = pos = 0
+    last_scan = last_pos = last_offset = 0
+    while scan < new_size:
+        old_score = 0
+        scan += length
+        scsc = scan
+        while scan < new_size:
+            pos, length = index.search(new, scan)
+            # Bytes the current alignment (last_offset) already matches
+            start = max(scsc, -last_offset)
+            end = min(scan + length, old_size - last_offset)
+            if end > start:
+                old_score += _equal_bytes(old[start + last_offset:end + last_offset], new[start:end])
+            scsc = max(scsc, scan + length)
+            if (length == old_score and length != 0) or length > old_score + 8:
+                break
+            if scan + last_offset < old_size and old[scan + last_offset] == new[scan]:
+                old_score -= 1
+            scan += 1
+
+        if length != old_score or scan == new_size:
+            # Extend the previous match forward, approximately
+            s = best = len_f = 0
+            span = min(scan - last_scan, old_size - last_pos)
+            for i, (x, y) in enumerate(zip(old[last_pos:last_pos + span], new[last_scan:last_scan + span]), 1):
+                if x == y:
+                    s += 1
+                if s * 2 - i > best * 2 - len_f:
+                    best, len_f = s, i
+
+            # Extend the new match backward, approximately
+            len_b = 0
+            if scan < new_size:
+                s = best = 0
+                for i in range(1, min(scan - last_scan, pos) + 1):
+                    if old[pos - i] == new[scan - i]:
+                        s += 1
+                    if s * 2 - i > best * 2 - len_b:
+                        best, len_b = s, i
+
+            # Split an overlap where it scores best
+            if last_scan + len_f > scan - len_b:
+                overlap = (last_scan + len_f) - (scan - len_b)
+                s = best = lens = 0
+                for i in range(overlap):
+                    if new[last_scan + len_f - overlap + i] == old[last_pos + len_f - overlap + i]:
+                        s += 1
+                    if new[scan - len_b + i] == old[pos - len_b + i]:
+                        s -= 1
+                    if s > best:
+                        best, lens = s, i + 1
+                len_f += lens - overlap
+                len_b -= lens
+
+            diff_block.extend(
+                (n - o) & 0xFF
+                for n, o in zip(new[last_scan:last_scan + len_f], old[last_pos:last_pos + len_f])
+            )
+            extra_length = (scan - len_b) - (last_scan + len_f)
+            extra_block.extend(new[last_scan + len_f:last_scan + len_f + extra_length])
+            ctrl.extend(_offout(len_f))
+            ctrl.extend(_offout(extra_length))
+            ctrl.extend(_offout((pos - len_b) - (last_pos + len_f)))
+
+            last_scan = scan - len_b
+            last_pos = pos - len_b
+            last_offset = pos - scan
+
+    ctrl_bz = bz2.compress(bytes(ctrl))
+    diff_bz = bz2.compress(bytes(diff_block))
+    extra_bz = bz2.compress(bytes(extra_block))
+    return HEADER.pack(PATCH_MAGIC, len(ctrl_bz), len(diff_bz), new_size) + ctrl_bz + diff_bz + extra_bz
+
+
+def apply_patch(old: bytes, patch: bytes) -> bytes:
+    """Apply a BSDIFF40 patch to old."""
+    magic, ctrl_len, diff_len, new_size = HEADER.unpack_from(patch)
+    if magic != PATCH_MAGIC:
+        raise ValueError("not a BSDIFF40 patch")
+    start = HEADER.size
+    ctrl = bz2.decompress(patch[start:start + ctrl_len])
+    diff_block = bz2.decompress(patch[start + ctrl_len:start + ctrl_len + diff_len])
+    extra_block = bz2.decompress(patch[start + ctrl_len + diff_len:])
+
+    new = bytearray()
+    old_pos = diff_pos = extra_pos = 0
+    for offset in range(0, len(ctrl), 24):
+        add, copy, seek = _offin(ctrl, offset), _offin(ctrl, offset + 8), _offin(ctrl, offset + 16)
+        new.extend(
+            (d + o) & 0xFF
+            for d, o in zip(diff_block[diff_pos:diff_pos + add], old[old_pos:old_pos + add])
+        )
+        diff_pos += add
+        old_pos += add
+        new.extend(extra_block[extra_pos:extra_pos + copy])
+        extra_pos += copy
+        old_pos += seek
+    if len(new) != new_size:
+        raise ValueError("patch produced a file of the wrong size")
+    return bytes(new)
+
+
+def release_version(dist_dir: Path) -> Optional[str]:
+    """Get the version a dist directory was built from."""
+    try:
+        with open(dist_dir / "build-report.json", "r", encoding="utf-8") as f:
+            version = json.load(f).get("version")
+        if version:
+            return str(version)
+    except (OSError, ValueError, AttributeError):
+        pass
+    # A dist directory inside a checkout of the release
+    return read_package_version(dist_dir.parent)
+
+
+def make_delta(source: Path, target: Path, patch_path: Path) -> Dict[str, Any]:
+    """Write a patch from source to target, verify it and describe it."""
+    old = source.read_bytes()
+    new = target.read_bytes()
+
+    started = time.perf_counter()
+    patch = diff(old, new)
+    diff_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    patched = apply_patch(old, patch)
+    apply_seconds = time.perf_counter() - started
+    if patched != new:
+        raise ValueError(f"patch for {target.name} does not reproduce it")
+
+    tmp_path = patch_path.with_name(f".{patch_path.name}.tmp")
+    tmp_path.write_bytes(patch)
+    os.replace(tmp_path, patch_path)
+
+    return {
+        "format": "BSDIFF40",
+        "patch": {"name": patch_path.name, "size": len(patch), "sha256": hashlib.sha256(patch).hexdigest()},
+        "source": {"name": source.name, "size": len(old), "sha256": hashlib.sha256(old).hexdigest()},
+        "target": {"name": target.name, "size": len(new), "sha256": hashlib.sha256(new).hexdigest()},
+        "benchmark": {
+            "diff_seconds": round(diff_seconds, 3),
+            "apply_seconds": round(apply_seconds, 3),
+            "patch_ratio": round(len(patch) / len(new), 4) if new else None,
+            "patch_update_seconds": round(len(patch) / REFERENCE_LINK_SPEED + apply_seconds, 3),
+            "full_download_seconds": round(len(new) / REFERENCE_LINK_SPEED, 3),
+        },
+    }
+
+
+def make_deltas(
+    previous_dist: Path,
+    dist_dir: Path,
+    binaries: List[Path],
+    current_version: Optional[str],
+    workers: int,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Write patches from the previous release's binaries to the current ones.
+
+    Patches go to dist/deltas/<binary>-<from>-to-<to>.bsdiff, diffed in
+    parallel processes, and are described in dist/deltas/manifest.json.
+    Returns the manifest and the binaries without a previous version.
+    """
+    from_version = release_version(previous_dist) or "previous"
+    to_version = current_version or "current"
+    deltas_dir = dist_dir / "deltas"
+    deltas_dir.mkdir(parents=True, exist_ok=True)
+
+    pairs = []
+    missing = []
+    for binary in binaries:
+        source = previous_dist / binary.name
+        if source.is_file():
+            pairs.append((source, binary, deltas_dir / f"{binary.name}-{from_version}-to-{to_version}.bsdiff"))
+        else:
+            missing.append(binary.name)
+
+    manifest: Dict[str, Any] = {"from_version": from_version, "to_version": to_version, "patches": {}}
+    if pairs:
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(pairs)))) as pool:
+            for (_, binary, _), entry in zip(pairs, pool.map(make_delta, *zip(*pairs))):
+                manifest["patches"][binary.name] = entry
+
+    tmp_path = deltas_dir / ".manifest.json.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, deltas_dir / "manifest.json")
+    return manifest, missing
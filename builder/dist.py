@@ -0,0 +1,176 @@
+"""
+Placing binaries into dist/ and checksumming them.
+"""
+import hashlib
+import mmap
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+# ioctl that shares a file's extents on btrfs, XFS and similar filesystems
+FICLONE = 0x40049409
+
+# Bytes hashed per step; large enough that hashlib releases the GIL
+DIGEST_CHUNK = 8 * 1024 * 1024
+
+# Manifest file per digest algorithm, in coreutils `sha256sum`/`b2sum` format
+CHECKSUM_FILES = {"sha256": "SHA256SUMS", "blake2b": "B2SUMS"}
+
+
+def _reflink(src: Path, dest: Path) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as src_file, open(dest, "wb") as dest_file:
+            fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+    except OSError:
+        dest.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def _hardlink(src: Path, dest: Path) -> bool:
+    try:
+        os.link(src, dest)
+    except OSError:
+        return False
+    return True
+
+
+def _copy_data(src: Path, dest: Path) -> str:
+    """Copy file contents in the kernel where possible."""
+    with open(src, "rb") as src_file, open(dest, "wb") as dest_file:
+        src_fd, dest_fd = src_file.fileno(), dest_file.fileno()
+        remaining = os.fstat(src_fd).st_size
+
+        if hasattr(os, "copy_file_range"):
+            try:
+                while remaining > 0:
+                    copied = os.copy_file_range(src_fd, dest_fd, remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                return "copy_file_range"
+            except OSError:
+                # Not supported between these filesystems; start over
+                pass
+
+        src_file.seek(0)
+        dest_file.seek(0)
+        dest_file.truncate()
+        remaining = os.fstat(src_fd).st_size
+        offset = 0
+        try:
+            while remaining > 0:
+                sent = os.sendfile(dest_fd, src_fd, offset, remaining)
+                if sent == 0:
+                    break
+                offset += sent
+                remaining -= sent
+            return "sendfile"
+        except (OSError, AttributeError):
+            pass
+
+        src_file.seek(0)
+        dest_file.seek(0)
+        dest_file.truncate()
+        shutil.copyfileobj(src_file, dest_file)
+        return "copy"
+
+
+def place_file(src: Path, dest: Path, allow_hardlink: bool = True) -> str:
+    """
+    Put a copy of src at dest as cheaply as the filesystem allows.
+
+    Tries a reflink, then a hardlink, then an in-kernel copy, and replaces
+    dest atomically. Hardlinks are safe for linker outputs: linkers write a
+    new file instead of rewriting the old one, so a later build does not
+    change the dist copy. Returns the method that was used.
+    """
+    tmp_path = dest.with_name(dest.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    if _reflink(src, tmp_path):
+        method = "reflink"
+        shutil.copystat(src, tmp_path)
+    elif allow_hardlink and _hardlink(src, tmp_path):
+        method = "hardlink"
+    else:
+        method = _copy_data(src, tmp_path)
+        shutil.copystat(src, tmp_path)
+
+    # A hardlink shares the mode of its source; only add what is missing
+    mode = tmp_path.stat().st_mode
+    if mode & 0o755 != 0o755:
+        tmp_path.chmod(mode | 0o755)
+    os.replace(tmp_path, dest)
+    return method
+
+
+def file_digests(path: Path) -> Dict[str, str]:
+    """Get the SHA-256 and BLAKE2b digests of a file in one mmap'd pass."""
+    hashes = {"sha256": hashlib.sha256(), "blake2b": hashlib.blake2b()}
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    for offset in range(0, len(view), DIGEST_CHUNK):
+                        chunk = view[offset:offset + DIGEST_CHUNK]
+                        for digest in hashes.values():
+                            digest.update(chunk)
+                        chunk.release()
+    return {name: digest.hexdigest() for name, digest in hashes.items()}
+
+
+def digest_files(paths: Iterable[Path], workers: Optional[int] = None) -> Dict[Path, Dict[str, str]]:
+    """Hash several files concurrently."""
+    paths = list(paths)
+    if not paths:
+        return {}
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(file_digests, paths)))
+
+
+def read_checksums(path: Path) -> Dict[str, str]:
+    """Get the file name to digest entries of a checksum manifest."""
+    entries: Dict[str, str] = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                digest, sep, name = line.rstrip("\n").partition("  ")
+                if sep and name:
+                    entries[name.lstrip("*")] = digest
+    except OSError:
+        pass
+    return entries
+
+
+def write_checksums(path: Path, entries: Dict[str, str]) -> None:
+    """Write a checksum manifest, replacing the previous one atomically."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for name in sorted(entries):
+            f.write(f"{entries[name]}  {name}\n")
+    os.replace(tmp_path, path)
+
+
+def update_checksums(dist_dir: Path, digests: Dict[Path, Dict[str, str]]) -> None:
+    """Add digests of dist files to the manifests, dropping files that are gone."""
+    for algorithm, file_name in CHECKSUM_FILES.items():
+        manifest = dist_dir / file_name
+        entries = {
+            name: digest
+            for name, digest in read_checksums(manifest).items()
+            if (dist_dir / name).is_file()
+        }
+        for path, file_digest in digests.items():
+            entries[path.name] = file_digest[algorithm]
+        write_checksums(manifest, entries)
@@ -0,0 +1,446 @@
+"""
+Resumable, segmented HTTP downloads of tool archives.
+"""
+import hashlib
+import http.client
+import json
+import os
+import ssl
+import time
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .logger import Logger
+
+MB = 1024 * 1024
+
+
+class SourceChanged(http.client.HTTPException):
+    """The server no longer serves the byte ranges of the file being downloaded."""
+
+
+class ProgressMeter:
+    """
+    Progress of one download, drawn at a fixed refresh rate.
+
+    Outside a task the status is redrawn in place on one line; within a
+    task, whose line concurrent tasks can't share, it is logged now and then.
+    """
+
+    REFRESH = 0.2  # Seconds between in-place redraws
+    INTERVAL = 5.0  # Seconds between logged progress lines
+
+    def __init__(self, logger: Logger, desc: str, total: Optional[int]):
+        self.logger = logger
+        self.desc = desc
+        self.total = total or 0
+        self.inline = logger.current_task is None
+        self.last = 0.0 if self.inline else time.monotonic()
+
+    def update(self, done: int, force: bool = False) -> None:
+        if self.total <= 0:
+            return
+        now = time.monotonic()
+        if not force and now - self.last < (self.REFRESH if self.inline else self.INTERVAL):
+            return
+        self.last = now
+        status = f"{done / MB:.1f}/{self.total / MB:.1f} MB ({done / self.total * 100:.1f}%)"
+        if self.inline:
+            print(f"\r  Progress: {status}", end="", flush=True)
+        else:
+            self.logger.progress(f"{self.desc}: {status}")
+
+    def finish(self, done: int) -> None:
+        if self.inline and self.total > 0:
+            self.update(done, force=True)
+            print()  # New line after progress
+
+
+class HashingReader:
+    """
+    File-like view of an HTTP response that hashes and counts what is read.
+
+    Lets a consumer such as a tarfile stream work on the data as it arrives
+    while the download's digest and progress are kept on the side.
+    """
+
+    def __init__(self, response: http.client.HTTPResponse, meter: ProgressMeter):
+        self.response = response
+        self.meter = meter
+        self.digest = hashlib.sha256()
+        self.done = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.response.read(size)
+        self.digest.update(data)
+        self.done += len(data)
+        self.meter.update(self.done)
+        return data
+
+    def drain(self) -> None:
+        """Read what the consumer left, such as the compressed stream's index."""
+        while self.read(MB):
+            pass
+
+
+class Downloader:
+    """
+    Downloads a file into dest.part, then renames it to dest.
+
+    A dest.part.json sidecar records the URL, the validators (ETag,
+    Last-Modified), the size and the bytes done, so that a retry, in this run
+    or a later one, continues with Range requests where the last attempt
+    stopped, as long as the server still has the same file.
+
+    Large files from servers that accept ranges are fetched as several
+    segments at once: each segment's range request writes into its own part
+    of the preallocated file with os.pwrite, and is retried on its own when
+    its connection fails. Other files come over a single connection.
+    """
+
+    # Tries per download and per segment, backoff before the n-th retry
+    # (BACKOFF * 2^(n-1), capped), and seconds without data before a try is abandoned
+    ATTEMPTS = 6
+    SEGMENT_ATTEMPTS = 3
+    BACKOFF = 1.0
+    MAX_BACKOFF = 30.0
+    TIMEOUT = 30.0
+    # Bytes per read, into a buffer reused for the whole connection
+    CHUNK = 256 * 1024
+    # Concurrent range requests, and the smallest file split into segments
+    CONNECTIONS = 4
+    SEGMENT_MIN_SIZE = 8 * MB
+    # Seconds between sidecar updates
+    SAVE_INTERVAL = 1.0
+
+    def __init__(self, logger: Logger, connections: Optional[int] = None):
+        self.logger = logger
+        self.connections = connections or self.CONNECTIONS
+        self.ssl_context = ssl.create_default_context()
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.BACKOFF * 2 ** (attempt - 1), self.MAX_BACKOFF)
+
+    def fetch(self, url: str, dest: Path, desc: str = "file", sha256: Optional[str] = None) -> bool:
+        """
+        Download url to dest, verifying the SHA-256 digest if one is given.
+
+        dest only appears, by an atomic rename, once the whole file is there.
+        """
+        self.logger.info(f"Downloading {desc}...")
+        self.logger.info(f"  URL: {url}")
+
+        part = dest.with_name(dest.name + ".part")
+        sidecar = dest.with_name(dest.name + ".part.json")
+
+        for attempt in range(self.ATTEMPTS):
+            if attempt > 0:
+                delay = self._backoff(attempt)
+                self.logger.warning(f"Retrying {desc} in {delay:.0f}s (attempt {attempt + 1}/{self.ATTEMPTS})")
+                time.sleep(delay)
+            started = time.monotonic()
+            try:
+                state = self._fetch_part(url, part, sidecar, desc)
+            except urllib.error.HTTPError as e:
+                # Client errors won't go away by retrying, apart from these
+                if 400 <= e.code < 500 and e.code not in (408, 429):
+                    self.logger.error(f"Failed to download {desc}: {e}")
+                    self._discard(part, sidecar)
+                    return False
+                self.logger.warning(f"Download of {desc} interrupted: {e}")
+                continue
+            except SourceChanged as e:
+                self.logger.warning(f"Download of {desc} restarts: {e}")
+                self._discard(part, sidecar)
+                continue
+            except (OSError, http.client.HTTPException) as e:
+                self.logger.warning(f"Download of {desc} interrupted: {e}")
+                continue
+
+            done, total = part.stat().st_size, state.get("total")
+            if total is not None and done != total:
+                self.logger.warning(f"Download of {desc} ended at {done} of {total} bytes")
+                continue
+            if sha256 is not None and self._file_sha256(part) != sha256.lower():
+                self._discard(part, sidecar)
+                if not state.get("resumed"):
+                    self.logger.error(f"Checksum mismatch for {desc}")
+                    return False
+                # The spliced parts may not have been of the same file
+                self.logger.warning(f"Checksum mismatch for resumed {desc}, downloading it again")
+                continue
+
+            os.replace(part, dest)
+            sidecar.unlink(missing_ok=True)
+            seconds = time.monotonic() - started
+            self.logger.debug(
+                f"{desc}: {done / MB:.1f} MB in {seconds:.1f}s "
+                f"over {len(state.get('segments') or [None])} connection(s)"
+            )
+            self.logger.success(f"Downloaded {desc}")
+            return True
+
+        self.logger.error(f"Failed to download {desc} after {self.ATTEMPTS} attempts")
+        return False
+
+    def _load_state(self, url: str, part: Path, sidecar: Path) -> Dict[str, Any]:
+        try:
+            with open(sidecar, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        if state.get("url") != url or not part.exists():
+            # Nothing to resume from, or data of another URL
+            self._discard(part, sidecar)
+            return {"url": url}
+        if state.get("segments") and part.stat().st_size != state.get("total"):
+            self._discard(part, sidecar)
+            return {"url": url}
+        return state
+
+    def _fetch_part(self, url: str, part: Path, sidecar: Path, desc: str) -> Dict[str, Any]:
+        """Fetch the rest of a download into its .part file; return its sidecar state."""
+        state = self._load_state(url, part, sidecar)
+        if state.get("segments"):
+            self._fetch_segments(url, part, sidecar, desc, state)
+            return state
+
+        offset = part.stat().st_size if part.exists() else 0
+        request = urllib.request.Request(url)
+        if offset > 0:
+            request.add_header("Range", f"bytes={offset}-")
+            # Without a validator the server could splice two versions
+            validator = state.get("etag") or state.get("last_modified")
+            if validator:
+                request.add_header("If-Range", validator)
+
+        try:
+            response = urllib.request.urlopen(request, context=self.ssl_context, timeout=self.TIMEOUT)
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and state.get("total") == offset:
+                # Everything was there already
+                return state
+            if e.code == 416:
+                raise SourceChanged(f"range from {offset} not satisfiable") from e
+            raise
+
+        with response:
+            if response.status == 206:
+                content_range = response.headers.get("Content-Range", "")
+                if not content_range.startswith(f"bytes {offset}-"):
+                    raise SourceChanged(f"unexpected Content-Range {content_range!r}")
+                self.logger.info(f"  Resuming at {offset / MB:.1f} MB")
+                state["resumed"] = True
+                mode = "ab"
+            else:
+                # Full response: the server ignored the range or the file changed
+                offset = 0
+                state["resumed"] = False
+                mode = "wb"
+
+            length = response.headers.get("Content-Length")
+            state["total"] = offset + int(length) if length is not None else None
+            state["etag"] = response.headers.get("ETag")
+            state["last_modified"] = response.headers.get("Last-Modified")
+            state["done"] = offset
+
+            if offset == 0 and self._can_segment(response, state):
+                state["segments"] = self._plan_segments(state["total"])
+                self._write_state(sidecar, state)
+                # The response already streaming from byte 0 serves the first segment
+                self._fetch_segments(url, part, sidecar, desc, state, response)
+                return state
+
+            self._write_state(sidecar, state)
+            meter = ProgressMeter(self.logger, desc, state["total"])
+            view = memoryview(bytearray(self.CHUNK))
+            downloaded = offset
+            last_save = time.monotonic()
+            try:
+                with open(part, mode) as f:
+                    while True:
+                        n = response.readinto(view)
+                        if not n:
+                            break
+                        f.write(view[:n])
+                        downloaded += n
+                        meter.update(downloaded)
+                        if time.monotonic() - last_save >= self.SAVE_INTERVAL:
+                            last_save = time.monotonic()
+                            f.flush()
+                            state["done"] = downloaded
+                            self._write_state(sidecar, state)
+            finally:
+                meter.finish(downloaded)
+                state["done"] = downloaded
+                self._write_state(sidecar, state)
+
+        return state
+
+    def _can_segment(self, response: http.client.HTTPResponse, state: Dict[str, Any]) -> bool:
+        return (
+            hasattr(os, "pwrite")
+            and self.connections > 1
+            and (state["total"] or 0) >= self.SEGMENT_MIN_SIZE
+            and response.headers.get("Accept-Ranges", "").lower() == "bytes"
+            # Segments come over separate connections and must be of one version
+            and bool(state["etag"] or state["last_modified"])
+        )
+
+    def _plan_segments(self, total: int) -> List[List[int]]:
+        """Split a file into [start, end, bytes done] segments, one per connection."""
+        size = -(-total // self.connections)
+        return [[start, min(start + size, total), 0] for start in range(0, total, size)]
+
+    def _fetch_segments(
+        self,
+        url: str,
+        part: Path,
+        sidecar: Path,
+        desc: str,
+        state: Dict[str, Any],
+        first_response: Optional[http.client.HTTPResponse] = None,
+    ) -> None:
+        """Fetch all unfinished segments concurrently, raising the first failure."""
+        total = state["total"]
+        segments = state["segments"]
+        validator = state.get("etag") or state.get("last_modified")
+        pending = [s for s in segments if s[2] < s[1] - s[0]]
+
+        def done_bytes() -> int:
+            return sum(s[2] for s in segments)
+
+        if done_bytes() > 0:
+            self.logger.info(f"  Resuming at {done_bytes() / MB:.1f} MB")
+            state["resumed"] = True
+        else:
+            state["resumed"] = False
+        self.logger.debug(f"Fetching {desc} as {len(pending)} concurrent segment(s)")
+
+        task = self.logger.current_task
+        stop = threading.Event()
+        meter = ProgressMeter(self.logger, desc, total)
+        fd = os.open(part, os.O_RDWR | os.O_CREAT, 0o644)
+        errors: List[BaseException] = []
+        try:
+            self._preallocate(fd, total)
+            with ThreadPoolExecutor(max_workers=max(1, len(pending))) as pool:
+                futures = [
+                    pool.submit(
+                        self._fetch_segment, url, fd, segment, validator,
+                        first_response if segment[0] == 0 else None, stop, task,
+                    )
+                    for segment in pending
+                ]
+                last_save = time.monotonic()
+                running = set(futures)
+                while running:
+                    _, running = wait(running, timeout=meter.REFRESH)
+                    meter.update(done_bytes())
+                    if time.monotonic() - last_save >= self.SAVE_INTERVAL:
+                        last_save = time.monotonic()
+                        state["done"] = done_bytes()
+                        self._write_state(sidecar, state)
+                errors = [f.exception() for f in futures if f.exception() is not None]
+        finally:
+            os.close(fd)
+            meter.finish(done_bytes())
+            state["done"] = done_bytes()
+            self._write_state(sidecar, state)
+
+        # A changed file or a client error says more than the segments it stopped
+        errors.sort(key=lambda e: not isinstance(e, (SourceChanged, urllib.error.HTTPError)))
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _preallocate(fd: int, size: int) -> None:
+        if os.fstat(fd).st_size == size:
+            return
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError):
+            # Not supported here, or not by the file system
+            os.ftruncate(fd, size)
+
+    def _open_range(self, url: str, first: int, last: int, validator: Optional[str]) -> http.client.HTTPResponse:
+        request = urllib.request.Request(url, headers={"Range": f"bytes={first}-{last}"})
+        if validator:
+            request.add_header("If-Range", validator)
+        response = urllib.request.urlopen(request, context=self.ssl_context, timeout=self.TIMEOUT)
+        content_range = response.headers.get("Content-Range", "")
+        if response.status != 206 or not content_range.startswith(f"bytes {first}-"):
+            response.close()
+            raise SourceChanged(f"range {first}-{last} answered with {response.status} {content_range!r}")
+        return response
+
+    def _fetch_segment(
+        self,
+        url: str,
+        fd: int,
+        segment: List[int],
+        validator: Optional[str],
+        response: Optional[http.client.HTTPResponse],
+        stop: threading.Event,
+        task: Optional[str],
+    ) -> None:
+        """Fetch one segment into its place in the file, retrying its connection."""
+        start, end = segment[0], segment[1]
+        view = memoryview(bytearray(self.CHUNK))
+        with self.logger.task(task):
+            for attempt in range(self.SEGMENT_ATTEMPTS):
+                if attempt > 0 and stop.wait(self._backoff(attempt)):
+                    return
+                try:
+                    if response is None:
+                        response = self._open_range(url, start + segment[2], end - 1, validator)
+                    with response:
+                        while segment[2] < end - start and not stop.is_set():
+                            n = response.readinto(view[:min(self.CHUNK, end - start - segment[2])])
+                            if not n:
+                                break
+                            written = 0
+                            while written < n:
+                                written += os.pwrite(fd, view[written:n], start + segment[2] + written)
+                            segment[2] += n
+                    response = None
+                    if segment[2] >= end - start or stop.is_set():
+                        return
+                    self.logger.warning(f"Segment at {start / MB:.1f} MB ended early")
+                except urllib.error.HTTPError as e:
+                    if 400 <= e.code < 500 and e.code not in (408, 429):
+                        stop.set()
+                        raise
+                    response = None
+                    self.logger.warning(f"Segment at {start / MB:.1f} MB interrupted: {e}")
+                except SourceChanged:
+                    stop.set()
+                    raise
+                except (OSError, http.client.HTTPException) as e:
+                    response = None
+                    self.logger.warning(f"Segment at {start / MB:.1f} MB interrupted: {e}")
+        raise OSError(f"segment at {start / MB:.1f} MB failed after {self.SEGMENT_ATTEMPTS} attempts")
+
+    @staticmethod
+    def _write_state(sidecar: Path, state: Dict[str, Any]) -> None:
+        tmp_path = sidecar.with_name(sidecar.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, sidecar)
+
+    @staticmethod
+    def _discard(part: Path, sidecar: Path) -> None:
+        part.unlink(missing_ok=True)
+        sidecar.unlink(missing_ok=True)
+
+    @staticmethod
+    def _file_sha256(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(MB), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
@@ -0,0 +1,91 @@
+"""
+Benchmark and resume check of Downloader against a local RangeServer.
+
+    python -m builder.download_bench [--size 64] [--latency 0.05] [--rate 6] [--connections 1 4 8]
+
+Downloads a random file once per connection count and reports the
+throughput, then downloads it again while the server drops connections,
+and once more split across two runs, checking that the result is intact.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from .download import MB, Downloader
+from .logger import Logger
+from .range_server import RangeServer
+
+
+def intact(path: Path, sha256: str) -> bool:
+    return path.is_file() and hashlib.sha256(path.read_bytes()).hexdigest() == sha256
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark segmented and resumed tool downloads")
+    parser.add_argument("--size", type=int, default=64, help="File size in MB")
+    parser.add_argument("--latency", type=float, default=0.05, help="Server seconds before each response")
+    parser.add_argument("--rate", type=float, default=6.0, help="Server MB/s per connection")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args(argv)
+
+    logger = Logger()
+    # Retries are part of the test, not of what is measured
+    Downloader.BACKOFF = 0.0
+
+    with tempfile.TemporaryDirectory(prefix="opendir-download-bench-") as tmp:
+        root = Path(tmp) / "serve"
+        out = Path(tmp) / "out"
+        root.mkdir()
+        out.mkdir()
+        data = os.urandom(args.size * MB)
+        sha256 = hashlib.sha256(data).hexdigest()
+        (root / "archive.bin").write_bytes(data)
+        del data
+
+        server = RangeServer(root, latency=args.latency, rate=args.rate * MB).start()
+        url = f"{server.url}/archive.bin"
+        logger.header(
+            f"Downloading {args.size} MB ({args.latency * 1000:.0f} ms latency, "
+            f"{args.rate:g} MB/s per connection)"
+        )
+
+        ok = True
+        rows = []
+        for connections in args.connections:
+            dest = out / f"archive-{connections}.bin"
+            started = time.monotonic()
+            fetched = Downloader(logger, connections=connections).fetch(url, dest, f"{connections} connection(s)", sha256)
+            seconds = time.monotonic() - started
+            ok = ok and fetched and intact(dest, sha256)
+            rows.append([str(connections), f"{args.size / seconds:.1f} MB/s", f"{seconds:.2f}s"])
+            dest.unlink(missing_ok=True)
+        logger.table(["Connections", "Throughput", "Time"], rows)
+
+        # Two segments lose their connection; each is retried on its own
+        server.drops = 2
+        dest = out / "archive-drops.bin"
+        dropped = Downloader(logger).fetch(url, dest, "with dropped connections", sha256) and intact(dest, sha256)
+        (logger.success if dropped else logger.error)(f"Dropped connections: {'intact' if dropped else 'FAILED'}")
+
+        # A run that gives up leaves .part and .part.json for the next one
+        server.drops = 1000
+        dest = out / "archive-resume.bin"
+        first = Downloader(logger)
+        first.ATTEMPTS = first.SEGMENT_ATTEMPTS = 1
+        first.fetch(url, dest, "interrupted run", sha256)
+        server.drops = 0
+        partial = dest.with_name(dest.name + ".part").is_file()
+        resumed = partial and Downloader(logger).fetch(url, dest, "next run", sha256) and intact(dest, sha256)
+        (logger.success if resumed else logger.error)(f"Resume in a later run: {'intact' if resumed else 'FAILED'}")
+
+        server.shutdown()
+        return 0 if ok and dropped and resumed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,17 +1,39 @@
 """
 Build executor for Rust projects with cross-compilation support.
 """
+import json
 import os
 import shutil
+import signal
 import subprocess
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
+from .cargo_messages import CargoMessageStream, ProgressEvent, count_build_units
+from .artifacts import ArtifactCache
+from .binsize import SizeBudget, SizeHistory, attribute, read_layout
+from .bolt import BOLT_TARGETS, BoltStage
+from .bundle import BundleMaker, remove_bundles
+from .delta import make_deltas
 from .config import BuildConfig
+from .dist import CHECKSUM_FILES, digest_files, place_file, read_checksums, update_checksums
+from .fast import FastMode
+from .fingerprint import Fingerprinter, FingerprintStore
+from .jobserver import JobServer
+from .journal import BuildJournal
+from .link_timer import LINK_LOG_ENV, read_link_log
 from .logger import Logger
+from .pgo import PgoPipeline
+from .rustc_cache import CACHE_HITS_ENV, read_cache_hits
+from .report import BuildReport, ProcessUsage, max_rss_bytes, read_package_version, wait_with_usage
 from .targets import Target, TargetManager
+from .timings import TimingsHistory, TimingSummary, analyze, load_timings
 from .tools import ToolInstaller
+from .vendor import CrateVendor
 
 
 @dataclass
@@ -22,11 +44,21 @@ class BuildResult:
     success: bool
     binary_path: Optional[Path] = None
     error_message: Optional[str] = None
+    up_to_date: bool = False  # Skipped, dist binary already matches the inputs
+    from_cache: bool = False  # Restored into dist from the artifact cache
+    sha256: Optional[str] = None  # Digest of the dist binary, once hashed
+    shared_error: bool = False  # Failed on an error every target would hit
+    cancelled: bool = False  # Stopped before finishing, e.g. by --fail-fast
 
 
 class BuildExecutor:
     """Executes Rust builds with cross-compilation support."""
 
+    # Minimum seconds between progress lines for one target
+    PROGRESS_INTERVAL = 5.0
+    # Seconds cancelled builds get to exit after SIGTERM before SIGKILL
+    CANCEL_GRACE = 5.0
+
     def __init__(
         self,
         config: BuildConfig,
@@ -34,16 +66,48 @@ class BuildExecutor:
         tool_installer: ToolInstaller,
         target_manager: TargetManager,
         logger: Logger,
+        report: Optional[BuildReport] = None,
     ):
         self.config = config
         self.project_root = project_root
         self.tool_installer = tool_installer
         self.target_manager = target_manager
         self.logger = logger
+        self.report = report or BuildReport()
 
         self.dist_dir = project_root / config.dist_dir
         self.target_dir = project_root / "target"
 
+        # Extra codegen flags for every crate of the target (e.g. PGO)
+        self.rustflags: List[str] = []
+        # Flags for single rust targets only (e.g. BOLT relocations)
+        self.target_rustflags: Dict[str, List[str]] = {}
+        # Extra cargo environment (e.g. profile overrides of --fast)
+        self.extra_env: Dict[str, str] = {}
+        # Environment for single rust targets only (e.g. BOLT's unstripped links)
+        self.target_env: Dict[str, Dict[str, str]] = {}
+        # Extra arguments of every cargo build and metadata query
+        self.cargo_args: List[str] = []
+        if config.offline:
+            vendor = CrateVendor(config, project_root)
+            self.cargo_args.extend(vendor.cargo_args())
+            self.extra_env.update(vendor.env())
+
+        # Shared job pool while several targets build concurrently
+        self._jobserver: Optional[JobServer] = None
+
+        # Crates per rust target, from cargo metadata
+        self._unit_counts: Dict[str, Optional[int]] = {}
+        self._units_lock = threading.Lock()
+
+        # Run cargo in its own process group so cancel() reaches rustc too;
+        # off by default, since the group then misses the terminal's Ctrl-C
+        self.cancellable = False
+        # Running cargo processes by pid, so builds can be cancelled
+        self._processes: Dict[int, subprocess.Popen] = {}
+        self._cancelled: Set[int] = set()
+        self._processes_lock = threading.Lock()
+
     def clean(self) -> bool:
         """Clean build artifacts."""
         self.logger.info("Cleaning build artifacts...")
@@ -75,7 +139,11 @@ class BuildExecutor:
             return False
 
     def build_target(self, target: Target) -> BuildResult:
-        """Build for a specific target."""
+        """Build for a specific target, streaming cargo's progress."""
+        with self.report.phase("build_target", target.friendly_name):
+            return self._build_target(target)
+
+    def _build_target(self, target: Target) -> BuildResult:
         self.logger.info(f"Building for {target.friendly_name}...")
 
         # Determine build command
@@ -89,27 +157,119 @@ class BuildExecutor:
             cmd.append("--release")
 
         # Add target
-        if not target.is_native:
+        if self._passes_target(target):
             cmd.extend(["--target", target.rust_target])
 
+        # Limit parallelism when no shared jobserver is in charge
+        if self._jobserver is None and self.config.jobs > 0:
+            cmd.extend(["--jobs", str(self.config.jobs)])
+
+        # Structured messages on stdout, rendered diagnostics on stderr
+        cmd.append("--message-format=json-render-diagnostics")
+        cmd.extend(self.cargo_args)
+
+        if self.config.timings:
+            cmd.append("--timings")
+
         # Get environment
         env = self.tool_installer.get_env()
+        env["CARGO_TARGET_DIR"] = str(self._target_dir_for(target))
+        env.update(self.extra_env)
+        env.update(self.target_env.get(target.rust_target, {}))
+        rustflags = self._rustflags_for(target)
+        if rustflags:
+            env["RUSTFLAGS"] = " ".join(filter(None, [env.get("RUSTFLAGS", ""), *rustflags]))
+
+        # The managed RUSTC_WRAPPER logs each link here, when asked to
+        link_log = self._target_dir_for(target) / "link-times.jsonl"
+        link_log.unlink(missing_ok=True)
+        if self.config.times_links:
+            env[LINK_LOG_ENV] = str(link_log)
+        # ...and each crate it serves from the compiled crate cache here
+        hit_log = self._target_dir_for(target) / "rustc-cache-hits.log"
+        hit_log.unlink(missing_ok=True)
+        env[CACHE_HITS_ENV] = str(hit_log)
+
+        pass_fds: Tuple[int, ...] = ()
+        if self._jobserver is not None:
+            env.update(self._jobserver.env())
+            pass_fds = self._jobserver.pass_fds()
+
+        with self.report.phase("count_units", target.friendly_name):
+            total_units = self._count_units(target, env)
+        stream = CargoMessageStream(total_units=total_units)
 
         self.logger.debug(f"Running: {' '.join(cmd)}")
 
         try:
-            result = subprocess.run(
+            process = subprocess.Popen(
                 cmd,
                 cwd=self.project_root,
                 env=env,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
+                errors="replace",
+                pass_fds=pass_fds,
+                start_new_session=self.cancellable,
             )
+            with self._processes_lock:
+                self._processes[process.pid] = process
 
-            if result.returncode == 0:
-                # Find the built binary
-                binary_path = self._find_binary(target)
-                self.logger.success(f"Built: {target.friendly_name}")
+            # Drain stderr concurrently so neither pipe can fill up
+            stderr_reader = threading.Thread(
+                target=lambda: deque(stream.feed_stderr(process.stderr), maxlen=0),
+                daemon=True,
+            )
+            stderr_reader.start()
+
+            last_report = 0.0
+            for event in stream.feed_stdout(process.stdout):
+                if event.elapsed - last_report >= self.PROGRESS_INTERVAL:
+                    last_report = event.elapsed
+                    self._report_progress(target, event)
+
+            # Wait for the reader first: the pipe closes when cargo exits
+            stderr_reader.join()
+            try:
+                returncode, rusage = wait_with_usage(process)
+            finally:
+                with self._processes_lock:
+                    del self._processes[process.pid]
+                    cancelled = process.pid in self._cancelled
+                    self._cancelled.discard(process.pid)
+
+            if cancelled:
+                self.logger.info(f"Build cancelled for {target.friendly_name}")
+                return BuildResult(
+                    target=target,
+                    success=False,
+                    error_message="cancelled",
+                    cancelled=True,
+                )
+
+            if rusage is not None:
+                self.report.record_process(ProcessUsage(
+                    target=target.friendly_name,
+                    command=" ".join(cmd[:2]),
+                    seconds=stream.elapsed,
+                    user_seconds=rusage.ru_utime,
+                    system_seconds=rusage.ru_stime,
+                    max_rss_bytes=max_rss_bytes(rusage),
+                    returncode=returncode,
+                ))
+
+            if returncode == 0:
+                # Prefer the path cargo reported for the binary
+                binary_path = stream.executable
+                if binary_path is None:
+                    with self.report.phase("find_binary", target.friendly_name):
+                        binary_path = self._find_binary(target)
+                link = self._link_summary(target, link_log)
+                linked = f", linked in {link['seconds']:.2f}s" if link else ""
+                self.logger.success(
+                    f"Built: {target.friendly_name} ({stream.elapsed:.1f}s{linked})"
+                )
 
                 return BuildResult(
                     target=target,
@@ -118,16 +278,16 @@ class BuildExecutor:
                 )
             else:
                 self.logger.error(f"Build failed for {target.friendly_name}")
-                # Print stderr for debugging
-                if result.stderr:
-                    for line in result.stderr.split("\n")[:20]:
-                        if line.strip():
-                            self.logger.debug(f"  {line}")
+                # Print the tail of the diagnostics for debugging
+                for line in stream.summary(max_lines=20).split("\n"):
+                    if line.strip():
+                        self.logger.debug(f"  {line}")
 
                 return BuildResult(
                     target=target,
                     success=False,
-                    error_message=result.stderr,
+                    error_message=stream.summary(),
+                    shared_error=stream.shared_error(self.project_root),
                 )
 
         except Exception as e:
@@ -138,6 +298,157 @@ class BuildExecutor:
                 error_message=str(e),
             )
 
+    def _link_summary(self, target: Target, link_log: Path) -> Optional[Dict]:
+        """Add the link times of a build to the report."""
+        links = read_link_log(link_log)
+        binary = [link for link in links if link["crate"] == "opendir"]
+        if not binary:
+            return None
+
+        summary = {
+            "seconds": binary[-1]["seconds"],
+            "linker": binary[-1]["linker"],
+            "all_links_seconds": round(sum(link["seconds"] for link in links), 3),
+            "links": len(links),
+        }
+        self.report.add_section("link", target.friendly_name, summary)
+        return summary
+
+    def cancel(self, grace: Optional[float] = None) -> None:
+        """
+        Stop all running builds; they finish with a cancelled result.
+
+        With a grace period, builds still running after it are killed.
+        """
+        with self._processes_lock:
+            pids = list(self._processes)
+            for pid in pids:
+                self._cancelled.add(pid)
+                self._signal(pid, signal.SIGTERM)
+        if grace is not None and pids:
+            timer = threading.Timer(grace, self._kill, args=(pids,))
+            timer.daemon = True
+            timer.start()
+
+    def _signal(self, pid: int, signum: int) -> None:
+        try:
+            if self.cancellable:
+                os.killpg(pid, signum)
+            else:
+                os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _kill(self, pids: List[int]) -> None:
+        with self._processes_lock:
+            for pid in pids:
+                if pid in self._processes:
+                    self.logger.debug(f"Killing build process {pid}")
+                    self._signal(pid, signal.SIGKILL)
+
+    def reset_unit_counts(self) -> None:
+        """Forget crate counts, e.g. after Cargo.toml changed."""
+        with self._units_lock:
+            self._unit_counts.clear()
+
+    def _report_progress(self, target: Target, event: ProgressEvent) -> None:
+        """Log a progress line for a running build."""
+        if event.total:
+            count = f"{min(event.compiled, event.total)}/{event.total} crates"
+        else:
+            count = f"{event.compiled} crates"
+        message = f"{target.friendly_name}: {count}"
+        if event.crate:
+            message += f", compiling {event.crate}"
+        self.logger.progress(f"{message} ({event.elapsed:.0f}s)")
+
+    def _count_units(self, target: Target, env: dict) -> Optional[int]:
+        """Get the number of crates a target build compiles, if cargo can tell."""
+        with self._units_lock:
+            if target.rust_target in self._unit_counts:
+                return self._unit_counts[target.rust_target]
+
+            count = None
+            try:
+                result = subprocess.run(
+                    [
+                        "cargo", "metadata",
+                        "--format-version", "1",
+                        "--filter-platform", target.rust_target,
+                        *self.cargo_args,
+                    ],
+                    cwd=self.project_root,
+                    env=env,
+                    capture_output=True,
+                    text=True,
+                )
+                if result.returncode == 0:
+                    count = count_build_units(json.loads(result.stdout))
+            except (OSError, ValueError):
+                pass
+
+            self._unit_counts[target.rust_target] = count
+            return count
+
+    def with_rustflags(
+        self,
+        target_dir: Path,
+        rustflags: List[str],
+        target_rustflags: Optional[Dict[str, List[str]]] = None,
+    ) -> "BuildExecutor":
+        """Get an executor that adds RUSTFLAGS and builds in its own target directory."""
+        executor = BuildExecutor(
+            self.config,
+            self.project_root,
+            self.tool_installer,
+            self.target_manager,
+            self.logger,
+            self.report,
+        )
+        executor.target_dir = target_dir
+        executor.rustflags = list(rustflags)
+        executor.target_rustflags = {k: list(v) for k, v in (target_rustflags or {}).items()}
+        executor.extra_env = dict(self.extra_env)
+        executor.target_env = {k: dict(v) for k, v in self.target_env.items()}
+        return executor
+
+    def _rustflags_for(self, target: Target) -> List[str]:
+        """Get the extra RUSTFLAGS of a target's build."""
+        return self.rustflags + self.target_rustflags.get(target.rust_target, [])
+
+    def _passes_target(self, target: Target) -> bool:
+        """
+        Check whether a build names its target explicitly.
+
+        With --target, RUSTFLAGS apply to the target's crates only, so extra
+        flags stay out of build scripts and proc macros of native builds.
+        """
+        return not target.is_native or bool(self._rustflags_for(target))
+
+    def _target_dir_for(self, target: Target) -> Path:
+        """
+        Get the cargo target directory for a target.
+
+        Cross targets get a directory of their own: cargo locks the host
+        build directory for the whole build, which would otherwise make
+        concurrent target builds wait on each other.
+        """
+        if target.is_native:
+            return self.target_dir
+        return self.target_dir / "cross" / target.friendly_name
+
+    def timing_summary(self, target: Target) -> Optional[TimingSummary]:
+        """Analyze the cargo --timings report of a target's last build."""
+        html_path = self._target_dir_for(target) / "cargo-timings" / "cargo-timing.html"
+        data = load_timings(html_path)
+        if data is None:
+            return None
+        summary = analyze(data["units"], data["concurrency"])
+        if summary is not None:
+            hit_log = self._target_dir_for(target) / "rustc-cache-hits.log"
+            summary.cached_units = len(read_cache_hits(hit_log))
+        return summary
+
     def _find_binary(self, target: Target) -> Optional[Path]:
         """Find the built binary."""
         profile = "release" if self.config.release else "debug"
@@ -145,43 +456,77 @@ class BuildExecutor:
         # Determine binary name (could be different on Windows)
         binary_name = "opendir"
 
-        if target.is_native:
-            binary_path = self.target_dir / profile / binary_name
+        target_dir = self._target_dir_for(target)
+        if not self._passes_target(target):
+            binary_path = target_dir / profile / binary_name
         else:
-            binary_path = self.target_dir / target.rust_target / profile / binary_name
+            binary_path = target_dir / target.rust_target / profile / binary_name
 
         if binary_path.exists():
             return binary_path
         return None
 
+    def dist_path(self, target: Target) -> Path:
+        """Get the dist location of a target's binary."""
+        return self.dist_dir / f"opendir-{target.friendly_name}"
+
     def copy_to_dist(self, results: List[BuildResult]) -> List[Tuple[Path, str]]:
-        """Copy built binaries to dist directory."""
+        """
+        Place built binaries in the dist directory and checksum them.
+
+        Bundles of a replaced binary are deleted and dropped from the
+        checksum files; --bundle writes them again.
+        """
         self.dist_dir.mkdir(parents=True, exist_ok=True)
 
         copied: List[Tuple[Path, str]] = []
+        placed: List[BuildResult] = []
 
         for result in results:
             if not result.success or not result.binary_path:
                 continue
 
             # Determine destination name
-            dest_name = f"opendir-{result.target.friendly_name}"
-            dest_path = self.dist_dir / dest_name
+            dest_path = self.dist_path(result.target)
+
+            if not result.up_to_date:
+                remove_bundles(dest_path)
+
+            if result.up_to_date or result.from_cache:
+                placed.append(result)
+                size_str = self._format_size(dest_path.stat().st_size)
+                state = "up to date" if result.up_to_date else "restored from cache"
+                copied.append((dest_path, f"{size_str}, {state}"))
+                continue
 
             try:
-                shutil.copy2(result.binary_path, dest_path)
-                dest_path.chmod(0o755)
+                method = place_file(result.binary_path, dest_path)
+                placed.append(result)
 
                 # Get file size
                 size = dest_path.stat().st_size
                 size_str = self._format_size(size)
 
                 copied.append((dest_path, size_str))
-                self.logger.debug(f"Copied {dest_path.name} ({size_str})")
+                self.logger.debug(f"Copied {dest_path.name} ({size_str}, {method})")
 
             except Exception as e:
                 self.logger.error(f"Failed to copy {result.binary_path}: {e}")
 
+        # Hash fresh binaries, and unchanged ones the manifest doesn't list yet
+        listed = read_checksums(self.dist_dir / CHECKSUM_FILES["sha256"])
+        to_hash = [
+            self.dist_path(r.target)
+            for r in placed
+            if not (r.up_to_date or r.from_cache) or self.dist_path(r.target).name not in listed
+        ]
+        digests = digest_files(to_hash)
+        for result in placed:
+            digest = digests.get(self.dist_path(result.target))
+            if digest is not None:
+                result.sha256 = digest["sha256"]
+        update_checksums(self.dist_dir, digests)
+
         return copied
 
     def _format_size(self, size: int) -> str:
@@ -192,12 +537,18 @@ class BuildExecutor:
             size /= 1024
         return f"{size:.1f}TB"
 
-    def build_all(self, targets: List[Target]) -> List[BuildResult]:
-        """Build all specified targets."""
+    def build_all(
+        self,
+        targets: List[Target],
+        on_result: Optional[Callable[[BuildResult], None]] = None,
+    ) -> List[BuildResult]:
+        """Build all specified targets, calling on_result as each one finishes."""
         results: List[BuildResult] = []
 
         # Ensure all targets are installed
-        if not self.target_manager.ensure_targets(targets):
+        with self.report.phase("ensure_targets"):
+            targets_ready = self.target_manager.ensure_targets(targets)
+        if not targets_ready:
             self.logger.warning("Some targets could not be installed")
 
         # Check if we need cross-compilation tools
@@ -215,21 +566,97 @@ class BuildExecutor:
                 )
                 return []
 
-        # Build each target
         total = len(targets)
-        for i, target in enumerate(targets, 1):
-            self.logger.step(i, total, f"Building {target.friendly_name}")
-            result = self.build_target(target)
-            results.append(result)
+        parallel = self.config.parallel_targets(total)
+
+        # With --fail-fast, the first error every target would hit stops the rest
+        tripped = threading.Event()
+
+        def finish(result: BuildResult) -> BuildResult:
+            if self.config.fail_fast and result.shared_error and not tripped.is_set():
+                tripped.set()
+                self.logger.error(
+                    f"{result.target.friendly_name} failed on an error in shared sources, "
+                    f"cancelling the other targets"
+                )
+                self.cancel(grace=self.CANCEL_GRACE)
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        def skipped(target: Target) -> BuildResult:
+            return finish(BuildResult(
+                target=target,
+                success=False,
+                error_message="cancelled",
+                cancelled=True,
+            ))
+
+        if parallel == 1:
+            # Build each target
+            for i, target in enumerate(targets, 1):
+                if tripped.is_set():
+                    results.append(skipped(target))
+                    continue
+                self.logger.step(i, total, f"Building {target.friendly_name}")
+                results.append(finish(self.build_target(target)))
+            self._report_cancelled(results)
+            return results
+
+        jobs = self.config.job_budget
+        self.logger.info(
+            f"Building {parallel} targets concurrently ({jobs} jobs shared)"
+        )
+
+        def build(index: int, target: Target) -> BuildResult:
+            if tripped.is_set():
+                return skipped(target)
+            self.logger.step(index, total, f"Building {target.friendly_name}")
+            return finish(self.build_target(target))
 
+        # Cancelling must reach rustc, which runs in cargo's process group
+        cancellable = self.cancellable
+        if self.config.fail_fast:
+            self.cancellable = True
+        with JobServer(jobs, clients=parallel) as jobserver:
+            self._jobserver = jobserver
+            try:
+                with ThreadPoolExecutor(max_workers=parallel) as pool:
+                    futures = [
+                        pool.submit(build, i, target)
+                        for i, target in enumerate(targets, 1)
+                    ]
+                    try:
+                        # Keep results in target order
+                        results = [future.result() for future in futures]
+                    except KeyboardInterrupt:
+                        # Own process groups miss the terminal's Ctrl-C
+                        tripped.set()
+                        self.cancel(grace=self.CANCEL_GRACE)
+                        raise
+            finally:
+                self._jobserver = None
+                self.cancellable = cancellable
+
+        self._report_cancelled(results)
         return results
 
+    def _report_cancelled(self, results: List[BuildResult]) -> None:
+        """Name the targets --fail-fast cancelled, apart from the failed ones."""
+        cancelled = [r.target.friendly_name for r in results if r.cancelled]
+        if not self.config.fail_fast or not cancelled:
+            return
+        failed = [r.target.friendly_name for r in results if not r.success and not r.cancelled]
+        self.logger.warning(f"Failed: {', '.join(failed)}; cancelled: {', '.join(cancelled)}")
+        self.report.add_section("fail_fast", "targets", {"failed": failed, "cancelled": cancelled})
+
 
 def run_build(
     config: BuildConfig,
     project_root: Path,
     targets: List[str],
     logger: Logger,
+    report: Optional[BuildReport] = None,
 ) -> bool:
     """
     Main entry point for running builds.
@@ -239,20 +666,26 @@ def run_build(
         project_root: Path to project root
         targets: List of target specifications
         logger: Logger instance
+        report: Timing report to add to (a new one is created if omitted)
 
     Returns:
         True if all builds succeeded
     """
+    if report is None:
+        report = BuildReport()
+    report.version = read_package_version(project_root)
+
     tool_installer = ToolInstaller(config, project_root, logger)
     # Pass environment to target manager so rustup uses correct paths
     target_manager = TargetManager(config, logger, env=tool_installer.get_env())
     executor = BuildExecutor(
-        config, project_root, tool_installer, target_manager, logger
+        config, project_root, tool_installer, target_manager, logger, report
     )
 
     # Clean if requested
     if config.clean:
-        executor.clean()
+        with report.phase("clean"):
+            executor.clean()
 
     # Resolve targets
     resolved_targets = target_manager.resolve_targets(targets)
@@ -266,22 +699,408 @@ def run_build(
         logger.target(target.friendly_name, target.rust_target)
     logger.newline()
 
-    # Check if cross-compilation setup is needed
-    needs_setup = any(t.needs_zigbuild for t in resolved_targets)
-    if needs_setup:
-        if not tool_installer.is_zig_installed() or not tool_installer.is_macos_sdk_installed():
-            logger.header("Cross-compilation Setup Required")
-            if not tool_installer.setup_all():
-                return False
-            logger.newline()
+    # Collect a profile first: it is an input of every PGO build
+    build_executor = executor
+    pgo: Optional[PgoPipeline] = None
+    native: Optional[Target] = None
+    if config.pgo:
+        native_targets = target_manager.resolve_targets(["native"])
+        if not native_targets:
+            logger.error("PGO needs a native target to run the profiling workload")
+            return False
+        native = native_targets[0]
+
+        logger.header("Profile-guided Optimization")
+        pgo = PgoPipeline(executor)
+        # The instrumented build's inputs decide whether the last profile still applies
+        native_fingerprint = Fingerprinter(
+            config, project_root, tool_installer.get_env()
+        ).for_target(native)
+        with report.phase("pgo_profile"):
+            profiled = pgo.collect_profile(native, native_fingerprint, reuse=not config.force)
+        if not profiled:
+            return False
+        build_executor = pgo.optimized_executor()
+        logger.newline()
+
+    # Dev profile overrides and the fastest linker per target
+    target_inputs: Dict[str, Dict[str, str]] = {}
+    if config.fast:
+        fast = FastMode(executor)
+        build_executor = fast.fast_executor(build_executor, resolved_targets)
+        target_inputs = fast.fingerprint_inputs(resolved_targets)
+        for target in resolved_targets:
+            logger.info(f"{target.friendly_name}: linking with {fast.linker_for(target)[0]}")
+        logger.newline()
 
-    # Build all targets
-    results = executor.build_all(resolved_targets)
+    # Link BOLT targets with relocations so llvm-bolt can rewrite them
+    bolt: Optional[BoltStage] = None
+    if config.bolt:
+        bolt = BoltStage(executor, config.bolt_profile)
+        if bolt.find_tools():
+            build_executor = bolt.relinking_executor(build_executor, resolved_targets)
+            for rust_target, inputs in bolt.fingerprint_inputs(resolved_targets).items():
+                target_inputs.setdefault(rust_target, {}).update(inputs)
+        else:
+            logger.warning("Skipping the BOLT stage")
+            bolt = None
+
+    # Skip targets whose inputs match their last successful build
+    with report.phase("fingerprint"):
+        fingerprinter = Fingerprinter(
+            config,
+            project_root,
+            tool_installer.get_env(),
+            extra=pgo.fingerprint_inputs() if pgo is not None else None,
+            target_extra=target_inputs,
+        )
+        fingerprints = {t.rust_target: fingerprinter.for_target(t) for t in resolved_targets}
+    store = FingerprintStore(project_root / config.cache_dir / "fingerprints.json")
+
+    # Outcome of every target, written as each one finishes
+    journal = BuildJournal(project_root / config.cache_dir / "build-journal.json")
+    journal.begin(targets, "release" if config.release else "debug")
+
+    def journal_result(result: BuildResult) -> None:
+        fingerprint = fingerprints[result.target.rust_target]
+        if result.success:
+            journal.record(result.target, fingerprint, "built", result.binary_path)
+        elif result.cancelled:
+            journal.record(result.target, fingerprint, "cancelled")
+        else:
+            journal.record(result.target, fingerprint, "failed", error=result.error_message)
+
+    results: List[BuildResult] = []
+    pending: List[Target] = []
+    for target in resolved_targets:
+        dist_path = executor.dist_path(target)
+        fingerprint = fingerprints[target.rust_target]
+        if config.resume and journal.completed(target, fingerprint, dist_path):
+            logger.info(f"{target.friendly_name} completed in the last run, skipping")
+            results.append(BuildResult(
+                target=target,
+                success=True,
+                binary_path=dist_path,
+                up_to_date=True,
+            ))
+        elif not config.force and store.is_up_to_date(target, fingerprint, dist_path):
+            logger.info(f"{target.friendly_name} is up to date")
+            results.append(BuildResult(
+                target=target,
+                success=True,
+                binary_path=dist_path,
+                up_to_date=True,
+            ))
+        else:
+            pending.append(target)
+
+    # Restore release binaries built from the same inputs before
+    cache: Optional[ArtifactCache] = None
+    if config.release and config.artifact_cache_size_mb > 0:
+        cache = ArtifactCache(
+            project_root / config.cache_dir / "artifacts",
+            config.artifact_cache_size_mb * 1024 * 1024,
+        )
+        for target in list(pending):
+            dist_path = executor.dist_path(target)
+            with report.phase("artifact_cache", target.friendly_name):
+                restored = not config.force and cache.restore(
+                    fingerprints[target.rust_target], dist_path
+                )
+            if restored:
+                logger.info(f"{target.friendly_name} restored from artifact cache")
+                results.append(BuildResult(
+                    target=target,
+                    success=True,
+                    binary_path=dist_path,
+                    from_cache=True,
+                ))
+                pending.remove(target)
+
+    if pending:
+        # Check if cross-compilation setup is needed
+        needs_setup = any(t.needs_zigbuild for t in pending)
+        if needs_setup:
+            if not tool_installer.is_zig_installed() or not tool_installer.is_macos_sdk_installed():
+                logger.header("Cross-compilation Setup Required")
+                with report.phase("cross_setup"):
+                    setup_ok = tool_installer.setup_all()
+                if not setup_ok:
+                    return False
+                logger.newline()
+
+        # Build all targets
+        results.extend(build_executor.build_all(pending, on_result=journal_result))
+
+    # Report in the order targets were requested
+    order = {t.rust_target: i for i, t in enumerate(resolved_targets)}
+    results.sort(key=lambda r: order[r.target.rust_target])
+
+    # Rewrite fresh Linux binaries with BOLT before they go to dist
+    if bolt is not None:
+        for result in results:
+            if not result.success or result.up_to_date or result.from_cache:
+                continue
+            name = result.target.friendly_name
+            if not bolt.supports(result.target):
+                if result.target.rust_target in BOLT_TARGETS:
+                    logger.info(f"{name} cannot be profiled on this host, skipping BOLT")
+                continue
+            with report.phase("bolt", name):
+                optimized = bolt.optimize(result.target, result.binary_path)
+            if optimized is None:
+                result.success = False
+                result.error_message = "BOLT optimization failed"
+            else:
+                result.binary_path = optimized
 
     # Copy to dist
+    copied: List[Tuple[Path, str]] = []
     if any(r.success for r in results):
-        copied = executor.copy_to_dist(results)
-        logger.results(copied)
+        with report.phase("copy_to_dist"):
+            copied = executor.copy_to_dist(results)
+    copied_paths = {path for path, _ in copied}
+
+    # Check the budget before anything records a binary as done: one over
+    # budget fails and is neither cached nor skipped as up to date next time
+    size_ok = True
+    if config.size_report:
+        fresh = [
+            r for r in results
+            if r.success and not r.up_to_date and not r.from_cache
+            and executor.dist_path(r.target) in copied_paths
+        ]
+        if fresh:
+            logger.header("Binary Size")
+            with report.phase("size_report"):
+                size_ok = check_binary_sizes(
+                    config, project_root, build_executor, fresh, logger, report,
+                    {"version": report.version, "source": fingerprinter.source_hash},
+                )
+            logger.newline()
+
+    if copied:
+        # Remember what each fresh binary was built from
+        for result in results:
+            dist_path = executor.dist_path(result.target)
+            if not result.success or result.up_to_date or dist_path not in copied_paths:
+                continue
+            fingerprint = fingerprints[result.target.rust_target]
+            store.record(result.target, fingerprint, dist_path)
+            if cache is not None and not result.from_cache:
+                cache.store(fingerprint, dist_path, result.target.rust_target, result.sha256)
+        store.save()
+
+    # Final outcome of each target; --resume skips the completed ones next time
+    for result in results:
+        fingerprint = fingerprints[result.target.rust_target]
+        dist_path = executor.dist_path(result.target)
+        if result.success and dist_path in copied_paths:
+            if result.up_to_date:
+                outcome = "up_to_date"
+            elif result.from_cache:
+                outcome = "cached"
+            else:
+                outcome = "success"
+            journal.record(result.target, fingerprint, outcome, dist_path)
+        elif result.cancelled:
+            journal.record(result.target, fingerprint, "cancelled")
+        else:
+            error = result.error_message or "not copied to dist"
+            journal.record(result.target, fingerprint, "failed", error=error)
+
+    bundles_ok = True
+    if config.bundle and copied:
+        binaries = [
+            executor.dist_path(r.target)
+            for r in results
+            if r.success and executor.dist_path(r.target) in copied_paths
+        ]
+        try:
+            with report.phase("bundle"):
+                bundles = BundleMaker(config.job_budget).refresh(binaries, report)
+                update_checksums(executor.dist_dir, digest_files(bundles))
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.error(f"Bundling failed: {e}")
+            bundles_ok = False
+        else:
+            for bundle in bundles:
+                copied.append((bundle, executor._format_size(bundle.stat().st_size)))
+
+    deltas_ok = True
+    if config.deltas_from is not None and copied_paths:
+        binaries = [
+            executor.dist_path(r.target)
+            for r in results
+            if r.success and executor.dist_path(r.target) in copied_paths
+        ]
+        logger.info(f"Diffing against the release in {config.deltas_from}...")
+        try:
+            with report.phase("deltas"):
+                manifest, missing = make_deltas(
+                    config.deltas_from, executor.dist_dir, binaries, report.version, config.job_budget
+                )
+        except (OSError, ValueError) as e:
+            logger.error(f"Delta patches failed: {e}")
+            deltas_ok = False
+        else:
+            for name in missing:
+                logger.warning(f"{name} is not in {config.deltas_from}, no patch")
+            for name, entry in manifest["patches"].items():
+                bench = entry["benchmark"]
+                logger.info(
+                    f"{entry['patch']['name']}: {executor._format_size(entry['patch']['size'])} "
+                    f"({bench['patch_ratio']:.1%} of the binary), applies in {bench['apply_seconds']:.2f}s"
+                )
+                report.add_section("deltas", name, {
+                    "from_version": manifest["from_version"],
+                    "to_version": manifest["to_version"],
+                    "patch_size": entry["patch"]["size"],
+                    **bench,
+                })
+
+    if config.timings:
+        history = TimingsHistory(project_root / config.cache_dir / "timings-history.jsonl")
+        profile = "release" if config.release else "debug"
+        for result in results:
+            if not result.success or result.up_to_date or result.from_cache:
+                continue
+            name = result.target.friendly_name
+            summary = build_executor.timing_summary(result.target)
+            if summary is None:
+                logger.warning(f"No cargo timing data for {name} (nothing recompiled?)")
+                continue
+
+            report.add_section("timings", name, summary.to_dict())
+            logger.info(
+                f"{name}: compiled in {summary.total_seconds:.1f}s, "
+                f"critical path {summary.critical_path_seconds:.1f}s over "
+                f"{len(summary.critical_path)} unit(s), "
+                f"average parallelism {summary.average_parallelism:.1f}"
+            )
+            slowest = ", ".join(
+                f"{u['unit']} {u['duration']:.1f}s" for u in summary.slowest_units
+            )
+            logger.info(f"  Slowest: {slowest}")
+
+            regressions = history.record(
+                name,
+                profile,
+                summary,
+                {"version": report.version, "source": fingerprinter.source_hash},
+            )
+            for regression in regressions:
+                logger.warning(f"{name} compile time regressed: {regression}")
+
+    if pgo is not None and native is not None:
+        # Benchmark the optimized native binary, building it if not requested;
+        # an up-to-date one was measured when it was built
+        optimized: Optional[Path] = None
+        measured = False
+        for result in results:
+            if result.success and result.target.rust_target == native.rust_target:
+                optimized = executor.dist_path(native)
+                measured = result.up_to_date
+        if measured:
+            logger.info(f"{native.friendly_name} is unchanged, skipping the PGO benchmark")
+        elif optimized is None:
+            built = build_executor.build_target(native)
+            optimized = built.binary_path if built.success else None
+        if optimized is not None and not measured:
+            pgo.measure(native, optimized)
+
+    report.write(executor.dist_dir / "build-report.json")
+    headers, rows = report.table()
+    if copied:
+        logger.results(copied, table=(headers, rows))
+    else:
+        logger.table(headers, rows)
+
+    if cache is not None:
+        cache.save()
+        if cache.hits or cache.misses:
+            logger.info(
+                f"Artifact cache: {cache.hits} hit(s), {cache.misses} miss(es), "
+                f"{executor._format_size(cache.total_size())} stored"
+            )
 
     # Return success if all builds passed
-    return all(r.success for r in results)
+    return all(r.success for r in results) and size_ok and bundles_ok and deltas_ok
+
+
+def check_binary_sizes(
+    config: BuildConfig,
+    project_root: Path,
+    executor: BuildExecutor,
+    results: List[BuildResult],
+    logger: Logger,
+    report: BuildReport,
+    inputs: Dict[str, str],
+) -> bool:
+    """
+    Attribute the size of fresh dist binaries to crates and check the budget.
+
+    Release binaries are stripped, so symbols come from an unstripped build
+    of the same targets; the budget applies to the shipped file size.
+    Results of release binaries over budget are marked failed, and their
+    sizes don't become the baseline of the next check.
+    Returns False if a release binary is over budget.
+    """
+    try:
+        budget = SizeBudget.load(project_root / config.size_budget)
+    except ValueError as e:
+        logger.error(f"Invalid size budget {config.size_budget}: {e}")
+        return False
+    history = SizeHistory(project_root / config.cache_dir / "size-history")
+    profile = "release" if config.release else "debug"
+
+    unstripped: Dict[str, Optional[Path]] = {}
+    if config.release:
+        logger.info("Building unstripped copies for symbol attribution...")
+        symbols_executor = executor.with_rustflags(
+            executor.target_dir / "unstripped", executor.rustflags, executor.target_rustflags
+        )
+        symbols_executor.extra_env["CARGO_PROFILE_RELEASE_STRIP"] = "false"
+        for built in symbols_executor.build_all([r.target for r in results]):
+            unstripped[built.target.rust_target] = built.binary_path if built.success else None
+    else:
+        unstripped = {r.target.rust_target: executor.dist_path(r.target) for r in results}
+
+    ok = True
+    for result in results:
+        name = result.target.friendly_name
+        shipped = executor.dist_path(result.target)
+        symbols_path = unstripped.get(result.target.rust_target)
+        layout = read_layout(symbols_path) if symbols_path is not None else None
+        if layout is None:
+            logger.warning(f"Could not read symbols of {name}, skipping size attribution")
+            continue
+
+        breakdown = attribute(layout, shipped.stat().st_size)
+        report.add_section("size", name, breakdown.to_dict())
+        total = breakdown.attributed_bytes
+        logger.info(
+            f"{name}: {executor._format_size(breakdown.file_bytes)} shipped, "
+            f"{executor._format_size(total)} allocated"
+        )
+        for crate, size in breakdown.top(breakdown.crates, 8):
+            logger.info(f"  {crate:<24} {executor._format_size(size):>9} {size / total * 100:5.1f}%")
+        top_modules = ", ".join(
+            f"{module} {executor._format_size(size)}"
+            for module, size in breakdown.top(breakdown.modules, 5)
+        )
+        if top_modules:
+            logger.info(f"  Largest modules: {top_modules}")
+
+        violations: List[str] = []
+        if config.release:
+            violations = budget.check(name, breakdown, history.last(name, profile))
+        history.record(name, profile, breakdown, inputs, within_budget=not violations)
+        for violation in violations:
+            logger.error(f"{name} size budget: {violation}")
+        if violations:
+            result.success = False
+            result.error_message = "over the size budget"
+            ok = False
+
+    return ok
@@ -0,0 +1,75 @@
+"""
+Fast inner-loop dev builds.
+"""
+import shutil
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from .targets import Target
+
+if TYPE_CHECKING:
+    from .executor import BuildExecutor
+
+# Dev profile overrides, set through cargo's environment so Cargo.toml stays
+# as it is: debug info next to the objects instead of copied into the
+# binary, incremental rebuilds of the opendir crate and many small codegen
+# units for parallel codegen
+PROFILE_ENV = {
+    "CARGO_PROFILE_DEV_SPLIT_DEBUGINFO": "unpacked",
+    "CARGO_PROFILE_DEV_INCREMENTAL": "true",
+    "CARGO_PROFILE_DEV_CODEGEN_UNITS": "256",
+}
+
+# Linkers cc can be told to use with -fuse-ld, fastest first
+LINUX_LINKERS = (("mold", "mold"), ("ld.lld", "lld"))
+MACOS_LINKERS = (("ld64.lld", "lld"),)
+
+
+class FastMode:
+    """
+    Picks the fastest linker for each target of a --fast build.
+
+    Native builds link through cc with mold or lld when one is installed.
+    Cross targets already link with `zig cc` through cargo-zigbuild, using
+    the zig that ToolInstaller installs.
+    """
+
+    def __init__(self, executor: "BuildExecutor"):
+        self.executor = executor
+        self._path = executor.tool_installer.get_env().get("PATH")
+        self._linkers: Dict[str, Tuple[str, List[str]]] = {}
+
+    def linker_for(self, target: Target) -> Tuple[str, List[str]]:
+        """Get a target's linker description and the RUSTFLAGS selecting it."""
+        if target.rust_target in self._linkers:
+            return self._linkers[target.rust_target]
+
+        choice: Tuple[str, List[str]] = ("cc", [])
+        if target.needs_zigbuild:
+            choice = ("zig cc", [])
+        elif target.is_native:
+            candidates = LINUX_LINKERS if target.platform == "linux" else MACOS_LINKERS
+            for tool, fuse_ld in candidates:
+                if shutil.which(tool, path=self._path):
+                    choice = (tool, [f"-Clink-arg=-fuse-ld={fuse_ld}"])
+                    break
+
+        self._linkers[target.rust_target] = choice
+        return choice
+
+    def fingerprint_inputs(self, targets: List[Target]) -> Dict[str, Dict[str, str]]:
+        """Inputs that set fast builds apart, per rust target."""
+        profile = ",".join(f"{k}={v}" for k, v in sorted(PROFILE_ENV.items()))
+        return {
+            t.rust_target: {"fast": f"{self.linker_for(t)[0]}:{profile}"}
+            for t in targets
+        }
+
+    def fast_executor(self, executor: "BuildExecutor", targets: List[Target]) -> "BuildExecutor":
+        """Get an executor that builds with the fast settings."""
+        fast = executor.with_rustflags(
+            executor.target_dir / "fast",
+            executor.rustflags,
+            {t.rust_target: self.linker_for(t)[1] for t in targets if self.linker_for(t)[1]},
+        )
+        fast.extra_env.update(PROFILE_ENV)
+        return fast
@@ -0,0 +1,167 @@
+"""
+Source fingerprints for skipping targets whose inputs have not changed.
+"""
+import hashlib
+import json
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, Optional
+
+from .config import BuildConfig
+from .targets import Target
+
+# Files at the project root that affect every build
+MANIFEST_FILES = ("Cargo.toml", "Cargo.lock")
+
+# Environment variables that change what cargo produces
+FINGERPRINT_ENV = ("RUSTFLAGS", "CARGO_ENCODED_RUSTFLAGS", "CARGO_BUILD_RUSTFLAGS")
+
+
+def hash_source_tree(project_root: Path) -> str:
+    """Hash src/** and the cargo manifests by relative path and content."""
+    digest = hashlib.sha256()
+
+    paths = [project_root / name for name in MANIFEST_FILES]
+    src_dir = project_root / "src"
+    if src_dir.is_dir():
+        paths.extend(sorted(p for p in src_dir.rglob("*") if p.is_file()))
+
+    for path in paths:
+        if not path.is_file():
+            continue
+        digest.update(path.relative_to(project_root).as_posix().encode())
+        digest.update(b"\0")
+        digest.update(path.read_bytes())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+class Fingerprinter:
+    """Computes per-target fingerprints of everything that feeds a build."""
+
+    def __init__(
+        self,
+        config: BuildConfig,
+        project_root: Path,
+        env: Dict[str, str],
+        extra: Optional[Dict[str, str]] = None,
+        target_extra: Optional[Dict[str, Dict[str, str]]] = None,
+    ):
+        self.config = config
+        self.project_root = project_root
+        self.env = env
+        # Inputs of optional build stages, e.g. the PGO profile digest
+        self.extra = dict(extra or {})
+        # Same, per rust target, for stages that only apply to some targets
+        self.target_extra = dict(target_extra or {})
+        self._source_hash: Optional[str] = None
+        self._toolchain: Optional[str] = None
+
+    @property
+    def source_hash(self) -> str:
+        if self._source_hash is None:
+            self._source_hash = hash_source_tree(self.project_root)
+        return self._source_hash
+
+    @property
+    def toolchain(self) -> str:
+        """Version details of the rustc that cargo would use."""
+        if self._toolchain is None:
+            try:
+                result = subprocess.run(
+                    ["rustc", "-vV"],
+                    capture_output=True,
+                    text=True,
+                    env=self.env,
+                )
+                self._toolchain = result.stdout.strip() if result.returncode == 0 else ""
+            except FileNotFoundError:
+                self._toolchain = ""
+        return self._toolchain
+
+    def inputs(self, target: Target) -> Dict[str, str]:
+        """Get the named inputs that make up a target's fingerprint."""
+        inputs = {
+            "source": self.source_hash,
+            "target": target.rust_target,
+            "profile": "release" if self.config.release else "debug",
+            "toolchain": self.toolchain,
+        }
+
+        for name in FINGERPRINT_ENV:
+            if self.env.get(name):
+                inputs[f"env:{name}"] = self.env[name]
+
+        if target.platform == "macos":
+            inputs["env:SDKROOT"] = self.env.get("SDKROOT", "")
+
+        if target.needs_zigbuild:
+            # zig is located through PATH; record which one and its version
+            inputs["zig"] = f"{self.config.zig_version}:{self._zig_path_entry()}"
+
+        inputs.update(self.extra)
+        inputs.update(self.target_extra.get(target.rust_target, {}))
+
+        return inputs
+
+    def for_target(self, target: Target) -> str:
+        """Get the fingerprint of a target's build inputs."""
+        encoded = json.dumps(self.inputs(target), sort_keys=True).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _zig_path_entry(self) -> str:
+        for entry in self.env.get("PATH", "").split(os.pathsep):
+            if entry and (Path(entry) / "zig").is_file():
+                return entry
+        return ""
+
+
+class FingerprintStore:
+    """Last successful fingerprint and dist artifact state per target."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._entries: Optional[Dict[str, dict]] = None
+
+    @property
+    def entries(self) -> Dict[str, dict]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def is_up_to_date(self, target: Target, fingerprint: str, artifact: Path) -> bool:
+        """Check that a target was last built from these inputs and is still in place."""
+        entry = self.entries.get(target.friendly_name)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return False
+
+        try:
+            stat = artifact.stat()
+        except OSError:
+            return False
+
+        # The artifact must be the file that build produced
+        return entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+
+    def record(self, target: Target, fingerprint: str, artifact: Path) -> None:
+        """Remember a successful build of a target."""
+        stat = artifact.stat()
+        self.entries[target.friendly_name] = {
+            "fingerprint": fingerprint,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def save(self) -> None:
+        """Write the store, replacing the previous file atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
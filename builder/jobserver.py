@@ -0,0 +1,69 @@
+"""
+GNU make compatible jobserver shared by concurrent cargo processes.
+"""
+import os
+from typing import Dict, Optional, Tuple
+
+
+class JobServer:
+    """
+    Token pipe implementing the GNU make jobserver protocol.
+
+    Cargo (and the rustc/cc processes it spawns) picks up an inherited
+    jobserver from CARGO_MAKEFLAGS and uses it instead of its own ``-j``
+    limit, so every cargo started with ``env()`` and ``pass_fds()`` draws
+    from one global pool of job slots.
+    """
+
+    def __init__(self, jobs: int, clients: int = 1):
+        # Every client process owns one implicit token, so only the
+        # remainder is written into the pipe.
+        self.jobs = max(1, jobs)
+        self.tokens = max(0, self.jobs - max(1, clients))
+        self._fds: Optional[Tuple[int, int]] = None
+
+    def __enter__(self) -> "JobServer":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def open(self) -> None:
+        """Create the token pipe and fill it."""
+        if self._fds is not None:
+            return
+
+        read_fd, write_fd = os.pipe()
+        self._fds = (read_fd, write_fd)
+        if self.tokens:
+            os.write(write_fd, b"+" * self.tokens)
+
+    def close(self) -> None:
+        """Close the token pipe."""
+        if self._fds is None:
+            return
+
+        for fd in self._fds:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._fds = None
+
+    def pass_fds(self) -> Tuple[int, ...]:
+        """File descriptors that must be inherited by client processes."""
+        return self._fds or ()
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables advertising the jobserver to cargo."""
+        if self._fds is None:
+            return {}
+
+        read_fd, write_fd = self._fds
+        return {
+            "CARGO_MAKEFLAGS": (
+                f"-j --jobserver-fds={read_fd},{write_fd} "
+                f"--jobserver-auth={read_fd},{write_fd}"
+            ),
+        }
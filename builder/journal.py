@@ -0,0 +1,98 @@
+"""
+Crash-safe journal of target outcomes, for resuming failed builds.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .targets import Target
+
+# Outcomes after which a target's dist binary is usable
+COMPLETED = ("success", "up_to_date", "cached")
+
+
+class BuildJournal:
+    """
+    Outcome, fingerprint and artifact of every target of the latest run.
+
+    The journal is rewritten through a temporary file and an atomic rename
+    each time a target finishes, so a crash or Ctrl-C leaves the outcome of
+    every finished target on disk. Entries of targets the run did not touch
+    are carried over from the previous journal.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.previous = self._load()
+        self.data: Dict[str, Any] = {
+            "started": time.time(),
+            "profile": None,
+            "targets": [],
+            "entries": dict(self.previous.get("entries", {})),
+        }
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def last_targets(self) -> List[str]:
+        """Get the target specifications of the previous run."""
+        return list(self.previous.get("targets", []))
+
+    def begin(self, targets: List[str], profile: str) -> None:
+        """Start a run of the given target specifications."""
+        with self._lock:
+            self.data["targets"] = list(targets)
+            self.data["profile"] = profile
+            self._write()
+
+    def completed(self, target: Target, fingerprint: str, artifact: Path) -> bool:
+        """Check that a target completed last time from these inputs and its artifact is in place."""
+        entry = self.previous.get("entries", {}).get(target.friendly_name)
+        return (
+            entry is not None
+            and entry.get("outcome") in COMPLETED
+            and entry.get("fingerprint") == fingerprint
+            and entry.get("artifact") == str(artifact)
+            and artifact.is_file()
+        )
+
+    def record(
+        self,
+        target: Target,
+        fingerprint: str,
+        outcome: str,
+        artifact: Optional[Path] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Record a target's outcome and write the journal."""
+        entry: Dict[str, Any] = {
+            "target": target.rust_target,
+            "fingerprint": fingerprint,
+            "outcome": outcome,
+            "artifact": str(artifact) if artifact is not None else None,
+            "timestamp": time.time(),
+        }
+        if error:
+            # Keep the end of cargo's diagnostics, where the error usually is
+            entry["error"] = error[-2000:]
+        with self._lock:
+            self.data["entries"][target.friendly_name] = entry
+            self._write()
+
+    def _write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Linker wrapper that records how long each link takes.
+
+rustc_cache.py points rustc's `-C linker` at this script for crates that
+link (binaries, build scripts, proc macros) and passes the linker it
+replaced in the environment. The link runs unchanged; its duration is
+appended as a JSON line to the log the builder reads after the build.
+
+This file runs as a standalone script, so it only uses the standard
+library. Configuration comes from the environment:
+
+    OPENDIR_LINK_LOG      JSON lines log (timing is off when unset)
+    OPENDIR_REAL_LINKER   linker to run
+    OPENDIR_LINK_CRATE    crate being linked
+"""
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+LINK_LOG_ENV = "OPENDIR_LINK_LOG"
+REAL_LINKER_ENV = "OPENDIR_REAL_LINKER"
+LINK_CRATE_ENV = "OPENDIR_LINK_CRATE"
+
+LINK_TIMER = Path(__file__).resolve()
+
+
+def linker_name(linker: str, args: List[str]) -> str:
+    """Describe the linker, including a -fuse-ld choice passed through cc."""
+    name = Path(linker).name
+    # cc goes with the last one; rustc may pass its own before link-args
+    for arg in reversed(args):
+        if arg.startswith("-fuse-ld="):
+            return f"{name} ({arg.split('=', 1)[1]})"
+    return name
+
+
+def read_link_log(path: Path) -> List[Dict]:
+    """Get the links recorded in a log, oldest first."""
+    entries = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return entries
+
+
+def main(args: List[str]) -> int:
+    linker = os.environ.get(REAL_LINKER_ENV, "cc")
+    started = time.monotonic()
+    returncode = subprocess.call([linker] + args)
+    seconds = time.monotonic() - started
+
+    log = os.environ.get(LINK_LOG_ENV)
+    if log and returncode == 0:
+        entry = {
+            "crate": os.environ.get(LINK_CRATE_ENV, ""),
+            "linker": linker_name(linker, args),
+            "seconds": round(seconds, 3),
+        }
+        try:
+            with open(log, "a", encoding="utf-8") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+    return returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
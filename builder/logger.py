@@ -2,8 +2,10 @@
 Colored logging for build output.
 """
 import sys
+import threading
+from contextlib import contextmanager
 from enum import Enum
-from typing import Optional
+from typing import Iterator, List, Optional, Sequence, Tuple
 
 
 class Color(Enum):
@@ -25,6 +27,10 @@ class Logger:
     def __init__(self, use_color: bool = True, verbose: bool = False):
         self.use_color = use_color and sys.stdout.isatty()
         self.verbose = verbose
+        # Serializes output from concurrent target builds
+        self._lock = threading.Lock()
+        # Name of the task each thread is running, shown before its messages
+        self._local = threading.local()
 
     def _colorize(self, text: str, color: Color) -> str:
         """Apply color to text if colors are enabled."""
@@ -32,19 +38,46 @@ class Logger:
             return f"{color.value}{text}{Color.RESET.value}"
         return text
 
+    def _write(self, *lines: str) -> None:
+        """Print lines without interleaving with other threads."""
+        with self._lock:
+            for line in lines:
+                print(line)
+            sys.stdout.flush()
+
     def _print(self, prefix: str, message: str, color: Color) -> None:
         """Print a formatted message."""
         colored_prefix = self._colorize(prefix, color)
-        print(f"{colored_prefix} {message}")
+        task = self.current_task
+        if task is not None:
+            message = f"{self._colorize(f'[{task}]', Color.MAGENTA)} {message}"
+        self._write(f"{colored_prefix} {message}")
+
+    @property
+    def current_task(self) -> Optional[str]:
+        """Name of the task the calling thread runs, if any."""
+        return getattr(self._local, "task", None)
+
+    @contextmanager
+    def task(self, name: Optional[str]) -> Iterator[None]:
+        """Prefix the calling thread's messages with a task name."""
+        previous = self.current_task
+        self._local.task = name
+        try:
+            yield
+        finally:
+            self._local.task = previous
 
     def header(self, title: str) -> None:
         """Print a header section."""
         line = "=" * 50
-        print()
-        print(self._colorize(line, Color.GREEN))
-        print(self._colorize(f"  {title}", Color.GREEN))
-        print(self._colorize(line, Color.GREEN))
-        print()
+        self._write(
+            "",
+            self._colorize(line, Color.GREEN),
+            self._colorize(f"  {title}", Color.GREEN),
+            self._colorize(line, Color.GREEN),
+            "",
+        )
 
     def info(self, message: str) -> None:
         """Print an info message."""
@@ -67,6 +100,10 @@ class Logger:
         if self.verbose:
             self._print("·", message, Color.CYAN)
 
+    def progress(self, message: str) -> None:
+        """Print a progress update for a long-running operation."""
+        self._print("…", message, Color.CYAN)
+
     def step(self, number: int, total: int, message: str) -> None:
         """Print a step in a sequence."""
         prefix = f"[{number}/{total}]"
@@ -77,22 +114,44 @@ class Logger:
         target_str = self._colorize(target, Color.YELLOW)
         if status:
             status_str = self._colorize(f"({status})", Color.CYAN)
-            print(f"  → {target_str} {status_str}")
+            self._write(f"  → {target_str} {status_str}")
         else:
-            print(f"  → {target_str}")
+            self._write(f"  → {target_str}")
 
     def binary(self, name: str, size: str) -> None:
         """Print binary information."""
         name_str = self._colorize(name, Color.GREEN)
         size_str = self._colorize(f"({size})", Color.CYAN)
-        print(f"    {name_str} {size_str}")
+        self._write(f"    {name_str} {size_str}")
 
     def newline(self) -> None:
         """Print an empty line."""
-        print()
-
-    def results(self, binaries: list) -> None:
-        """Print build results summary."""
+        self._write("")
+
+    def table(self, headers: Sequence[str], rows: List[Sequence[str]]) -> None:
+        """Print a compact aligned table."""
+        if not rows:
+            return
+
+        widths = [
+            max(len(str(cell)) for cell in column)
+            for column in zip(headers, *rows)
+        ]
+
+        def format_row(cells: Sequence[str]) -> str:
+            return "  ".join(str(cell).ljust(width) for cell, width in zip(cells, widths)).rstrip()
+
+        lines = [self._colorize(format_row(headers), Color.BOLD)]
+        lines.append("  ".join("-" * width for width in widths))
+        lines.extend(format_row(row) for row in rows)
+        self._write("", *(f"  {line}" for line in lines))
+
+    def results(
+        self,
+        binaries: list,
+        table: Optional[Tuple[Sequence[str], List[Sequence[str]]]] = None,
+    ) -> None:
+        """Print build results summary, with an optional timing table."""
         self.header("Build Complete!")
 
         if binaries:
@@ -101,3 +160,6 @@ class Logger:
                 self.binary(binary_path.name, size)
         else:
             self.warning("No binaries were built")
+
+        if table is not None:
+            self.table(*table)
@@ -0,0 +1,239 @@
+"""
+Profile-guided optimization of release builds.
+"""
+import hashlib
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional
+
+from .artifacts import file_digest
+from .targets import Target
+from .workload import TuiWorkload
+
+if TYPE_CHECKING:
+    from .executor import BuildExecutor
+
+
+class PgoPipeline:
+    """
+    Collects a profile with an instrumented native build and feeds it back.
+
+    The instrumented opendir runs the scripted TUI workload, the raw
+    profiles are merged with the toolchain's llvm-profdata and every target
+    is then rebuilt with -Cprofile-use. Cross targets use the profile of the
+    host architecture; functions whose IR differs are simply left
+    unoptimized, so mismatch warnings are turned off.
+
+    The profile is kept with the fingerprint of the instrumented build's
+    inputs and the workload, and reused while they match: a new profile
+    would differ slightly even from the same inputs, and every target
+    would then be rebuilt.
+    """
+
+    def __init__(self, executor: "BuildExecutor", runs: int = 3):
+        self.executor = executor
+        self.logger = executor.logger
+        self.report = executor.report
+        self.runs = runs
+
+        self.work_dir = executor.target_dir / "pgo"
+        self.profiles_dir = self.work_dir / "profiles"
+        self.profdata = self.work_dir / "merged.profdata"
+        self.profdata_inputs = self.work_dir / "merged.profdata.json"
+        self.baseline = self.work_dir / "opendir-baseline"
+        self.workload = TuiWorkload(executor.project_root, self.work_dir / "workload")
+
+        self._profile_digest: Optional[str] = None
+
+    def _env(self) -> Dict[str, str]:
+        return self.executor.tool_installer.get_env()
+
+    def find_llvm_profdata(self) -> Optional[Path]:
+        """
+        Locate llvm-profdata matching the toolchain's LLVM.
+
+        The llvm-tools rustup component ships it in the sysroot; a copy from
+        PATH is only used as a fallback since the profile format follows the
+        LLVM version.
+        """
+        env = self._env()
+        try:
+            sysroot = subprocess.run(
+                ["rustc", "--print", "sysroot"], capture_output=True, text=True, env=env
+            ).stdout.strip()
+            version = subprocess.run(
+                ["rustc", "-vV"], capture_output=True, text=True, env=env
+            ).stdout
+        except FileNotFoundError:
+            return None
+
+        host = next(
+            (line.split(":", 1)[1].strip() for line in version.splitlines() if line.startswith("host:")),
+            None,
+        )
+        if sysroot and host:
+            candidate = Path(sysroot) / "lib" / "rustlib" / host / "bin" / "llvm-profdata"
+            if not candidate.exists():
+                self.logger.info("Installing llvm-tools component...")
+                try:
+                    subprocess.run(
+                        ["rustup", "component", "add", "llvm-tools"],
+                        capture_output=True,
+                        text=True,
+                        env=env,
+                    )
+                except FileNotFoundError:
+                    pass
+            if candidate.exists():
+                return candidate
+
+        # Distribution packages suffix the tool with the LLVM major version
+        llvm_version = next(
+            (line.split(":", 1)[1].strip() for line in version.splitlines() if line.startswith("LLVM version:")),
+            "",
+        )
+        names = ["llvm-profdata"]
+        if llvm_version:
+            names.insert(0, f"llvm-profdata-{llvm_version.split('.')[0]}")
+        for name in names:
+            path = shutil.which(name, path=env.get("PATH"))
+            if path:
+                if name == "llvm-profdata":
+                    self.logger.warning(f"Using {path}; its LLVM version must match rustc's ({llvm_version})")
+                return Path(path)
+        return None
+
+    def _profile_key(self, fingerprint: str) -> str:
+        """Combine the native build fingerprint with the workload's definition."""
+        digest = hashlib.sha256(fingerprint.encode())
+        digest.update(Path(__file__).with_name("workload.py").read_bytes())
+        digest.update(str(self.runs).encode())
+        return digest.hexdigest()
+
+    def _reusable_profile(self, key: str) -> Optional[str]:
+        """Get the digest of the merged profile if it was collected from these inputs."""
+        try:
+            with open(self.profdata_inputs, "r", encoding="utf-8") as f:
+                stamp = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if stamp.get("inputs") != key or not self.profdata.is_file() or not self.baseline.is_file():
+            return None
+        digest = file_digest(self.profdata)
+        return digest if digest == stamp.get("profdata") else None
+
+    def collect_profile(self, native: Target, fingerprint: str, reuse: bool = True) -> bool:
+        """
+        Build the baseline and instrumented binaries and merge a profile.
+
+        fingerprint is that of a regular native build; unless reuse is off,
+        a profile collected from the same one is kept.
+        """
+        key = self._profile_key(fingerprint)
+        if reuse:
+            digest = self._reusable_profile(key)
+            if digest is not None:
+                self._profile_digest = digest
+                self.logger.info(f"Reusing {self.profdata.name}, collected from the same inputs")
+                return True
+        self.profdata_inputs.unlink(missing_ok=True)
+
+        llvm_profdata = self.find_llvm_profdata()
+        if llvm_profdata is None:
+            self.logger.error(
+                "llvm-profdata not found. Run `rustup component add llvm-tools` first."
+            )
+            return False
+
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+
+        # Regular release binary, kept to measure the speedup against
+        self.logger.info("Building baseline binary...")
+        baseline = self.executor.build_target(native)
+        if not baseline.success or baseline.binary_path is None:
+            return False
+        shutil.copy2(baseline.binary_path, self.baseline)
+
+        self.logger.info("Building instrumented binary...")
+        instrumented = self.executor.with_rustflags(
+            self.work_dir / "instrumented",
+            [f"-Cprofile-generate={self.profiles_dir}"],
+        ).build_target(native)
+        if not instrumented.success or instrumented.binary_path is None:
+            return False
+
+        if self.profiles_dir.exists():
+            shutil.rmtree(self.profiles_dir)
+        self.profiles_dir.mkdir(parents=True)
+
+        self.logger.info("Running profiling workload...")
+        env = self._env()
+        env["LLVM_PROFILE_FILE"] = str(self.profiles_dir / "opendir-%p-%m.profraw")
+        with self.report.phase("pgo_workload", native.friendly_name):
+            run = self.workload.run(instrumented.binary_path, env)
+        if run.returncode != 0:
+            self.logger.error(f"Profiling workload exited with status {run.returncode}")
+            return False
+
+        raw_profiles = sorted(self.profiles_dir.glob("*.profraw"))
+        if not raw_profiles:
+            self.logger.error("Profiling workload produced no .profraw files")
+            return False
+
+        result = subprocess.run(
+            [str(llvm_profdata), "merge", "-o", str(self.profdata), *map(str, raw_profiles)],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            self.logger.error(f"llvm-profdata merge failed: {result.stderr.strip()}")
+            self.logger.info("Install the llvm-tools component to get a matching llvm-profdata")
+            return False
+
+        self._profile_digest = file_digest(self.profdata)
+        with open(self.profdata_inputs, "w", encoding="utf-8") as f:
+            json.dump({"inputs": key, "profdata": self._profile_digest}, f)
+        self.logger.success(f"Merged {len(raw_profiles)} profile(s) into {self.profdata.name}")
+        return True
+
+    def fingerprint_inputs(self) -> Dict[str, str]:
+        """Inputs that set PGO builds apart from regular ones."""
+        return {"pgo": self._profile_digest or ""}
+
+    def optimized_executor(self) -> "BuildExecutor":
+        """Get an executor that builds with the merged profile."""
+        return self.executor.with_rustflags(
+            self.work_dir / "optimized",
+            [
+                f"-Cprofile-use={self.profdata}",
+                "-Cllvm-args=-pgo-warn-mismatch=false",
+            ],
+        )
+
+    def measure(self, native: Target, optimized: Path) -> Optional[Dict[str, float]]:
+        """Compare the baseline and optimized binaries on the workload."""
+        self.logger.info(f"Measuring PGO speedup ({self.runs} runs each)...")
+        with self.report.phase("pgo_benchmark", native.friendly_name):
+            before = self.workload.benchmark(self.baseline, self.runs)
+            after = self.workload.benchmark(optimized, self.runs)
+
+        if before.returncode != 0 or after.returncode != 0 or after.cpu_seconds <= 0:
+            self.logger.warning("PGO benchmark did not complete")
+            return None
+
+        summary = {
+            "baseline_cpu_seconds": round(before.cpu_seconds, 3),
+            "pgo_cpu_seconds": round(after.cpu_seconds, 3),
+            "speedup": round(before.cpu_seconds / after.cpu_seconds, 3),
+            "baseline_max_rss_bytes": before.max_rss_bytes,
+            "pgo_max_rss_bytes": after.max_rss_bytes,
+            "runs": self.runs,
+        }
+        self.report.add_section("pgo", native.friendly_name, summary)
+        self.logger.info(
+            f"PGO: workload CPU time {before.cpu_seconds:.2f}s -> {after.cpu_seconds:.2f}s "
+            f"({(summary['speedup'] - 1) * 100:+.1f}% speed)"
+        )
+        return summary
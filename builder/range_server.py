@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Range-capable HTTP server standing in for tool download hosts.
+
+http.server's SimpleHTTPRequestHandler sends no Accept-Ranges and ignores
+Range, so it can't exercise resumed or segmented downloads. This server
+serves the files of a directory with an ETag and Last-Modified, answers
+Range requests (and If-Range ones while the validator matches) with 206,
+and can add first-byte latency, cap each connection's speed and drop
+connections part way, like a slow or flaky mirror.
+
+    python -m builder.range_server DIR [--port 8000] [--latency 0.05] [--rate 6] [--drops 2]
+"""
+import argparse
+import email.utils
+import http.server
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+MB = 1024 * 1024
+
+RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class RangeServer(http.server.ThreadingHTTPServer):
+    """Serves root over HTTP/1.1 with byte ranges, one thread per connection."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        root: Path,
+        port: int = 0,
+        latency: float = 0.0,
+        rate: float = 0.0,
+        drops: int = 0,
+        drop_after: int = 2 * MB,
+    ):
+        super().__init__(("127.0.0.1", port), RangeRequestHandler)
+        self.root = root.resolve()
+        # Seconds before each response, and bytes/s per connection (0 = unlimited)
+        self.latency = latency
+        self.rate = rate
+        # Responses still to cut off, each after drop_after bytes
+        self.drops = drops
+        self.drop_after = drop_after
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def take_drop(self) -> bool:
+        """Claim one of the remaining connection drops."""
+        with self._lock:
+            if self.drops <= 0:
+                return False
+            self.drops -= 1
+            return True
+
+    def start(self) -> "RangeServer":
+        """Serve in a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: RangeServer
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_HEAD(self) -> None:
+        self._respond(body=False)
+
+    def do_GET(self) -> None:
+        self._respond(body=True)
+
+    def _respond(self, body: bool) -> None:
+        path = (self.server.root / self.path.lstrip("/").split("?", 1)[0]).resolve()
+        if self.server.root not in path.parents or not path.is_file():
+            self.send_error(404)
+            return
+
+        stat = path.stat()
+        size = stat.st_size
+        etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+        last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+
+        time.sleep(self.server.latency)
+        byte_range = self._range(size, etag, last_modified)
+        if byte_range == (-1, -1):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        first, last = byte_range or (0, size - 1)
+        self.send_response(206 if byte_range else 200)
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {first}-{last}/{size}")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Content-Length", str(last - first + 1))
+        self.end_headers()
+        if body:
+            self._send_file(path, first, last)
+
+    def _range(self, size: int, etag: str, last_modified: str) -> Optional[Tuple[int, int]]:
+        """Get the requested byte range, None for the whole file, (-1, -1) if unsatisfiable."""
+        match = RANGE.match(self.headers.get("Range", "").strip())
+        if not match or not (match[1] or match[2]):
+            return None
+        validator = self.headers.get("If-Range")
+        if validator is not None and validator not in (etag, last_modified):
+            # The client has another version: send it this one whole
+            return None
+
+        if not match[1]:
+            # Suffix range: the last n bytes
+            first, last = max(0, size - int(match[2])), size - 1
+        else:
+            first = int(match[1])
+            last = min(int(match[2]), size - 1) if match[2] else size - 1
+        if first >= size or first > last:
+            return (-1, -1)
+        return first, last
+
+    def _send_file(self, path: Path, first: int, last: int) -> None:
+        drop_at = self.server.drop_after if self.server.take_drop() else None
+        started = time.monotonic()
+        sent = 0
+        with open(path, "rb") as f:
+            f.seek(first)
+            remaining = last - first + 1
+            while remaining > 0:
+                chunk = f.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                if drop_at is not None and sent + len(chunk) > drop_at:
+                    # Cut the connection mid-body, as a failing mirror would
+                    try:
+                        self.wfile.write(chunk[:max(0, drop_at - sent)])
+                        self.wfile.flush()
+                    except OSError:
+                        pass
+                    self.close_connection = True
+                    return
+                try:
+                    self.wfile.write(chunk)
+                except OSError:
+                    return
+                sent += len(chunk)
+                remaining -= len(chunk)
+                if self.server.rate > 0:
+                    # Hold the connection to its share of the bandwidth
+                    delay = sent / self.server.rate - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Serve a directory with HTTP byte ranges")
+    parser.add_argument("root", type=Path, help="Directory to serve")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response")
+    parser.add_argument("--rate", type=float, default=0.0, help="MB/s per connection (0 = unlimited)")
+    parser.add_argument("--drops", type=int, default=0, help="Responses to cut off part way")
+    parser.add_argument("--drop-after", type=float, default=2.0, help="MB sent before a drop")
+    args = parser.parse_args(argv)
+
+    server = RangeServer(
+        args.root, args.port, args.latency, args.rate * MB, args.drops, int(args.drop_after * MB)
+    )
+    print(f"Serving {server.root} at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,173 @@
+"""
+Per-phase timing and resource accounting for builds.
+"""
+import json
+import os
+import platform
+import re
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+@dataclass
+class PhaseTiming:
+    """Wall time spent in one build phase."""
+
+    name: str
+    seconds: float
+    target: Optional[str] = None
+    id: int = 0
+
+
+@dataclass
+class ProcessUsage:
+    """Resources used by a child process and everything it waited for."""
+
+    target: str
+    command: str
+    seconds: float
+    user_seconds: float
+    system_seconds: float
+    max_rss_bytes: int
+    returncode: int
+    # The innermost phase the process ran in, set by record_process
+    phase_id: Optional[int] = None
+
+
+@dataclass
+class BuildReport:
+    """Collects timings for a build run and writes dist/build-report.json."""
+
+    version: Optional[str] = None
+    started: float = field(default_factory=time.time)
+    phases: List[PhaseTiming] = field(default_factory=list)
+    processes: List[ProcessUsage] = field(default_factory=list)
+    # Extra per-target sections contributed by optional build stages
+    sections: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._next_phase_id = 0
+        # Phases are opened per thread: concurrent target builds each have their own
+        self._open_phases = threading.local()
+
+    def _phase_stack(self) -> List[int]:
+        if not hasattr(self._open_phases, "stack"):
+            self._open_phases.stack = []
+        return self._open_phases.stack
+
+    @contextmanager
+    def phase(self, name: str, target: Optional[str] = None) -> Iterator[None]:
+        """Time the enclosed block as a phase."""
+        with self._lock:
+            self._next_phase_id += 1
+            phase_id = self._next_phase_id
+        stack = self._phase_stack()
+        stack.append(phase_id)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            stack.pop()
+            timing = PhaseTiming(
+                name=name, seconds=time.monotonic() - started, target=target, id=phase_id
+            )
+            with self._lock:
+                self.phases.append(timing)
+
+    def record_process(self, usage: ProcessUsage) -> None:
+        """Record a child process, owned by this thread's innermost open phase."""
+        stack = self._phase_stack()
+        if usage.phase_id is None and stack:
+            usage.phase_id = stack[-1]
+        with self._lock:
+            self.processes.append(usage)
+
+    def add_section(self, name: str, key: str, data: Any) -> None:
+        """Attach stage-specific data, e.g. add_section("timings", target, {...})."""
+        with self._lock:
+            self.sections.setdefault(name, {})[key] = data
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "started": self.started,
+            "total_seconds": time.time() - self.started,
+            "host": f"{platform.system().lower()}-{platform.machine().lower()}",
+            "phases": [asdict(p) for p in self.phases],
+            "processes": [asdict(p) for p in self.processes],
+            **self.sections,
+        }
+
+    def write(self, path: Path) -> None:
+        """Write the report as JSON, replacing any previous one atomically."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def table(self) -> Tuple[List[str], List[List[str]]]:
+        """Get a compact summary table: one row per phase, with its own child usage."""
+        headers = ["Phase", "Target", "Wall", "User", "Sys", "Peak RSS"]
+        usage: Dict[int, List[ProcessUsage]] = {}
+        for process in self.processes:
+            if process.phase_id is not None:
+                usage.setdefault(process.phase_id, []).append(process)
+
+        rows = []
+        for phase in self.phases:
+            row = [phase.name, phase.target or "-", f"{phase.seconds:.2f}s", "-", "-", "-"]
+            if phase.id in usage:
+                children = usage[phase.id]
+                row[3] = f"{sum(p.user_seconds for p in children):.1f}s"
+                row[4] = f"{sum(p.system_seconds for p in children):.1f}s"
+                row[5] = f"{max(p.max_rss_bytes for p in children) / (1024 * 1024):.0f}MB"
+            rows.append(row)
+        return headers, rows
+
+
+def wait_with_usage(process: subprocess.Popen) -> Tuple[int, Optional[Any]]:
+    """
+    Wait for a child process and get its resource usage.
+
+    Uses wait4() so the numbers belong to this child (and the processes it
+    reaped, such as rustc under cargo), even with other builds running.
+    """
+    if not hasattr(os, "wait4"):
+        return process.wait(), None
+
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, rusage
+
+
+def max_rss_bytes(rusage: Any) -> int:
+    """ru_maxrss is in kilobytes on Linux and bytes on macOS."""
+    if platform.system() == "Darwin":
+        return int(rusage.ru_maxrss)
+    return int(rusage.ru_maxrss) * 1024
+
+
+def read_package_version(project_root: Path) -> Optional[str]:
+    """Get the [package] version from Cargo.toml."""
+    try:
+        text = (project_root / "Cargo.toml").read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+    in_package = False
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("["):
+            in_package = line == "[package]"
+        elif in_package:
+            match = re.match(r'version\s*=\s*"([^"]+)"', line)
+            if match:
+                return match.group(1)
+    return None
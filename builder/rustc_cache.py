@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+Caching RUSTC_WRAPPER for library crates.
+
+Cargo runs `$RUSTC_WRAPPER <rustc> <args...>` for every compilation. For
+lib/rlib crates this wrapper hashes the invocation (arguments, source
+files, extern crates, environment and compiler version) and serves the
+.rlib/.rmeta/.d outputs from a local disk cache when it has seen the same
+invocation before. Everything else is passed straight to rustc. Crates
+that link are pointed at link_timer.py when link timing is requested and
+their linker is driven like cc; rustc picks the linker flavor from the
+linker's name, so others (ld.lld, rust-lld, ...) are left alone.
+
+This file runs as a standalone script, so it only uses the standard
+library. Configuration comes from the environment:
+
+    OPENDIR_RUSTC_CACHE_DIR   cache directory (caching is off when unset)
+    OPENDIR_RUSTC_CACHE_SIZE  size limit in bytes
+    OPENDIR_LINK_LOG          link timing log (see link_timer.py)
+    OPENDIR_RUSTC_CACHE_HITS  log of the crates served from the cache, one per line
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .link_timer import LINK_CRATE_ENV, LINK_LOG_ENV, LINK_TIMER, REAL_LINKER_ENV
+except ImportError:  # Run as a script
+    from link_timer import LINK_CRATE_ENV, LINK_LOG_ENV, LINK_TIMER, REAL_LINKER_ENV
+
+CACHE_DIR_ENV = "OPENDIR_RUSTC_CACHE_DIR"
+CACHE_SIZE_ENV = "OPENDIR_RUSTC_CACHE_SIZE"
+CACHE_HITS_ENV = "OPENDIR_RUSTC_CACHE_HITS"
+DEFAULT_CACHE_SIZE = 10 * 1024 * 1024 * 1024
+
+CACHEABLE_CRATE_TYPES = {"lib", "rlib"}
+
+# Linker names rustc infers a flavor other than cc from, by file stem
+NON_CC_LINKERS = {"ld", "lld", "rust-lld", "lld-link", "link", "wasm-ld", "emcc"}
+
+# Crate types rustc hands to the linker
+LINKED_CRATE_TYPES = {"bin", "dylib", "cdylib", "proc-macro"}
+
+# Environment that varies between runs without affecting the output
+IGNORED_ENV = {"CARGO_MAKEFLAGS", "CARGO_TARGET_DIR"}
+
+# Bump to invalidate every cached entry
+CACHE_VERSION = "1"
+
+
+class Invocation:
+    """The parts of a rustc command line that matter for caching."""
+
+    def __init__(self, args: List[str]):
+        self.args = args
+        self.crate_name: Optional[str] = None
+        self.crate_types: List[str] = []
+        self.emit: List[str] = []
+        self.out_dir: Optional[Path] = None
+        self.extra_filename = ""
+        self.inputs: List[str] = []
+        self.externs: List[Path] = []
+        self.codegen: List[str] = []
+        self.has_output_file = False
+        self.prints = False
+
+        options_with_value = {
+            "--crate-name", "--crate-type", "--emit", "--out-dir", "--extern",
+            "-C", "--codegen", "-L", "--cfg", "--check-cfg", "--target",
+            "--edition", "--error-format", "--json", "--cap-lints", "-o",
+            "--print", "-A", "-W", "-D", "-F", "--explain", "-Z", "--sysroot",
+            "--color", "--diagnostic-width", "--remap-path-prefix", "--env-set",
+            "-l",
+        }
+
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg.startswith("--") and "=" in arg:
+                option, value = arg.split("=", 1)
+            elif arg in options_with_value and i + 1 < len(args):
+                option, value = arg, args[i + 1]
+                i += 1
+            elif arg.startswith("-C") and len(arg) > 2:
+                option, value = "-C", arg[2:]
+            elif arg.startswith("-") and arg != "-":
+                option, value = arg, ""
+            else:
+                self.inputs.append(arg)
+                i += 1
+                continue
+            i += 1
+
+            if option == "--crate-name":
+                self.crate_name = value
+            elif option == "--crate-type":
+                self.crate_types.extend(value.split(","))
+            elif option == "--emit":
+                self.emit.extend(value.split(","))
+            elif option == "--out-dir":
+                self.out_dir = Path(value)
+            elif option == "--extern" and "=" in value:
+                self.externs.append(Path(value.split("=", 1)[1]))
+            elif option in ("-C", "--codegen"):
+                self.codegen.append(value)
+                if value.startswith("extra-filename="):
+                    self.extra_filename = value.split("=", 1)[1]
+            elif option == "-o":
+                self.has_output_file = True
+            elif option in ("--print", "-V", "--version", "-vV"):
+                self.prints = True
+
+    def is_cacheable(self) -> bool:
+        """Check whether the outputs of this invocation can be cached."""
+        if self.prints or self.has_output_file:
+            return False
+        if not self.crate_name or self.out_dir is None or len(self.inputs) != 1:
+            return False
+        if self.inputs[0] == "-":
+            return False
+        if not self.crate_types or not set(self.crate_types) <= CACHEABLE_CRATE_TYPES:
+            return False
+        if any(value.startswith("incremental=") for value in self.codegen):
+            return False
+        return bool(self.emit)
+
+    def links(self) -> bool:
+        """Check whether this invocation runs the linker."""
+        if self.prints or not set(self.crate_types) & LINKED_CRATE_TYPES:
+            return False
+        if any(value.startswith("linker-flavor=") for value in self.codegen):
+            return False
+        return not self.emit or any(kind.split("=", 1)[0] == "link" for kind in self.emit)
+
+    def linker(self) -> str:
+        """Get the linker rustc would run."""
+        for value in reversed(self.codegen):
+            if value.startswith("linker="):
+                return value.split("=", 1)[1]
+        return "cc"
+
+    def outputs(self) -> List[Path]:
+        """Files written into the output directory, by emit kind."""
+        assert self.out_dir is not None
+        stem = f"{self.crate_name}{self.extra_filename}"
+        outputs = []
+        for kind in self.emit:
+            kind = kind.split("=", 1)[0]
+            if kind == "link":
+                outputs.append(self.out_dir / f"lib{stem}.rlib")
+            elif kind == "metadata":
+                outputs.append(self.out_dir / f"lib{stem}.rmeta")
+            elif kind == "dep-info":
+                outputs.append(self.out_dir / f"{stem}.d")
+        return outputs
+
+    def dep_info_args(self, depfile: Path) -> List[str]:
+        """Arguments that only write dependency info to depfile."""
+        args: List[str] = []
+        skip_next = False
+        for arg in self.args:
+            if skip_next:
+                skip_next = False
+                continue
+            if arg in ("--emit", "--out-dir", "--json"):
+                skip_next = True
+                continue
+            if arg.startswith(("--emit=", "--out-dir=", "--json=")):
+                continue
+            args.append(arg)
+        args.append(f"--emit=dep-info={depfile}")
+        return args
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_depfile(text: str) -> Tuple[List[str], List[str]]:
+    """Get the source files and env-dep lines from a rustc depfile."""
+    sources: List[str] = []
+    env_deps: List[str] = []
+    for line in text.splitlines():
+        if line.startswith("# env-dep:"):
+            env_deps.append(line[len("# env-dep:"):])
+            continue
+        if not line or line.startswith("#") or ":" not in line:
+            continue
+        # Only the first rule lists the dependencies of the output
+        if sources:
+            continue
+        _, deps = line.split(": ", 1) if ": " in line else (line, "")
+        sources.extend(dep.replace("\0", " ") for dep in deps.replace("\\ ", "\0").split() if dep)
+    return sources, env_deps
+
+
+class RustcCache:
+    """On-disk store of rustc outputs keyed by invocation hash."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.entries_dir = root / "entries"
+        self.stats_path = root / "stats.json"
+        self.max_bytes = max_bytes
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """Hold the cache-wide lock (stats and eviction)."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / "lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_stats(self) -> Dict[str, float]:
+        try:
+            with open(self.stats_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_stats(self, stats: Dict[str, float]) -> None:
+        tmp_path = self.stats_path.with_name(f"stats.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.stats_path)
+
+    def update_stats(self, **deltas: float) -> Dict[str, float]:
+        with self.locked():
+            stats = self.read_stats()
+            for name, delta in deltas.items():
+                stats[name] = stats.get(name, 0) + delta
+            self._write_stats(stats)
+            return stats
+
+    def entry_dir(self, key: str) -> Path:
+        return self.entries_dir / key[:2] / key
+
+    def rustc_version(self, rustc: str) -> str:
+        """Get `rustc -vV`, cached per compiler binary."""
+        resolved = shutil.which(rustc) or rustc
+        try:
+            stat = os.stat(resolved)
+        except OSError:
+            stat = None
+        token = hashlib.sha256(
+            f"{resolved}:{stat.st_size if stat else 0}:{stat.st_mtime_ns if stat else 0}".encode()
+        ).hexdigest()[:16]
+
+        version_path = self.root / "versions" / token
+        try:
+            return version_path.read_text()
+        except OSError:
+            pass
+
+        result = subprocess.run([rustc, "-vV"], capture_output=True, text=True)
+        version = result.stdout
+        # rustup proxies resolve the toolchain from the environment
+        version += os.environ.get("RUSTUP_TOOLCHAIN", "")
+        if result.returncode == 0:
+            version_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = version_path.with_name(f"{token}.{os.getpid()}.tmp")
+            tmp_path.write_text(version)
+            os.replace(tmp_path, version_path)
+        return version
+
+    def compute_key(self, rustc: str, invocation: Invocation) -> Optional[str]:
+        """Hash everything that determines the outputs of an invocation."""
+        digest = hashlib.sha256()
+
+        def add(*parts: str) -> None:
+            for part in parts:
+                digest.update(part.encode())
+                digest.update(b"\0")
+
+        add(CACHE_VERSION, self.rustc_version(rustc), os.getcwd())
+        add(*invocation.args)
+
+        # Source files come from a dependency-info-only pass
+        with tempfile.TemporaryDirectory(prefix="rustc-cache-") as tmp:
+            depfile = Path(tmp) / "deps.d"
+            result = subprocess.run(
+                [rustc] + invocation.dep_info_args(depfile),
+                capture_output=True,
+                close_fds=False,
+            )
+            if result.returncode != 0 or not depfile.exists():
+                return None
+            sources, env_deps = parse_depfile(depfile.read_text())
+
+        for source in sorted(set(sources)):
+            path = Path(source)
+            if not path.is_file():
+                return None
+            add("source", source, file_digest(path))
+        add("env-deps", *env_deps)
+
+        for extern in invocation.externs:
+            if not extern.is_file():
+                return None
+            add("extern", str(extern), file_digest(extern))
+
+        for value in invocation.codegen:
+            if value.startswith("profile-use="):
+                profile = Path(value.split("=", 1)[1])
+                add("profile-use", file_digest(profile) if profile.is_file() else "")
+
+        for name in sorted(os.environ):
+            if name.startswith("CARGO_") and name not in IGNORED_ENV:
+                add("env", name, os.environ[name])
+
+        return digest.hexdigest()
+
+    def restore(self, key: str, invocation: Invocation) -> bool:
+        """Copy cached outputs into place and replay rustc's output."""
+        entry = self.entry_dir(key)
+        manifest_path = entry / "manifest.json"
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        assert invocation.out_dir is not None
+        invocation.out_dir.mkdir(parents=True, exist_ok=True)
+        for name in manifest["outputs"]:
+            dest = invocation.out_dir / name
+            tmp_path = dest.with_name(f"{name}.{os.getpid()}.tmp")
+            try:
+                shutil.copyfile(entry / name, tmp_path)
+            except OSError:
+                return False
+            os.replace(tmp_path, dest)
+
+        sys.stdout.write(manifest["stdout"])
+        sys.stdout.flush()
+        sys.stderr.write(manifest["stderr"])
+        sys.stderr.flush()
+
+        # Mark as recently used
+        os.utime(manifest_path)
+        self.update_stats(hits=1, seconds_saved=manifest.get("seconds", 0))
+        return True
+
+    def store(self, key: str, invocation: Invocation, stdout: str, stderr: str, seconds: float) -> None:
+        """Save the outputs of a successful compilation."""
+        outputs = invocation.outputs()
+        if not all(path.is_file() for path in outputs):
+            return
+
+        entry = self.entry_dir(key)
+        if entry.exists():
+            return
+
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp_entry = Path(tempfile.mkdtemp(prefix=f"{key}.", dir=entry.parent))
+        size = 0
+        for path in outputs:
+            shutil.copyfile(path, tmp_entry / path.name)
+            size += path.stat().st_size
+
+        manifest = {
+            "outputs": [path.name for path in outputs],
+            "stdout": stdout,
+            "stderr": stderr,
+            "seconds": seconds,
+            "size": size,
+        }
+        with open(tmp_entry / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        try:
+            tmp_entry.rename(entry)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+
+        stats = self.update_stats(size=size)
+        if stats.get("size", 0) > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits."""
+        with self.locked():
+            entries = []
+            total = 0
+            for manifest_path in self.entries_dir.glob("*/*/manifest.json"):
+                try:
+                    with open(manifest_path, "r", encoding="utf-8") as f:
+                        size = json.load(f).get("size", 0)
+                    mtime = manifest_path.stat().st_mtime
+                except (OSError, ValueError):
+                    continue
+                entries.append((mtime, size, manifest_path.parent))
+                total += size
+
+            # Evict down to 90% so every store doesn't trigger a scan
+            target = self.max_bytes * 0.9
+            for _, size, entry in sorted(entries):
+                if total <= target:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+
+            stats = self.read_stats()
+            stats["size"] = total
+            self._write_stats(stats)
+
+    def summary(self) -> Dict[str, float]:
+        """Get statistics and the number of stored entries."""
+        stats = self.read_stats()
+        stats["entries"] = sum(1 for _ in self.entries_dir.glob("*/*/manifest.json"))
+        return stats
+
+
+def is_cc_like(linker: str) -> bool:
+    """Check that rustc would drive a linker like cc, as it does link_timer.py."""
+    stem = Path(linker).stem
+    return stem not in NON_CC_LINKERS and not stem.endswith("-ld") and not stem.startswith("ld64")
+
+
+def log_cache_hit(crate_name: str) -> None:
+    """Note a crate served from the cache in the build's hit log, if it keeps one."""
+    log = os.environ.get(CACHE_HITS_ENV)
+    if not log:
+        return
+    try:
+        with open(log, "a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(crate_name + "\n")
+    except OSError:
+        pass
+
+
+def read_cache_hits(path: Path) -> List[str]:
+    """Get the crates a build's hit log recorded."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+def run_rustc(rustc: str, args: List[str]) -> Tuple[int, str, str]:
+    """Run rustc, passing its output through while recording it."""
+    process = subprocess.Popen(
+        [rustc] + args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        # Keep the jobserver file descriptors cargo handed to us
+        close_fds=False,
+    )
+    captured: Dict[str, List[str]] = {"stdout": [], "stderr": []}
+
+    def pump(name: str, source, sink) -> None:
+        # Forward line by line: cargo starts dependent crates as soon as
+        # rustc reports the .rmeta artifact on stderr
+        for line in source:
+            captured[name].append(line)
+            sink.write(line)
+            sink.flush()
+
+    readers = [
+        threading.Thread(target=pump, args=("stdout", process.stdout, sys.stdout)),
+        threading.Thread(target=pump, args=("stderr", process.stderr, sys.stderr)),
+    ]
+    for reader in readers:
+        reader.start()
+    returncode = process.wait()
+    for reader in readers:
+        reader.join()
+
+    return returncode, "".join(captured["stdout"]), "".join(captured["stderr"])
+
+
+def main(argv: List[str]) -> int:
+    if not argv:
+        print("usage: rustc_cache.py <rustc> [args...]", file=sys.stderr)
+        return 2
+
+    rustc, args = argv[0], argv[1:]
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    invocation = Invocation(args)
+
+    if os.environ.get(LINK_LOG_ENV) and invocation.links() and is_cc_like(invocation.linker()):
+        # The last -C linker wins; the timer runs the one it replaces
+        os.environ[REAL_LINKER_ENV] = invocation.linker()
+        os.environ[LINK_CRATE_ENV] = invocation.crate_name or ""
+        args = args + ["-C", f"linker={LINK_TIMER}"]
+
+    if not cache_dir or not invocation.is_cacheable():
+        os.execvp(rustc, [rustc] + args)
+
+    max_bytes = int(os.environ.get(CACHE_SIZE_ENV, DEFAULT_CACHE_SIZE))
+    cache = RustcCache(Path(cache_dir), max_bytes)
+
+    try:
+        key = cache.compute_key(rustc, invocation)
+    except OSError:
+        key = None
+
+    if key is None:
+        cache.update_stats(uncacheable=1)
+        os.execvp(rustc, [rustc] + args)
+
+    if cache.restore(key, invocation):
+        log_cache_hit(invocation.crate_name or "")
+        return 0
+
+    started = time.monotonic()
+    returncode, stdout, stderr = run_rustc(rustc, args)
+    cache.update_stats(misses=1)
+    if returncode == 0:
+        try:
+            cache.store(key, invocation, stdout, stderr, time.monotonic() - started)
+        except OSError:
+            pass
+    return returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,392 @@
+"""
+Sharded parallel test runs, scheduled from historical test durations.
+"""
+import heapq
+import json
+import os
+import re
+import statistics
+import subprocess
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .cargo_messages import CargoMessageStream, iter_messages
+from .config import BuildConfig
+from .logger import Logger
+from .report import BuildReport, read_package_version
+from .tools import ToolInstaller
+from .vendor import CrateVendor
+
+# Summary line of a libtest run
+TEST_RESULT = re.compile(r"test result: \w+\. (\d+) passed; (\d+) failed; (\d+) ignored")
+# Assumed duration of tests without history
+DEFAULT_SECONDS = 0.1
+# Weight of the latest run in a test's duration estimate
+DURATION_WEIGHT = 0.5
+
+
+@dataclass
+class TestCase:
+    """One test of a test executable."""
+
+    suite: str  # Cargo target of the executable, e.g. "bin/opendir", "test/file_operations"
+    name: str  # Test path inside the executable, e.g. "services::process::tests::kill"
+    executable: Path
+
+    @property
+    def id(self) -> str:
+        return f"{self.suite}::{self.name}"
+
+
+@dataclass
+class TestOutcome:
+    """Result of running one test."""
+
+    case: TestCase
+    status: str  # passed, failed or ignored
+    seconds: float
+    shard: int
+    output: str = ""  # Captured output of failed tests
+
+
+@dataclass
+class Shard:
+    """Tests run one after another by one worker, slowest first."""
+
+    index: int
+    cases: List[TestCase] = field(default_factory=list)
+    planned_seconds: float = 0.0
+
+
+class TestDurations:
+    """Duration estimate of every test, smoothed over runs."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.seconds: Dict[str, float] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.seconds = {k: float(v) for k, v in data.items()}
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def estimate(self, case: TestCase) -> float:
+        """Get the expected duration of a test, the median one if it is new."""
+        if case.id in self.seconds:
+            return self.seconds[case.id]
+        if self.seconds:
+            return statistics.median(self.seconds.values())
+        return DEFAULT_SECONDS
+
+    def record(self, outcomes: List[TestOutcome]) -> None:
+        for outcome in outcomes:
+            if outcome.status == "ignored":
+                continue
+            previous = self.seconds.get(outcome.case.id)
+            if previous is None:
+                self.seconds[outcome.case.id] = outcome.seconds
+            else:
+                self.seconds[outcome.case.id] = (
+                    DURATION_WEIGHT * outcome.seconds + (1 - DURATION_WEIGHT) * previous
+                )
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({k: round(v, 4) for k, v in sorted(self.seconds.items())}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def pack_shards(cases: List[TestCase], durations: TestDurations, count: int) -> List[Shard]:
+    """
+    Bin-pack tests into shards of about equal expected time.
+
+    Longest processing time first: tests are handed out slowest first, each
+    to the shard with the least work so far. Slow (filesystem-heavy) tests
+    thereby start right away and each shard runs its tests in that order.
+    """
+    shards = [Shard(index=i) for i in range(max(1, min(count, len(cases))))]
+    heap = [(0.0, shard.index) for shard in shards]
+    ordered = sorted(cases, key=lambda c: (-durations.estimate(c), c.id))
+    for case in ordered:
+        planned, index = heapq.heappop(heap)
+        shard = shards[index]
+        shard.cases.append(case)
+        shard.planned_seconds = planned + durations.estimate(case)
+        heapq.heappush(heap, (shard.planned_seconds, index))
+    return shards
+
+
+def write_junit(path: Path, outcomes: List[TestOutcome]) -> None:
+    """Write outcomes as a JUnit XML report, one testsuite per executable."""
+    root = ET.Element("testsuites")
+    suites: Dict[str, List[TestOutcome]] = {}
+    for outcome in outcomes:
+        suites.setdefault(outcome.case.suite, []).append(outcome)
+
+    for suite, members in sorted(suites.items()):
+        element = ET.SubElement(root, "testsuite", {
+            "name": suite,
+            "tests": str(len(members)),
+            "failures": str(sum(1 for o in members if o.status == "failed")),
+            "skipped": str(sum(1 for o in members if o.status == "ignored")),
+            "time": f"{sum(o.seconds for o in members):.3f}",
+        })
+        for outcome in sorted(members, key=lambda o: o.case.name):
+            case = ET.SubElement(element, "testcase", {
+                "classname": suite,
+                "name": outcome.case.name,
+                "time": f"{outcome.seconds:.3f}",
+            })
+            if outcome.status == "failed":
+                failure = ET.SubElement(case, "failure", {"message": "test failed"})
+                failure.text = outcome.output
+            elif outcome.status == "ignored":
+                ET.SubElement(case, "skipped")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+class ShardedTestRunner:
+    """
+    Runs the project's tests in parallel shards.
+
+    The test executables are built once with `cargo test --no-run` and asked
+    for their tests with --list. Each test then runs as its own process
+    (--exact, one test thread), which isolates it and measures its duration
+    for the next schedule.
+    """
+
+    def __init__(
+        self,
+        config: BuildConfig,
+        project_root: Path,
+        tool_installer: ToolInstaller,
+        logger: Logger,
+        report: BuildReport,
+    ):
+        self.config = config
+        self.project_root = project_root
+        self.tool_installer = tool_installer
+        self.logger = logger
+        self.report = report
+        self.env = tool_installer.get_env()
+        # Cargo passes these to test executables it runs itself
+        self.env["CARGO_MANIFEST_DIR"] = str(project_root)
+        if config.offline:
+            self.env.update(CrateVendor(config, project_root).env())
+
+    def build(self) -> Optional[Dict[str, Path]]:
+        """Build the test executables, by suite name."""
+        cmd = ["cargo", "test", "--no-run", "--message-format=json-render-diagnostics"]
+        if self.config.release:
+            cmd.append("--release")
+        if self.config.jobs > 0:
+            cmd.extend(["--jobs", str(self.config.jobs)])
+        if self.config.offline:
+            cmd.extend(CrateVendor(self.config, self.project_root).cargo_args())
+        self.logger.debug(f"Running: {' '.join(cmd)}")
+
+        stream = CargoMessageStream()
+        process = subprocess.Popen(
+            cmd,
+            cwd=self.project_root,
+            env=self.env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+        )
+        # Drain stderr concurrently so neither pipe can fill up
+        stderr_reader = threading.Thread(
+            target=lambda: deque(stream.feed_stderr(process.stderr), maxlen=0),
+            daemon=True,
+        )
+        stderr_reader.start()
+
+        executables: Dict[str, Path] = {}
+        for message in iter_messages(process.stdout):
+            if message.get("reason") != "compiler-artifact":
+                continue
+            executable = message.get("executable")
+            if not executable or not message.get("profile", {}).get("test"):
+                continue
+            target = message.get("target", {})
+            kind = (target.get("kind") or ["test"])[0]
+            executables[f"{kind}/{target.get('name')}"] = Path(executable)
+
+        stderr_reader.join()
+        if process.wait() != 0:
+            self.logger.error("Building the tests failed")
+            for line in stream.summary(max_lines=20).split("\n"):
+                if line.strip():
+                    self.logger.info(f"  {line}")
+            return None
+        return executables
+
+    def list_tests(self, executables: Dict[str, Path]) -> List[TestCase]:
+        """Enumerate the tests of every executable."""
+        cases: List[TestCase] = []
+        for suite, executable in sorted(executables.items()):
+            result = subprocess.run(
+                [str(executable), "--list", "--format", "terse"],
+                cwd=self.project_root,
+                env=self.env,
+                capture_output=True,
+                text=True,
+                errors="replace",
+            )
+            if result.returncode != 0:
+                self.logger.warning(f"Could not list the tests of {suite}")
+                continue
+            for line in result.stdout.splitlines():
+                if line.endswith(": test"):
+                    cases.append(TestCase(suite=suite, name=line[: -len(": test")], executable=executable))
+        return cases
+
+    def _run_case(self, case: TestCase, shard: int) -> TestOutcome:
+        started = time.monotonic()
+        result = subprocess.run(
+            [str(case.executable), "--exact", case.name, "--test-threads=1"],
+            cwd=self.project_root,
+            env=self.env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+        )
+        seconds = time.monotonic() - started
+
+        match = TEST_RESULT.search(result.stdout)
+        if result.returncode == 0 and match and match.group(3) == "1":
+            status = "ignored"
+        elif result.returncode == 0 and match and match.group(1) == "1":
+            status = "passed"
+        else:
+            status = "failed"
+        output = result.stdout if status == "failed" else ""
+        return TestOutcome(case=case, status=status, seconds=seconds, shard=shard, output=output)
+
+    def _run_shard(self, shard: Shard) -> List[TestOutcome]:
+        outcomes = []
+        for case in shard.cases:
+            outcome = self._run_case(case, shard.index)
+            if outcome.status == "failed":
+                self.logger.error(f"FAILED {case.id} ({outcome.seconds:.2f}s)")
+            else:
+                self.logger.debug(f"{outcome.status} {case.id} ({outcome.seconds:.2f}s)")
+            outcomes.append(outcome)
+        return outcomes
+
+    def run(self, shards: List[Shard]) -> List[TestOutcome]:
+        """Run the shards concurrently, each test in its own process."""
+        outcomes: List[TestOutcome] = []
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            for shard_outcomes in pool.map(self._run_shard, shards):
+                outcomes.extend(shard_outcomes)
+        return outcomes
+
+
+def run_tests(
+    config: BuildConfig,
+    project_root: Path,
+    logger: Logger,
+    report: Optional[BuildReport] = None,
+) -> bool:
+    """
+    Build and run all tests in parallel shards.
+
+    Args:
+        config: Build configuration
+        project_root: Path to project root
+        logger: Logger instance
+        report: Timing report to add to (a new one is created if omitted)
+
+    Returns:
+        True if no test failed
+    """
+    if report is None:
+        report = BuildReport()
+    report.version = read_package_version(project_root)
+
+    tool_installer = ToolInstaller(config, project_root, logger)
+    runner = ShardedTestRunner(config, project_root, tool_installer, logger, report)
+
+    with report.phase("build_tests"):
+        executables = runner.build()
+    if executables is None:
+        return False
+
+    with report.phase("list_tests"):
+        cases = runner.list_tests(executables)
+    if not cases:
+        logger.warning("No tests found")
+        return True
+
+    durations = TestDurations(project_root / config.cache_dir / "test-durations.json")
+    shards = pack_shards(cases, durations, config.test_shards or config.job_budget)
+    logger.info(
+        f"Running {len(cases)} tests from {len(executables)} executables in {len(shards)} shards "
+        f"(longest planned {max(s.planned_seconds for s in shards):.1f}s)"
+    )
+
+    started = time.monotonic()
+    with report.phase("run_tests"):
+        outcomes = runner.run(shards)
+    elapsed = time.monotonic() - started
+
+    durations.record(outcomes)
+    durations.save()
+
+    counts = {status: sum(1 for o in outcomes if o.status == status) for status in ("passed", "failed", "ignored")}
+    for shard in shards:
+        actual = sum(o.seconds for o in outcomes if o.shard == shard.index)
+        report.add_section("test_shards", str(shard.index), {
+            "tests": len(shard.cases),
+            "planned_seconds": round(shard.planned_seconds, 3),
+            "seconds": round(actual, 3),
+        })
+    report.add_section("tests", "summary", {**counts, "seconds": round(elapsed, 3)})
+
+    dist_dir = project_root / config.dist_dir
+    write_junit(dist_dir / "test-results.xml", outcomes)
+    with open(dist_dir / "test-results.json", "w", encoding="utf-8") as f:
+        json.dump([
+            {
+                "suite": o.case.suite,
+                "name": o.case.name,
+                "status": o.status,
+                "seconds": round(o.seconds, 4),
+                "shard": o.shard,
+                **({"output": o.output} if o.output else {}),
+            }
+            for o in sorted(outcomes, key=lambda o: o.case.id)
+        ], f, indent=2)
+    report.write(dist_dir / "test-report.json")
+
+    for outcome in outcomes:
+        if outcome.status != "failed":
+            continue
+        logger.header(f"FAILED {outcome.case.id}")
+        for line in outcome.output.strip().split("\n")[-40:]:
+            logger.info(f"  {line}")
+
+    summary = (
+        f"{counts['passed']} passed, {counts['failed']} failed, {counts['ignored']} ignored "
+        f"in {elapsed:.1f}s; results in {dist_dir / 'test-results.xml'}"
+    )
+    if counts["failed"]:
+        logger.error(summary)
+        return False
+    logger.success(summary)
+    return True
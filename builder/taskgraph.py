@@ -0,0 +1,75 @@
+"""
+Running small dependency graphs of setup tasks on a thread pool.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .logger import Logger
+
+
+@dataclass
+class Task:
+    """A unit of work that may start once its dependencies succeeded."""
+
+    name: str
+    run: Callable[[], bool]
+    deps: Tuple[str, ...] = ()
+
+
+def run_graph(tasks: List[Task], logger: Logger, max_workers: Optional[int] = None) -> Dict[str, bool]:
+    """
+    Run tasks concurrently, each as soon as all of its dependencies succeeded.
+
+    A task whose dependency failed is skipped and counts as failed. Messages a
+    task logs are prefixed with its name, so concurrent output stays readable.
+
+    Returns:
+        Success of every task by name
+    """
+    by_name = {task.name: task for task in tasks}
+    for task in tasks:
+        unknown = [dep for dep in task.deps if dep not in by_name]
+        if unknown:
+            raise ValueError(f"task {task.name} depends on unknown {', '.join(unknown)}")
+
+    results: Dict[str, bool] = {}
+    pending = list(tasks)
+
+    def execute(task: Task) -> bool:
+        started = time.monotonic()
+        with logger.task(task.name):
+            try:
+                ok = task.run()
+            except Exception as e:
+                logger.error(f"Failed: {e}")
+                ok = False
+            logger.debug(f"Finished in {time.monotonic() - started:.1f}s")
+        return ok
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(tasks) or 1) as pool:
+        running: Dict[Future, str] = {}
+        while pending or running:
+            for task in list(pending):
+                failed = [dep for dep in task.deps if results.get(dep) is False]
+                if failed:
+                    logger.warning(f"Skipping {task.name}: {', '.join(failed)} failed")
+                    results[task.name] = False
+                    pending.remove(task)
+                elif all(results.get(dep) for dep in task.deps):
+                    running[pool.submit(execute, task)] = task.name
+                    pending.remove(task)
+
+            if not running:
+                # Only tasks in a dependency cycle are left
+                for task in pending:
+                    logger.error(f"Cannot run {task.name}: dependency cycle")
+                    results[task.name] = False
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    return results
@@ -0,0 +1,254 @@
+"""
+Analysis of cargo --timings unit data.
+"""
+import json
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+UNIT_DATA = re.compile(r"const UNIT_DATA = (\[.*?\]);", re.DOTALL)
+CONCURRENCY_DATA = re.compile(r"const CONCURRENCY_DATA = (\[.*?\]);", re.DOTALL)
+
+# A target's total compile time is a regression when it grows by more than this
+REGRESSION_RATIO = 1.15
+# Changes smaller than this are too noisy to flag
+MIN_UNIT_SECONDS = 2.0
+
+
+@dataclass
+class UnitTiming:
+    """Compile time of one cargo unit."""
+
+    name: str
+    version: str
+    target: str
+    start: float
+    duration: float
+
+    @property
+    def label(self) -> str:
+        return f"{self.name} v{self.version}{self.target}"
+
+    @property
+    def key(self) -> str:
+        """The unit without its version, so a dependency bump keeps its history."""
+        return f"{self.name}{self.target}"
+
+
+@dataclass
+class TimingSummary:
+    """Critical path and parallelism of one build."""
+
+    total_seconds: float
+    critical_path_seconds: float
+    average_parallelism: float
+    critical_path: List[Dict[str, Any]] = field(default_factory=list)
+    slowest_units: List[Dict[str, Any]] = field(default_factory=list)
+    unit_count: int = 0
+    # Compiled units by key: {"version": ..., "duration": ...}
+    units: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    cached_units: int = 0  # Units the rustc cache served instead of compiling
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def load_timings(html_path: Path) -> Optional[Dict[str, list]]:
+    """Extract UNIT_DATA and CONCURRENCY_DATA from a cargo timing report."""
+    try:
+        text = html_path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+    units = UNIT_DATA.search(text)
+    if not units:
+        return None
+
+    concurrency = CONCURRENCY_DATA.search(text)
+    try:
+        return {
+            "units": json.loads(units.group(1)),
+            "concurrency": json.loads(concurrency.group(1)) if concurrency else [],
+        }
+    except ValueError:
+        return None
+
+
+def analyze(units: List[Dict[str, Any]], concurrency: List[Dict[str, Any]], top: int = 5) -> Optional[TimingSummary]:
+    """
+    Compute the critical path, slowest units and average parallelism.
+
+    A unit starts once the last of its dependencies finishes (or produces
+    its metadata, for pipelined builds); cargo records that dependency in
+    `unlocked_units`/`unlocked_rmeta_units`. Following those links back from
+    the unit that finished last gives the chain that bounded the build.
+    """
+    if not units:
+        return None
+
+    by_index = {
+        unit["i"]: UnitTiming(
+            name=unit["name"],
+            version=unit["version"],
+            target=unit.get("target", ""),
+            start=unit["start"],
+            duration=unit["duration"],
+        )
+        for unit in units
+    }
+    unlocked_by: Dict[int, int] = {}
+    for unit in units:
+        for child in unit.get("unlocked_units", []) + unit.get("unlocked_rmeta_units", []):
+            unlocked_by[child] = unit["i"]
+
+    first_start = min(u.start for u in by_index.values())
+    last = max(by_index, key=lambda i: by_index[i].start + by_index[i].duration)
+    total = by_index[last].start + by_index[last].duration - first_start
+
+    chain = [last]
+    while chain[-1] in unlocked_by and unlocked_by[chain[-1]] not in chain:
+        chain.append(unlocked_by[chain[-1]])
+    chain.reverse()
+    path_start = by_index[chain[0]].start
+
+    # Time-weighted number of active units, falling back to busy time / wall time
+    parallelism = 0.0
+    if len(concurrency) > 1:
+        weighted = 0.0
+        for current, following in zip(concurrency, concurrency[1:]):
+            weighted += current["active"] * (following["t"] - current["t"])
+        span = concurrency[-1]["t"] - concurrency[0]["t"]
+        parallelism = weighted / span if span > 0 else 0.0
+    if parallelism == 0.0 and total > 0:
+        parallelism = sum(u.duration for u in by_index.values()) / total
+
+    slowest = sorted(by_index.values(), key=lambda u: u.duration, reverse=True)[:top]
+
+    # Two versions of one crate share a key; their times add up
+    compiled: Dict[str, Dict[str, Any]] = {}
+    for unit in by_index.values():
+        entry = compiled.setdefault(unit.key, {"version": unit.version, "duration": 0.0})
+        if unit.version not in entry["version"].split(", "):
+            entry["version"] = ", ".join(sorted([*entry["version"].split(", "), unit.version]))
+        entry["duration"] = round(entry["duration"] + unit.duration, 2)
+
+    return TimingSummary(
+        total_seconds=round(total, 2),
+        critical_path_seconds=round(total - (path_start - first_start), 2),
+        average_parallelism=round(parallelism, 2),
+        critical_path=[
+            {"unit": by_index[i].label, "duration": by_index[i].duration} for i in chain
+        ],
+        slowest_units=[{"unit": u.label, "key": u.key, "duration": u.duration} for u in slowest],
+        unit_count=len(by_index),
+        units=compiled,
+    )
+
+
+def describe_changes(summary: TimingSummary, previous: Dict[str, Any]) -> str:
+    """Describe how a build's units differ from an earlier build's."""
+    before: Dict[str, Dict[str, Any]] = previous.get("units", {})
+    changes = []
+    if before:
+        added = summary.units.keys() - before.keys()
+        removed = before.keys() - summary.units.keys()
+        bumped = [
+            f"{key} {before[key]['version']} -> {unit['version']}"
+            for key, unit in sorted(summary.units.items())
+            if key in before and before[key]["version"] != unit["version"]
+        ]
+        if added:
+            changes.append(f"{len(added)} unit(s) added")
+        if removed:
+            changes.append(f"{len(removed)} unit(s) removed")
+        if bumped:
+            shown = ", ".join(bumped[:3]) + (f" and {len(bumped) - 3} more" if len(bumped) > 3 else "")
+            changes.append(f"updated {shown}")
+    cached_before = previous.get("cached_units", 0)
+    if summary.cached_units != cached_before:
+        changes.append(f"{summary.cached_units} vs {cached_before} unit(s) from the rustc cache")
+    return "; ".join(changes)
+
+
+class TimingsHistory:
+    """Append-only history of timing summaries, used to spot regressions."""
+
+    def __init__(self, path: Path, window: int = 5):
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+
+    def _load(self) -> List[Dict[str, Any]]:
+        entries = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return entries
+
+    def record(self, target: str, profile: str, summary: TimingSummary, inputs: Dict[str, Any]) -> List[str]:
+        """
+        Append a summary and compare it with recent builds of the same target.
+
+        Units are matched by name, without their version, so a dependency
+        bump shows up as a regression of that crate. Units added or removed
+        and a different number of rustc cache hits than the last build are
+        described next to each regression: they can explain it.
+
+        Returns a description of each regression found.
+        """
+        with self._lock:
+            previous = [
+                entry for entry in self._load()
+                if entry.get("target") == target and entry.get("profile") == profile
+            ][-self.window:]
+
+            entry = {
+                "timestamp": time.time(),
+                "target": target,
+                "profile": profile,
+                **inputs,
+                **summary.to_dict(),
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+        if not previous:
+            return []
+
+        regressions = []
+        baseline = sorted(e["total_seconds"] for e in previous)[len(previous) // 2]
+        if (
+            baseline > 0
+            and summary.total_seconds > baseline * REGRESSION_RATIO
+            and summary.total_seconds - baseline >= MIN_UNIT_SECONDS
+        ):
+            regressions.append(
+                f"total {summary.total_seconds:.1f}s vs {baseline:.1f}s median of last {len(previous)}"
+            )
+
+        last_units = {
+            key: unit["duration"] for key, unit in previous[-1].get("units", {}).items()
+        }
+        for unit in summary.slowest_units:
+            before = last_units.get(unit["key"])
+            if (
+                before
+                and unit["duration"] >= MIN_UNIT_SECONDS
+                and unit["duration"] > before * REGRESSION_RATIO
+            ):
+                regressions.append(f"{unit['unit']} {unit['duration']:.1f}s vs {before:.1f}s")
+
+        changes = describe_changes(summary, previous[-1])
+        if changes:
+            regressions = [f"{regression} ({changes})" for regression in regressions]
+        return regressions
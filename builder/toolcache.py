@@ -0,0 +1,289 @@
+"""
+Host-wide content-addressed cache of downloaded tool archives and their trees.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from .artifacts import file_digest
+from .logger import Logger
+
+# Download function of the cache's users: (url, dest, desc, sha256) -> success
+Download = Callable[[str, Path, str, Optional[str]], bool]
+# Extraction function: (archive, dest_dir) -> success
+Extract = Callable[[Path, Path], bool]
+# Download-and-extract function: (url, dest_dir, desc, sha256) -> archive digest or None
+Stream = Callable[[str, Path, str, Optional[str]], Optional[str]]
+
+
+def default_tool_cache_dir() -> Path:
+    """Get the per-user cache location, following the XDG base directory spec."""
+    base = os.environ.get("XDG_CACHE_HOME")
+    return (Path(base) if base else Path.home() / ".cache") / "opendir-builder"
+
+
+def tree_size(path: Path) -> int:
+    """Get the size of all files below a directory, not following symlinks."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def link_tree(source: Path, dest: Path) -> bool:
+    """
+    Make dest, which must not exist, a symlink to a cached tree.
+
+    Where symlinks can't be made, dest becomes a copy of the tree.
+    Returns True for a symlink.
+    """
+    try:
+        os.symlink(source, dest, target_is_directory=True)
+        return True
+    except OSError:
+        shutil.copytree(source, dest, symlinks=True)
+        return False
+
+
+class ToolCache:
+    """
+    Tool archives and their extracted trees, shared by all checkouts of a host.
+
+    An entry is keyed by download URL and expected SHA-256 digest, and points
+    at a tree (and the archive, unless it was extracted while downloading)
+    stored by the archive's actual digest, so that mirrors of one file share
+    it. Checkouts link the extracted tree into their tools directory instead
+    of downloading and extracting a copy of their own.
+
+    Every entry has a lock file: the first process to need it downloads and
+    extracts it, concurrent ones wait and then use its result. The index has
+    a lock of its own, held only while reading and rewriting it.
+    """
+
+    def __init__(self, root: Path, logger: Logger):
+        self.root = root
+        self.logger = logger
+        self.index_path = root / "index.json"
+        self.locks_dir = root / "locks"
+        self.downloads_dir = root / "downloads"
+        self.archives_dir = root / "archives"
+        self.trees_dir = root / "trees"
+
+    @staticmethod
+    def key(url: str, sha256: Optional[str] = None) -> str:
+        return hashlib.sha256(f"{url}\n{(sha256 or '').lower()}".encode()).hexdigest()
+
+    @contextmanager
+    def _lock(self, name: str, wait_message: Optional[str] = None) -> Iterator[bool]:
+        """
+        Hold an exclusive lock on locks/<name>.lock, shared with other processes.
+
+        Without a wait_message the lock is only tried; the context then gets
+        False if another process holds it.
+        """
+        self.locks_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.locks_dir / f"{name}.lock", "a") as f:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if wait_message is None:
+                    yield False
+                    return
+                self.logger.info(wait_message)
+                fcntl.flock(f, fcntl.LOCK_EX)
+            # Closing the file releases the lock
+            yield True
+
+    def _read_index(self) -> Dict[str, dict]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index: Dict[str, dict]) -> None:
+        tmp_path = self.index_path.with_name(f".{self.index_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def _set_entry(self, key: str, entry: dict) -> None:
+        with self._lock("index", "Waiting for the tool cache index..."):
+            index = self._read_index()
+            index[key] = entry
+            self._write_index(index)
+
+    def fetch_tree(
+        self,
+        url: str,
+        archive_name: str,
+        desc: str,
+        download: Download,
+        extract: Extract,
+        sha256: Optional[str] = None,
+        stream: Optional[Stream] = None,
+    ) -> Optional[Path]:
+        """
+        Get the extracted tree of an archive, downloading and extracting it on a miss.
+
+        With a stream function the archive is extracted while it downloads and
+        not stored; if that fails, the resumable download and extract
+        functions take over.
+
+        Returns:
+            The tree's directory, or None if the download or extraction failed
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        key = self.key(url, sha256)
+        with self._lock(key, f"Waiting for another process fetching {desc}..."):
+            entry = self._read_index().get(key)
+            now = time.time()
+            if entry is not None and (self.trees_dir / entry["digest"]).is_dir():
+                self.logger.info(f"Using cached {desc}")
+                self._set_entry(key, dict(entry, last_used=now))
+                return self.trees_dir / entry["digest"]
+
+            digest = None
+            if entry is not None and (self.archives_dir / entry["digest"] / archive_name).is_file():
+                # Only the tree went missing
+                digest = entry["digest"]
+            elif stream is not None and not (self.downloads_dir / key).exists():
+                # A partial download is resumed instead
+                staging = self._staging_dir(key)
+                digest = stream(url, staging, desc, sha256)
+                if digest is None:
+                    shutil.rmtree(staging, ignore_errors=True)
+                    self.logger.warning(f"Falling back to a resumable download of {desc}")
+                else:
+                    self._publish_tree(staging, digest)
+                    self._set_entry(key, self._entry(url, sha256, digest, None, entry, now))
+                    return self.trees_dir / digest
+
+            if digest is None:
+                # Partial downloads stay in downloads/<key> for the next try
+                download_path = self.downloads_dir / key / archive_name
+                download_path.parent.mkdir(parents=True, exist_ok=True)
+                if not download(url, download_path, desc, sha256):
+                    return None
+                digest = file_digest(download_path)
+                (self.archives_dir / digest).mkdir(parents=True, exist_ok=True)
+                os.replace(download_path, self.archives_dir / digest / archive_name)
+                shutil.rmtree(download_path.parent, ignore_errors=True)
+
+            tree = self.trees_dir / digest
+            if not tree.is_dir():
+                staging = self._staging_dir(key)
+                if not extract(self.archives_dir / digest / archive_name, staging):
+                    shutil.rmtree(staging, ignore_errors=True)
+                    return None
+                self._publish_tree(staging, digest)
+
+            self._set_entry(key, self._entry(url, sha256, digest, archive_name, entry, now))
+            return tree
+
+    def _staging_dir(self, key: str) -> Path:
+        """Get an empty directory to extract into before publishing the tree."""
+        staging = self.trees_dir / f".{key}.{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        return staging
+
+    def _publish_tree(self, staging: Path, digest: str) -> None:
+        try:
+            os.rename(staging, self.trees_dir / digest)
+        except OSError:
+            # The same archive under another key was extracted meanwhile
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _entry(
+        self, url: str, sha256: Optional[str], digest: str, archive_name: Optional[str],
+        previous: Optional[dict], now: float,
+    ) -> dict:
+        size = tree_size(self.trees_dir / digest)
+        if archive_name is not None:
+            size += (self.archives_dir / digest / archive_name).stat().st_size
+        return {
+            "url": url,
+            "sha256": sha256,
+            "digest": digest,
+            "archive": archive_name,
+            "size": size,
+            "created": previous.get("created", now) if previous else now,
+            "last_used": now,
+        }
+
+    def stats(self) -> Tuple[int, int]:
+        """Get the number of entries and the size of the objects they use."""
+        index = self._read_index()
+        sizes = {entry["digest"]: entry["size"] for entry in index.values()}
+        return len(index), sum(sizes.values())
+
+    def gc(self, max_bytes: int, max_age_seconds: float) -> Tuple[int, int]:
+        """
+        Evict entries unused for max_age_seconds, then the least recently
+        used ones until the cache fits max_bytes.
+
+        Entries being fetched by another process stay, as do checkouts'
+        links to evicted trees: their next setup fetches the tool again.
+
+        Returns:
+            Number of evicted entries and bytes freed
+        """
+        if not self.root.is_dir():
+            return 0, 0
+        now = time.time()
+        evicted = freed = 0
+        with self._lock("index", "Waiting for the tool cache index..."):
+            index = self._read_index()
+
+            # Objects can be shared by several keys; an object is in use until
+            # its most recent key goes
+            objects: Dict[str, dict] = {}
+            for key, entry in index.items():
+                obj = objects.setdefault(entry["digest"], {"size": entry["size"], "last_used": 0.0, "keys": []})
+                obj["last_used"] = max(obj["last_used"], entry["last_used"])
+                obj["keys"].append(key)
+
+            total = sum(obj["size"] for obj in objects.values())
+            for digest, obj in sorted(objects.items(), key=lambda item: item[1]["last_used"]):
+                if total <= max_bytes and now - obj["last_used"] <= max_age_seconds:
+                    break
+                with ExitStack() as stack:
+                    if not all(stack.enter_context(self._lock(key)) for key in obj["keys"]):
+                        continue
+                    for key in obj["keys"]:
+                        del index[key]
+                    shutil.rmtree(self.trees_dir / digest, ignore_errors=True)
+                    shutil.rmtree(self.archives_dir / digest, ignore_errors=True)
+                evicted += len(obj["keys"])
+                freed += obj["size"]
+                total -= obj["size"]
+            self._write_index(index)
+
+        # Partial downloads nobody resumed in time
+        if self.downloads_dir.is_dir():
+            for download_dir in self.downloads_dir.iterdir():
+                if now - download_dir.stat().st_mtime <= max_age_seconds:
+                    continue
+                with self._lock(download_dir.name) as locked:
+                    if locked:
+                        freed += tree_size(download_dir)
+                        shutil.rmtree(download_dir, ignore_errors=True)
+        return evicted, freed
@@ -7,12 +7,15 @@ import shutil
 import subprocess
 import tarfile
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 import urllib.request
 import ssl
 
 from .config import BuildConfig
+from .download import Downloader, HashingReader, ProgressMeter
 from .logger import Logger
+from .taskgraph import Task, run_graph
+from .toolcache import ToolCache, default_tool_cache_dir, link_tree
 
 
 class ToolInstaller:
@@ -32,6 +35,12 @@ class ToolInstaller:
         self.zig_dir = self.tools_dir / f"zig-{config.zig_version}"
         self.sdk_dir = self.tools_dir / f"MacOSX{config.macos_sdk_version}.sdk"
 
+        # Compiled crate cache used by the rustc wrapper
+        self.rustc_cache_dir = project_root / config.cache_dir / "rustc"
+
+        # Tool archives and trees shared by all checkouts of this host
+        self.tool_cache = ToolCache(config.tool_cache_dir or default_tool_cache_dir(), logger)
+
     def ensure_tools_dir(self) -> None:
         """Create tools directory if it doesn't exist."""
         self.tools_dir.mkdir(parents=True, exist_ok=True)
@@ -201,29 +210,13 @@ class ToolInstaller:
 
         self.ensure_tools_dir()
 
-        # Download zig
         archive_name = f"zig-{self.config.host_os}-{self.config.host_arch}-{self.config.zig_version}.tar.xz"
-        archive_path = self.tools_dir / archive_name
-
-        if not archive_path.exists():
-            if not self.download_file(self.config.zig_url, archive_path, "Zig compiler"):
-                return False
-
-        # Extract to tools directory
-        if not self.extract_tar_xz(archive_path, self.tools_dir):
+        extracted_name = f"zig-{self.config.host_os}-{self.config.host_arch}-{self.config.zig_version}"
+        if not self._install_cached_tree(
+            self.config.zig_url, archive_name, "Zig compiler", extracted_name, self.zig_dir
+        ):
             return False
 
-        # Rename to standard directory name
-        extracted_dir = self.tools_dir / f"zig-{self.config.host_os}-{self.config.host_arch}-{self.config.zig_version}"
-        if extracted_dir.exists() and extracted_dir != self.zig_dir:
-            if self.zig_dir.exists():
-                # Security: Verify the path is within tools_dir before deletion
-                if not self._is_safe_path_for_deletion(self.zig_dir):
-                    self.logger.error(f"Refusing to delete unsafe path: {self.zig_dir}")
-                    return False
-                shutil.rmtree(self.zig_dir)
-            extracted_dir.rename(self.zig_dir)
-
         # Verify installation
         zig_exe = self.zig_dir / "zig"
         if zig_exe.exists():
@@ -308,18 +301,10 @@ class ToolInstaller:
 
         self.ensure_tools_dir()
 
-        # Download SDK
         archive_name = f"MacOSX{self.config.macos_sdk_version}.sdk.tar.xz"
-        archive_path = self.tools_dir / archive_name
-
-        if not archive_path.exists():
-            if not self.download_file(
-                self.config.macos_sdk_url, archive_path, "macOS SDK"
-            ):
-                return False
-
-        # Extract SDK
-        if not self.extract_tar_xz(archive_path, self.tools_dir):
+        if not self._install_cached_tree(
+            self.config.macos_sdk_url, archive_name, "macOS SDK", self.sdk_dir.name, self.sdk_dir
+        ):
             return False
 
         if self.sdk_dir.exists():
@@ -331,47 +316,55 @@ class ToolInstaller:
 
     # ==================== Utility Methods ====================
 
-    def download_file(self, url: str, dest: Path, desc: str = "file") -> bool:
-        """Download a file with progress indication."""
-        self.logger.info(f"Downloading {desc}...")
-        self.logger.info(f"  URL: {url}")
+    def _install_cached_tree(
+        self, url: str, archive_name: str, desc: str, extracted_name: str, dest: Path
+    ) -> bool:
+        """
+        Link a directory of an archive's tree from the tool cache to dest.
 
+        The archive is downloaded and extracted into the cache first unless
+        this or another checkout already did.
+        """
         try:
-            ctx = ssl.create_default_context()
-
-            with urllib.request.urlopen(url, context=ctx) as response:
-                total_size = int(response.headers.get("content-length", 0))
-                downloaded = 0
-                chunk_size = 8192
-
-                with open(dest, "wb") as f:
-                    while True:
-                        chunk = response.read(chunk_size)
-                        if not chunk:
-                            break
-                        f.write(chunk)
-                        downloaded += len(chunk)
-
-                        if total_size > 0:
-                            percent = (downloaded / total_size) * 100
-                            mb_downloaded = downloaded / (1024 * 1024)
-                            mb_total = total_size / (1024 * 1024)
-                            print(
-                                f"\r  Progress: {mb_downloaded:.1f}/{mb_total:.1f} MB ({percent:.1f}%)",
-                                end="",
-                                flush=True,
-                            )
-
-                print()  # New line after progress
-                self.logger.success(f"Downloaded {desc}")
-                return True
-
-        except Exception as e:
-            self.logger.error(f"Failed to download {desc}: {e}")
-            if dest.exists():
-                dest.unlink()
+            tree = self.tool_cache.fetch_tree(
+                url, archive_name, desc, self.download_file, self.extract_tar_xz,
+                stream=self.stream_extract_tar_xz if self.config.stream_tools else None,
+            )
+        except OSError as e:
+            self.logger.error(f"Tool cache {self.tool_cache.root} is not usable: {e}")
+            return False
+        if tree is None:
+            return False
+        source = tree / extracted_name
+        if not source.is_dir():
+            self.logger.error(f"{desc} archive has no {extracted_name} directory")
             return False
 
+        if dest.is_symlink():
+            # Only the link goes, never the tree it points to
+            dest.unlink()
+        elif dest.exists():
+            # Security: Verify the path is within tools_dir before deletion
+            if not self._is_safe_path_for_deletion(dest):
+                self.logger.error(f"Refusing to delete unsafe path: {dest}")
+                return False
+            shutil.rmtree(dest)
+        if link_tree(source, dest):
+            self.logger.info(f"  Linked {dest} -> {source}")
+        else:
+            self.logger.info(f"  Copied {source} to {dest}")
+        return True
+
+    def download_file(
+        self,
+        url: str,
+        dest: Path,
+        desc: str = "file",
+        sha256: Optional[str] = None,
+    ) -> bool:
+        """Download a file with progress indication, resuming interrupted downloads."""
+        return Downloader(self.logger).fetch(url, dest, desc, sha256)
+
     def _is_safe_path_for_deletion(self, path: Path) -> bool:
         """Check if a path is safe to delete (within tools_dir and not a symlink escape)."""
         try:
@@ -419,6 +412,19 @@ class ToolInstaller:
         except (ValueError, OSError):
             return False
 
+    def _check_tar_member(self, member: tarfile.TarInfo, dest_dir: Path) -> bool:
+        """Check a tar member's path and link target, logging why it is unsafe."""
+        if not self._is_safe_tar_member(member, dest_dir):
+            self.logger.error(f"Unsafe path in archive: {member.name}")
+            return False
+        # Also reject symbolic links pointing outside
+        if member.issym() or member.islnk():
+            link_target = member.linkname
+            if link_target.startswith('/') or '..' in link_target.split('/'):
+                self.logger.error(f"Unsafe symlink in archive: {member.name} -> {link_target}")
+                return False
+        return True
+
     def extract_tar_xz(self, archive: Path, dest_dir: Path) -> bool:
         """Extract a .tar.xz archive with path traversal protection."""
         self.logger.info(f"Extracting {archive.name}...")
@@ -426,15 +432,8 @@ class ToolInstaller:
             with tarfile.open(archive, "r:xz") as tar:
                 # Validate all members before extraction
                 for member in tar.getmembers():
-                    if not self._is_safe_tar_member(member, dest_dir):
-                        self.logger.error(f"Unsafe path in archive: {member.name}")
+                    if not self._check_tar_member(member, dest_dir):
                         return False
-                    # Also reject symbolic links pointing outside
-                    if member.issym() or member.islnk():
-                        link_target = member.linkname
-                        if link_target.startswith('/') or '..' in link_target.split('/'):
-                            self.logger.error(f"Unsafe symlink in archive: {member.name} -> {link_target}")
-                            return False
 
                 # Safe to extract
                 tar.extractall(path=dest_dir)
@@ -444,6 +443,50 @@ class ToolInstaller:
             self.logger.error(f"Failed to extract archive: {e}")
             return False
 
+    def stream_extract_tar_xz(
+        self, url: str, dest_dir: Path, desc: str, sha256: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Download and extract a .tar.xz in one pass, without storing the archive.
+
+        The response is decompressed and unpacked as it arrives; each member
+        gets the checks of extract_tar_xz just before it is written. Members
+        written before a failure are left for the caller to remove.
+
+        Returns:
+            SHA-256 digest of the archive, or None on failure
+        """
+        self.logger.info(f"Downloading and extracting {desc}...")
+        self.logger.info(f"  URL: {url}")
+        ctx = ssl.create_default_context()
+        try:
+            with urllib.request.urlopen(url, context=ctx, timeout=Downloader.TIMEOUT) as response:
+                length = response.headers.get("Content-Length")
+                meter = ProgressMeter(self.logger, desc, int(length) if length is not None else None)
+                reader = HashingReader(response, meter)
+                try:
+                    with tarfile.open(fileobj=reader, mode="r|xz") as tar:
+                        for member in tar:
+                            if not self._check_tar_member(member, dest_dir):
+                                return None
+                            tar.extract(member, path=dest_dir)
+                    reader.drain()
+                finally:
+                    meter.finish(reader.done)
+        except Exception as e:
+            self.logger.warning(f"Failed to download and extract {desc}: {e}")
+            return None
+
+        if length is not None and reader.done != int(length):
+            self.logger.warning(f"Download of {desc} ended at {reader.done} of {length} bytes")
+            return None
+        digest = reader.digest.hexdigest()
+        if sha256 is not None and digest != sha256.lower():
+            self.logger.error(f"Checksum mismatch for {desc}")
+            return None
+        self.logger.success(f"Downloaded and extracted {desc}")
+        return digest
+
     # ==================== Setup Methods ====================
 
     def setup_rust(self) -> bool:
@@ -451,20 +494,21 @@ class ToolInstaller:
         self.logger.header("Setting up Rust toolchain")
         return self.install_rust()
 
+    def _cross_compile_tasks(self, rust_deps: Tuple[str, ...] = ()) -> List[Task]:
+        """Setup tasks of the cross-compilation tools; none needs another."""
+        return [
+            Task("zig", self.install_zig),
+            Task("cargo-zigbuild", self.install_cargo_zigbuild, deps=rust_deps),
+            Task("macos-sdk", self.install_macos_sdk),
+        ]
+
     def setup_cross_compile(self) -> bool:
-        """Install all required tools for cross-compilation."""
+        """Install all required tools for cross-compilation, concurrently."""
         self.logger.header("Setting up cross-compilation tools")
 
-        success = True
-
-        if not self.install_zig():
-            success = False
-
-        if not self.install_cargo_zigbuild():
-            success = False
-
-        if not self.install_macos_sdk():
-            success = False
+        # Both downloads overlap with the cargo install of cargo-zigbuild
+        results = run_graph(self._cross_compile_tasks(), self.logger)
+        success = all(results.values())
 
         if success:
             self.logger.success("All cross-compilation tools installed!")
@@ -474,17 +518,19 @@ class ToolInstaller:
         return success
 
     def setup_all(self) -> bool:
-        """Install all required tools (Rust + cross-compilation)."""
-        success = True
+        """Install all required tools (Rust + cross-compilation), concurrently."""
+        self.logger.header("Setting up build tools")
 
-        # Install Rust first
-        if not self.setup_rust():
-            success = False
-            return success  # Can't continue without Rust
+        # Only cargo-zigbuild needs Rust; zig and the SDK download meanwhile
+        tasks = [Task("rust", self.install_rust)] + self._cross_compile_tasks(rust_deps=("rust",))
+        results = run_graph(tasks, self.logger)
+        success = all(results.values())
 
-        # Install cross-compilation tools
-        if not self.setup_cross_compile():
-            success = False
+        if success:
+            self.logger.success("All build tools installed!")
+        else:
+            failed = ", ".join(name for name, ok in results.items() if not ok)
+            self.logger.error(f"Some tools failed to install: {failed}")
 
         return success
 
@@ -518,6 +564,17 @@ class ToolInstaller:
         if self.sdk_dir.exists():
             env["SDKROOT"] = str(self.sdk_dir)
 
+        # Serve repeated crate compilations from the builder's rustc cache.
+        # cargo zigbuild runs cargo underneath, so cross targets use it too.
+        # Without the cache the wrapper is only needed to time links; otherwise
+        # rustc runs directly, without a Python start per invocation.
+        caching = self.config.rustc_cache_size_mb > 0
+        if not env.get("RUSTC_WRAPPER") and (caching or self.config.times_links):
+            env["RUSTC_WRAPPER"] = str(Path(__file__).parent / "rustc_cache.py")
+            if caching:
+                env["OPENDIR_RUSTC_CACHE_DIR"] = str(self.rustc_cache_dir)
+                env["OPENDIR_RUSTC_CACHE_SIZE"] = str(self.config.rustc_cache_size_mb * 1024 * 1024)
+
         return env
 
     def print_status(self) -> None:
@@ -0,0 +1,115 @@
+"""
+Vendored crate sources for offline builds.
+"""
+import hashlib
+import json
+import os
+import re
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import BuildConfig
+from .logger import Logger
+
+# First line of the generated config, followed by the Cargo.lock digest
+CONFIG_HEADER = "# Generated by build.py --vendor from Cargo.lock sha256 "
+
+# The vendor path in the source replacement cargo vendor prints
+DIRECTORY_LINE = re.compile(r'^directory = ".*"$', re.MULTILINE)
+
+
+class CrateVendor:
+    """
+    Local copy of every crate in Cargo.lock, for builds without network.
+
+    `cargo vendor` fills the vendor directory; the source replacement it
+    prints is kept in builder/.cargo/config.toml, next to the directory, and
+    passed to cargo with --config. Offline builds then resolve every crate
+    from that one tree, so no target build touches the registry index.
+
+    The config names the directory relative to builder/, so the vendored
+    tree can be copied to another checkout; the gitignored Cargo.lock has
+    to go with it, as the config records the digest it was vendored from.
+    """
+
+    def __init__(self, config: BuildConfig, project_root: Path, logger: Optional[Logger] = None):
+        self.project_root = project_root
+        self.logger = logger
+        self.vendor_dir = project_root / config.vendor_dir
+        self.config_path = self.vendor_dir.parent / ".cargo" / "config.toml"
+        self.lockfile = project_root / "Cargo.lock"
+
+    def _lock_digest(self) -> Optional[str]:
+        try:
+            return hashlib.sha256(self.lockfile.read_bytes()).hexdigest()
+        except OSError:
+            return None
+
+    def _vendored_digest(self) -> Optional[str]:
+        try:
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                header = f.readline().strip()
+        except OSError:
+            return None
+        if not header.startswith(CONFIG_HEADER):
+            return None
+        return header[len(CONFIG_HEADER):]
+
+    def is_vendored(self) -> bool:
+        """Check that vendored sources and their config exist."""
+        return self.vendor_dir.is_dir() and self._vendored_digest() is not None
+
+    def is_current(self) -> bool:
+        """Check that the vendored sources match the current Cargo.lock."""
+        return self.is_vendored() and self._vendored_digest() == self._lock_digest()
+
+    def vendor(self, env: Dict[str, str]) -> bool:
+        """Download all crates of Cargo.lock and write the source replacement."""
+        assert self.logger is not None
+        self.logger.info(f"Vendoring crates into {self.vendor_dir}...")
+        try:
+            result = subprocess.run(
+                [
+                    "cargo", "vendor",
+                    # Directory names with versions, so several versions of a crate fit
+                    "--versioned-dirs",
+                    # Download through registry mirrors configured for this host
+                    "--respect-source-config",
+                    str(self.vendor_dir),
+                ],
+                cwd=self.project_root,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+        except OSError as e:
+            self.logger.error(f"cargo vendor failed: {e}")
+            return False
+        if result.returncode != 0:
+            self.logger.error(f"cargo vendor failed: {result.stderr.strip()}")
+            return False
+
+        # cargo vendor creates Cargo.lock if it was missing
+        digest = self._lock_digest()
+        # cargo resolves a relative directory from the parent of the .cargo directory
+        directory = os.path.relpath(self.vendor_dir, self.config_path.parent.parent)
+        replacement = DIRECTORY_LINE.sub(
+            lambda _: f"directory = {json.dumps(directory)}", result.stdout.strip()
+        )
+        self.config_path.parent.mkdir(parents=True, exist_ok=True)
+        self.config_path.write_text(
+            f"{CONFIG_HEADER}{digest}\n{replacement}\n", encoding="utf-8"
+        )
+
+        crates = sum(1 for p in self.vendor_dir.iterdir() if p.is_dir())
+        self.logger.success(f"Vendored {crates} crates, source replacement in {self.config_path}")
+        return True
+
+    def cargo_args(self) -> List[str]:
+        """Arguments that make a cargo command use the vendored sources only."""
+        return ["--offline", "--config", str(self.config_path)]
+
+    def env(self) -> Dict[str, str]:
+        """Environment that keeps nested cargo runs (build scripts, zigbuild) offline."""
+        return {"CARGO_NET_OFFLINE": "true"}
@@ -0,0 +1,281 @@
+"""
+File-watching rebuild daemon for the native target.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .config import BuildConfig
+from .executor import BuildExecutor, BuildResult
+from .fast import FastMode
+from .logger import Logger
+from .report import BuildReport
+from .targets import Target, TargetManager
+from .tools import ToolInstaller
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+# Directories watched recursively, and project root files that count
+WATCHED_DIRS = ("src", "tests")
+WATCHED_FILES = ("Cargo.toml",)
+
+
+def is_editor_noise(name: str) -> bool:
+    """Swap, backup and probe files editors write next to the real one."""
+    return (
+        name.startswith((".#", "#"))
+        or name.endswith(("~", ".swp", ".swx", ".tmp"))
+        or name == "4913"
+    )
+
+
+class InotifyWatcher:
+    """Recursive watch on the project inputs through inotify(7) via ctypes."""
+
+    def __init__(self, project_root: Path):
+        self.project_root = project_root
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+
+        self._watch(project_root)
+        for name in WATCHED_DIRS:
+            directory = project_root / name
+            if directory.is_dir():
+                self._watch_tree(directory)
+
+    def _watch(self, directory: Path) -> None:
+        wd = self._add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self._dirs[wd] = directory
+
+    def _watch_tree(self, directory: Path) -> None:
+        self._watch(directory)
+        for root, dirs, _ in os.walk(directory):
+            for name in dirs:
+                self._watch(Path(root) / name)
+
+    def _relevant(self, path: Path) -> bool:
+        if is_editor_noise(path.name):
+            return False
+        if path.parent == self.project_root:
+            return path.name in WATCHED_FILES or path.name in WATCHED_DIRS
+        return True
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        """Get the paths changed until timeout (None blocks until a change)."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed: Set[Path] = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            raw_name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length]
+            offset += EVENT_HEADER.size + length
+
+            directory = self._dirs.get(wd)
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            if directory is None:
+                continue
+            path = directory / os.fsdecode(raw_name.rstrip(b"\0")) if length else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and self._relevant(path):
+                # Files may land in a new directory before its watch exists
+                self._watch_tree(path)
+            if self._relevant(path):
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Fallback for hosts without inotify: compares mtimes periodically."""
+
+    def __init__(self, project_root: Path, interval: float = 0.5):
+        self.project_root = project_root
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        paths = [self.project_root / name for name in WATCHED_FILES]
+        for name in WATCHED_DIRS:
+            directory = self.project_root / name
+            if directory.is_dir():
+                paths.extend(p for p in directory.rglob("*") if p.is_file())
+        snapshot = {}
+        for path in paths:
+            if is_editor_noise(path.name):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self._scan()
+            changed = {
+                path for path in set(current) | set(self._snapshot)
+                if current.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = current
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            remaining = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            time.sleep(max(0.0, remaining))
+
+    def close(self) -> None:
+        pass
+
+
+class WatchDaemon:
+    """
+    Rebuilds the native target whenever its inputs change.
+
+    Bursts of saves are collapsed into one build once the tree has been quiet
+    for `debounce` seconds. A build still running when new changes land is
+    cancelled and started over, so the last build always reflects the tree.
+    The tool environment, installed rust targets and crate counts are
+    probed once and reused by every cycle.
+    """
+
+    def __init__(
+        self,
+        config: BuildConfig,
+        project_root: Path,
+        logger: Logger,
+        tool_installer: Optional[ToolInstaller] = None,
+        debounce: float = 0.3,
+    ):
+        self.config = config
+        self.project_root = project_root
+        self.logger = logger
+        self.debounce = debounce
+
+        self.tool_installer = tool_installer or ToolInstaller(config, project_root, logger)
+        self.target_manager = TargetManager(config, logger, env=self.tool_installer.get_env())
+        executor = BuildExecutor(
+            config, project_root, self.tool_installer, self.target_manager, logger, BuildReport()
+        )
+        self.native: Optional[Target] = None
+        resolved = self.target_manager.resolve_targets(["native"])
+        if resolved:
+            self.native = resolved[0]
+        if config.fast and self.native is not None:
+            executor = FastMode(executor).fast_executor(executor, [self.native])
+        executor.cancellable = True
+        self.executor = executor
+
+        self._build: Optional[threading.Thread] = None
+        self._builds = 0
+
+    def _run_build(self, number: int, changed: List[Path]) -> None:
+        assert self.native is not None
+        if changed:
+            names = ", ".join(str(p.relative_to(self.project_root)) for p in changed[:3])
+            more = f" and {len(changed) - 3} more" if len(changed) > 3 else ""
+            self.logger.info(f"Change #{number}: {names}{more}")
+
+        result: BuildResult = self.executor.build_target(self.native)
+        if result.success:
+            if result.binary_path is not None:
+                self.logger.info(f"Binary: {result.binary_path}")
+        elif result.error_message != "cancelled":
+            self.logger.warning("Waiting for changes to retry")
+
+    def _start(self, changed: List[Path]) -> None:
+        self._builds += 1
+        self._build = threading.Thread(target=self._run_build, args=(self._builds, changed), daemon=True)
+        self._build.start()
+
+    def _stop_build(self) -> None:
+        if self._build is not None and self._build.is_alive():
+            self.executor.cancel()
+            self._build.join()
+        self._build = None
+
+    def run(self) -> int:
+        """Watch and rebuild until interrupted."""
+        if self.native is None:
+            self.logger.error("No native target for this host")
+            return 1
+        self.target_manager.ensure_targets([self.native])
+
+        try:
+            watcher = InotifyWatcher(self.project_root)
+        except (OSError, AttributeError):
+            self.logger.debug("inotify unavailable, polling for changes")
+            watcher = PollingWatcher(self.project_root)
+
+        profile = "release" if self.config.release else "debug"
+        self.logger.info(
+            f"Watching {', '.join(WATCHED_DIRS + WATCHED_FILES)} for {self.native.friendly_name} "
+            f"({profile}); press Ctrl-C to stop"
+        )
+        self._start([])
+
+        try:
+            while True:
+                changed = watcher.wait(None)
+                if not changed:
+                    continue
+                # Debounce: wait for the burst of saves to settle
+                while True:
+                    more = watcher.wait(self.debounce)
+                    if not more:
+                        break
+                    changed |= more
+
+                self._stop_build()
+                if any(p.name == "Cargo.toml" for p in changed):
+                    self.executor.reset_unit_counts()
+                self._start(sorted(changed))
+        except KeyboardInterrupt:
+            self.logger.newline()
+            self.logger.info("Stopping watch")
+            self._stop_build()
+        finally:
+            watcher.close()
+        return 0
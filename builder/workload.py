@@ -0,0 +1,249 @@
+"""
+Scripted headless opendir session used for profiling and benchmarks.
+"""
+import os
+import pty
+import select
+import shutil
+import signal
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .report import max_rss_bytes
+
+try:
+    import fcntl
+    import termios
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+    termios = None
+
+# xterm input sequences for the keys the session uses
+KEYS = {
+    "up": "\x1b[A",
+    "down": "\x1b[B",
+    "pageup": "\x1b[5~",
+    "pagedown": "\x1b[6~",
+    "home": "\x1b[H",
+    "end": "\x1b[F",
+    "enter": "\r",
+    "esc": "\x1b",
+    "tab": "\t",
+    "ctrl+c": "\x03",
+    "ctrl+v": "\x16",
+}
+
+
+@dataclass
+class WorkloadRun:
+    """Outcome of one scripted session."""
+
+    seconds: float
+    user_seconds: float
+    system_seconds: float
+    max_rss_bytes: int
+    returncode: int
+
+    @property
+    def cpu_seconds(self) -> float:
+        return self.user_seconds + self.system_seconds
+
+
+class TuiWorkload:
+    """
+    Drives opendir through a pseudo-terminal with the default key bindings.
+
+    The session lists large directories under every sort order, opens
+    source files in the viewer (syntax highlighting), copies a directory
+    between panels (copy_files_with_progress), runs a folder diff and quits
+    with `q`, so instrumented binaries exit normally and write their
+    profile data.
+    """
+
+    def __init__(
+        self,
+        project_root: Path,
+        work_dir: Path,
+        dirs: int = 40,
+        files_per_dir: int = 200,
+        key_delay: float = 0.03,
+        timeout: float = 300.0,
+    ):
+        self.project_root = project_root
+        self.work_dir = work_dir
+        self.dirs = dirs
+        self.files_per_dir = files_per_dir
+        self.key_delay = key_delay
+        self.timeout = timeout
+
+        self.tree_dir = work_dir / "tree"
+        self.home_dir = work_dir / "home"
+
+    def prepare(self) -> None:
+        """Create the directory tree the session browses."""
+        if self.tree_dir.exists():
+            return
+
+        for d in range(self.dirs):
+            dir_path = self.tree_dir / f"dir{d:03d}"
+            dir_path.mkdir(parents=True)
+            for f in range(self.files_per_dir):
+                suffix = (".txt", ".rs", ".json", ".md", ".log")[f % 5]
+                (dir_path / f"file{f:04d}{suffix}").write_text(f"{d}:{f}\n" * (f % 17 + 1))
+
+        # Real source files for the viewer's syntax highlighting
+        sources = self.tree_dir / "sources"
+        sources.mkdir()
+        for path in sorted((self.project_root / "src").rglob("*.rs")):
+            shutil.copyfile(path, sources / path.name)
+
+        payload = self.tree_dir / "payload"
+        payload.mkdir()
+        block = os.urandom(64 * 1024)
+        for f in range(64):
+            (payload / f"blob{f:03d}.bin").write_bytes(block * (f % 8 + 1))
+
+        self.home_dir.mkdir(parents=True, exist_ok=True)
+
+    def _script(self) -> List[Tuple[str, float]]:
+        """Keystrokes of the session, with a pause after each one."""
+        steps: List[Tuple[str, float]] = [("", 1.0)]
+
+        def keys(*names: str, pause: float = 0.0) -> None:
+            for name in names:
+                steps.append((KEYS.get(name, name), self.key_delay))
+            if pause:
+                steps.append(("", pause))
+
+        # Sort and scroll the large root listing
+        for sort_key in ("n", "s", "d", "y", "n"):
+            keys(sort_key, "end", "home", *["pagedown"] * 5, *["pageup"] * 5)
+
+        # Enter directories with many files
+        for _ in range(8):
+            keys("down", "enter", *["pagedown"] * 8, "end", "home", "esc")
+
+        # Open source files in the viewer
+        keys("home", "/")
+        steps.append((str(self.tree_dir / "sources") + "\r", 0.5))
+        for _ in range(12):
+            keys("down", "enter", pause=0.2)
+            keys(*["pagedown"] * 10, "end", "esc")
+
+        # Copy the payload directory to the other panel
+        keys("/")
+        steps.append((str(self.tree_dir) + "\r", 0.5))
+        keys("end", "up", "ctrl+c", "tab", "ctrl+v", pause=3.0)
+
+        # Folder diff between the two panels
+        keys("tab", "8", pause=2.0)
+        keys(*["down"] * 40, "esc", pause=0.5)
+
+        keys("q")
+        return steps
+
+    def run(
+        self,
+        binary: Path,
+        env: Optional[Dict[str, str]] = None,
+        prefix: Optional[List[str]] = None,
+    ) -> WorkloadRun:
+        """
+        Run the session against binary and measure it.
+
+        prefix is a command the binary runs under, e.g. a profiler; its
+        resource usage is included in the measurement.
+        """
+        if fcntl is None:
+            raise RuntimeError("The TUI workload needs a POSIX pseudo-terminal")
+
+        self.prepare()
+        copy_dir = self.work_dir / "copy"
+        if copy_dir.exists():
+            shutil.rmtree(copy_dir)
+        copy_dir.mkdir()
+
+        run_env = dict(env if env is not None else os.environ)
+        run_env.update({
+            "HOME": str(self.home_dir),
+            "TERM": "xterm-256color",
+            "COLUMNS": "160",
+            "LINES": "48",
+        })
+
+        started = time.monotonic()
+        pid, fd = pty.fork()
+        if pid == 0:  # pragma: no cover - child process
+            os.chdir(self.tree_dir)
+            argv = [*(prefix or []), str(binary), str(self.tree_dir), str(copy_dir)]
+            os.execvpe(argv[0], argv, run_env)
+
+        fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", 48, 160, 0, 0))
+
+        # Keep draining the terminal so the child never blocks on output
+        stop = threading.Event()
+
+        def drain() -> None:
+            while not stop.is_set():
+                ready, _, _ = select.select([fd], [], [], 0.1)
+                if ready:
+                    try:
+                        if not os.read(fd, 65536):
+                            break
+                    except OSError:
+                        break
+
+        reader = threading.Thread(target=drain, daemon=True)
+        reader.start()
+
+        try:
+            for data, pause in self._script():
+                if data:
+                    try:
+                        os.write(fd, data.encode())
+                    except OSError:
+                        break  # The session ended early
+                time.sleep(pause)
+
+            # A dialog left open swallows `q`; close it and quit again
+            deadline = time.monotonic() + self.timeout
+            retry_at = time.monotonic() + 5.0
+            while True:
+                finished, status, rusage = os.wait4(pid, os.WNOHANG)
+                if finished:
+                    break
+                now = time.monotonic()
+                if now > deadline:
+                    os.kill(pid, signal.SIGKILL)
+                    finished, status, rusage = os.wait4(pid, 0)
+                    break
+                if now > retry_at:
+                    try:
+                        os.write(fd, KEYS["esc"].encode())
+                        time.sleep(0.2)
+                        os.write(fd, b"q")
+                    except OSError:
+                        pass
+                    retry_at = now + 5.0
+                time.sleep(0.05)
+        finally:
+            stop.set()
+            reader.join(timeout=1.0)
+            os.close(fd)
+
+        return WorkloadRun(
+            seconds=time.monotonic() - started,
+            user_seconds=rusage.ru_utime,
+            system_seconds=rusage.ru_stime,
+            max_rss_bytes=max_rss_bytes(rusage),
+            returncode=os.waitstatus_to_exitcode(status),
+        )
+
+    def benchmark(self, binary: Path, runs: int = 3, env: Optional[Dict[str, str]] = None) -> WorkloadRun:
+        """Run the session several times and keep the median by CPU time."""
+        results = sorted((self.run(binary, env) for _ in range(runs)), key=lambda r: r.cpu_seconds)
+        return results[len(results) // 2]
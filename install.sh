@@ -168,32 +168,57 @@ main() {
 
     # Build download URL
     local filename="${BINARY_NAME}-${os}-${arch}"
-    local url="${BASE_URL}/${filename}"
     local local_dist_dir
-    local local_file
-    local source_file
     local_dist_dir="$(resolve_dist_dir)"
-    local_file="${local_dist_dir:+$local_dist_dir/$filename}"
 
-    # Create temp file
-    local tmpfile
-    tmpfile="$(mktemp)"
-    trap 'rm -f "$tmpfile"' EXIT
+    # Create temp directory
+    local tmpdir
+    tmpdir="$(mktemp -d)"
+    trap 'rm -rf "$tmpdir"' EXIT
+    local tmpfile="$tmpdir/$BINARY_NAME"
+
+    # Prefer local dist files to downloads, and within each a compressed
+    # bundle the system can unpack to the raw binary
+    local source ext tool name local_file
+    for source in local remote; do
+        for ext in tar.zst tar.xz ""; do
+            case "$ext" in
+                tar.zst) tool="zstd" ;;
+                tar.xz)  tool="xz" ;;
+                *)       tool="" ;;
+            esac
+            if [ -n "$tool" ] && ! has_cmd "$tool"; then
+                continue
+            fi
 
-    if [ -n "$local_file" ] && [ -f "$local_file" ]; then
-        info "Using local dist file: $local_file"
-        source_file="$local_file"
-    else
-        source_file="$url"
-    fi
+            name="${filename}${ext:+.$ext}"
+            if [ "$source" = "local" ]; then
+                local_file="${local_dist_dir:+$local_dist_dir/$name}"
+                if [ -z "$local_file" ] || [ ! -f "$local_file" ]; then
+                    continue
+                fi
+                # A bundle older than the raw binary holds a previous build
+                if [ -n "$ext" ] && [ "$local_dist_dir/$filename" -nt "$local_file" ]; then
+                    continue
+                fi
+                info "Using local dist file: $local_file"
+                cp "$local_file" "$tmpdir/$name"
+            elif ! download "${BASE_URL}/${name}" "$tmpdir/$name"; then
+                continue
+            fi
 
-    # Download or copy from local dist
-    if [ "$source_file" = "$url" ]; then
-        if ! download "$url" "$tmpfile"; then
-            error "Download failed"
-        fi
-    else
-        cp "$source_file" "$tmpfile"
+            if [ -n "$tool" ]; then
+                "$tool" -dc "$tmpdir/$name" | tar -xf - -C "$tmpdir" "$BINARY_NAME" \
+                    || error "Failed to unpack $name"
+            else
+                mv "$tmpdir/$name" "$tmpfile"
+            fi
+            break 2
+        done
+    done
+
+    if [ ! -f "$tmpfile" ]; then
+        error "Download failed"
     fi
 
     # Make executable